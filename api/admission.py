@@ -0,0 +1,197 @@
+"""
+Admission control for the analysis API.
+
+Every request is given a cost: its estimated token count times the weights
+of the stages it asks for (analysis, translation, summarization). Requests
+run while the sum of in-flight costs stays within a global budget; the rest
+wait in per-client queues that are served round-robin, so one client posting
+many novels cannot starve the others. When the queues are full, or a request
+has waited too long, it is rejected at once with 429 and a Retry-After
+estimated from the recent drain rate. Requests costing more than the whole
+budget are refused with 413 (they belong in the jobs API).
+
+The budget is per process. The pre-fork server (api.serve) divides
+API_TOKEN_BUDGET among its workers; with `uvicorn --workers N`, set it to
+the share of one worker.
+"""
+
+import asyncio
+import math
+import os
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+
+TOKEN_BUDGET = int(os.environ.get("API_TOKEN_BUDGET", 1_000_000))
+MAX_QUEUE = int(os.environ.get("API_MAX_QUEUE", 64))
+MAX_QUEUE_PER_CLIENT = int(os.environ.get("API_MAX_QUEUE_PER_CLIENT", 8))
+MAX_WAIT = float(os.environ.get("API_MAX_WAIT", 30))
+
+# Relative cost per token of each stage
+STAGE_WEIGHTS = {
+    "analysis": 1,
+    "translation": 4,
+    "summarization": 4,
+}
+CHARS_PER_TOKEN = 4
+
+
+def estimate_cost(text, stages):
+    """Estimate the cost of running `stages` on `text` (tokens x stage weights)."""
+    tokens = len(text) // CHARS_PER_TOKEN + 1
+    return tokens * sum(STAGE_WEIGHTS[stage] for stage in stages)
+
+
+class Rejected(Exception):
+    """The request cannot be admitted now (429) or ever (413)."""
+
+    def __init__(self, status_code, detail, retry_after=None):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+        self.retry_after = retry_after
+
+
+class _Waiter:
+    __slots__ = ("client", "cost", "future")
+
+    def __init__(self, client, cost, future):
+        self.client = client
+        self.cost = cost
+        self.future = future
+
+
+class AdmissionController:
+    """Global cost budget with per-client round-robin queues (one event loop)."""
+
+    def __init__(self, budget=TOKEN_BUDGET, max_queue=MAX_QUEUE,
+                 max_queue_per_client=MAX_QUEUE_PER_CLIENT, max_wait=MAX_WAIT):
+        self.budget = budget
+        self.max_queue = max_queue
+        self.max_queue_per_client = max_queue_per_client
+        self.max_wait = max_wait
+        self.in_flight = 0
+        self._queues = OrderedDict()  # client -> deque of waiters, in round-robin order
+        self._queued = 0
+        self._queued_cost = 0
+        self._drain_rate = None  # cost units finished per second (moving average)
+        self._last_release = None
+        self._stats = {"admitted": 0, "queued": 0, "rejected_queue_full": 0,
+                       "rejected_timeout": 0, "rejected_too_large": 0}
+
+    # ----------------------------
+    # Queueing
+    # ----------------------------
+    def _retry_after(self):
+        if not self._drain_rate:
+            return 1
+        backlog = self.in_flight + self._queued_cost - self.budget
+        return min(60, max(1, math.ceil(backlog / self._drain_rate)))
+
+    def _dispatch(self):
+        """Admit waiting requests, one client at a time, while the budget allows."""
+        while self._queues:
+            client, queue = next(iter(self._queues.items()))
+            waiter = queue[0]
+            if waiter.future.done():  # timed out or cancelled meanwhile
+                self._dequeue(client)
+                continue
+            if self.in_flight + waiter.cost > self.budget:
+                return  # keep the order: a big request is not overtaken forever
+            self._dequeue(client)
+            if client in self._queues:
+                self._queues.move_to_end(client)  # next turn goes to another client
+            self.in_flight += waiter.cost
+            waiter.future.set_result(None)
+
+    def _dequeue(self, client):
+        waiter = self._queues[client].popleft()
+        if not self._queues[client]:
+            del self._queues[client]
+        self._queued -= 1
+        self._queued_cost -= waiter.cost
+        return waiter
+
+    def _remove(self, waiter):
+        queue = self._queues.get(waiter.client)
+        if queue is not None and waiter in queue:
+            queue.remove(waiter)
+            if not queue:
+                del self._queues[waiter.client]
+            self._queued -= 1
+            self._queued_cost -= waiter.cost
+
+    # ----------------------------
+    # Public interface
+    # ----------------------------
+    async def acquire(self, client, cost):
+        """Wait until `cost` fits in the budget.
+
+        Raises:
+            Rejected: With 413 if `cost` exceeds the whole budget, with 429 if
+                the queues are full or the wait exceeded `max_wait`.
+        """
+        if cost > self.budget:
+            self._stats["rejected_too_large"] += 1
+            raise Rejected(413, "Request is too large for synchronous processing; submit it as a job")
+        if not self._queues and self.in_flight + cost <= self.budget:
+            self.in_flight += cost
+            self._stats["admitted"] += 1
+            return
+        client_queue = self._queues.get(client, ())
+        if self._queued >= self.max_queue or len(client_queue) >= self.max_queue_per_client:
+            self._stats["rejected_queue_full"] += 1
+            raise Rejected(429, "Service is saturated", self._retry_after())
+
+        waiter = _Waiter(client, cost, asyncio.get_running_loop().create_future())
+        self._queues.setdefault(client, deque()).append(waiter)
+        self._queued += 1
+        self._queued_cost += cost
+        self._stats["queued"] += 1
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter.future), self.max_wait)
+        except asyncio.TimeoutError:
+            self._remove(waiter)
+            self._dispatch()  # the waiters it held back may fit now
+            if waiter.future.done():  # admitted just as the timeout fired
+                self.release(cost)
+            self._stats["rejected_timeout"] += 1
+            raise Rejected(429, "Timed out waiting for capacity", self._retry_after()) from None
+        except asyncio.CancelledError:  # client went away
+            self._remove(waiter)
+            self._dispatch()
+            if waiter.future.done() and not waiter.future.cancelled():
+                self.release(cost)
+            raise
+        self._stats["admitted"] += 1
+
+    def release(self, cost):
+        """Return `cost` to the budget (call on the event loop thread)."""
+        self.in_flight -= cost
+        now = time.monotonic()
+        if self._last_release is not None and now > self._last_release:
+            rate = cost / (now - self._last_release)
+            self._drain_rate = rate if self._drain_rate is None else 0.8 * self._drain_rate + 0.2 * rate
+        self._last_release = now
+        self._dispatch()
+
+    @asynccontextmanager
+    async def admit(self, client, cost):
+        await self.acquire(client, cost)
+        try:
+            yield
+        finally:
+            self.release(cost)
+
+    def metrics(self):
+        return dict(
+            self._stats,
+            budget=self.budget,
+            in_flight=self.in_flight,
+            queue_depth=self._queued,
+            queued_cost=self._queued_cost,
+            queued_clients=len(self._queues),
+        )
+
+
+admission = AdmissionController()
@@ -1,10 +1,25 @@
 # app/api.py
-from fastapi import FastAPI, APIRouter, HTTPException
+from fastapi import FastAPI, APIRouter, HTTPException, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+from starlette.concurrency import iterate_in_threadpool
 from pydantic import BaseModel
-from typing import List, Optional, Dict, Any
-from words_context.context import extract_keyword_sentences
-from text_processing.processing import extract_frequent_words
-from translation_summary.mbart import summarize_and_translate  # summarization function
+from typing import List, Optional, Dict, Any, Iterator
+import json
+import os
+from words_context.context import iter_keyword_sentences, model_name as CONTEXT_MT_MODEL
+from words_context.lexicon import lexicon
+from text_processing.processing import extract_frequent_words, pipeline_name
+from translation_summary.mbart import (  # summarization function
+    summarize_and_translate, SUMMARIZER_NAME, MT_MODEL_NAME
+)
+from api.admission import Rejected, admission, estimate_cost
+from api.cache import make_key, normalize_text, response_cache
+from api.jobs import JobRunner, JobStore
+from instrumentation.metrics import REGISTRY, instrument_app
+from reader import reader
+
+# Files that jobs may reference (paths are resolved relative to this folder)
+JOB_FILES_ROOT = os.environ.get("API_JOB_FILES_ROOT", "data")
 
 
 # ----------------------------
@@ -42,60 +57,365 @@ class SummarizationResponse(BaseModel):
     summary_translated_to: Optional[str] = None
 
 
+class JobRequest(BaseModel):
+    kind: str                        # "frequent-words" or "summarize"
+    text: Optional[str] = None
+    file: Optional[str] = None       # a book under JOB_FILES_ROOT, instead of text
+    lang: Optional[str] = "de"
+    top_pct: Optional[float] = 10
+    to_lang: Optional[str] = "en"
+    summary_translate_to: Optional[str] = "en"
+
+
+class JobResponse(BaseModel):
+    job_id: str
+    status: str
+
+
 # ----------------------------
 # Routers
 # ----------------------------
 router = APIRouter()
 
 
+def iter_frequent_words(text: str, lang: str, top_pct: float, to_lang: Optional[str]) -> Iterator[Dict[str, Any]]:
+    """
+    Yield the /frequent-words result in parts: first the frequency analysis,
+    then one keyword (with translated contexts) at a time.
+    """
+    # Extract frequent words
+    analysis = extract_frequent_words(text, lang=lang, top_pct=top_pct)
+    vocabulary = [word for word, freq in analysis]
+    yield {
+        "type": "analysis",
+        "analysis": [{"word": word, "frequency": freq} for word, freq in analysis],
+        "vocabulary": vocabulary
+    }
+
+    # Extract keyword sentences (includes keyword translations now)
+    for word, entry in iter_keyword_sentences(text=text, keywords=vocabulary, translate_to=to_lang):
+        yield {"type": "keyword", "word": word, **entry}
+
+
+def collect_frequent_words(parts: Iterator[Dict[str, Any]]) -> Dict[str, Any]:
+    """Assemble streamed parts into a FrequentWordsResponse dict."""
+    result = {"analysis": [], "vocabulary": [], "sentences": {}}
+    for part in parts:
+        if part["type"] == "analysis":
+            result["analysis"], result["vocabulary"] = part["analysis"], part["vocabulary"]
+        elif part["type"] == "keyword":
+            result["sentences"][part["word"]] = {"translation": part["translation"], "context": part["context"]}
+    return result
+
+
+def compute_frequent_words(text: str, lang: str, top_pct: float, to_lang: Optional[str]) -> Dict[str, Any]:
+    return collect_frequent_words(iter_frequent_words(text, lang, top_pct, to_lang))
+
+
+def frequent_words_key(text: str, request) -> str:
+    return make_key(
+        "frequent-words", text,
+        lang=request.lang, top_pct=request.top_pct, to_lang=request.to_lang,
+        models={"spacy": pipeline_name(request.lang), "mt": CONTEXT_MT_MODEL},
+        # Keyword translations come from the lexicon first
+        lexicon=lexicon.version() if request.to_lang else None
+    )
+
+
+def summary_key(text: str, request) -> str:
+    return make_key(
+        "summarize", text,
+        summary_translate_to=request.summary_translate_to,
+        models={"summarizer": SUMMARIZER_NAME, "mt": MT_MODEL_NAME}
+    )
+
+
+def compute_summary(text: str, summary_translate_to: str) -> Dict[str, Any]:
+    summary_data = summarize_and_translate(text=text, translate_to=summary_translate_to)
+    return {
+        "summary": summary_data["final_summary"],
+        "summary_translated_to": summary_data["translated_to"]
+    }
+
+
+def client_id(http_request: Request) -> str:
+    """Identify the client for fair queueing (X-Client-Id header, else the peer address)."""
+    return http_request.headers.get("x-client-id") or (http_request.client.host if http_request.client else "unknown")
+
+
+def frequent_words_stages(request) -> List[str]:
+    return ["analysis", "translation"] if request.to_lang else ["analysis"]
+
+
+# The input is translated to English first unless it already is, so count translation too
+SUMMARY_STAGES = ["summarization", "translation"]
+
+
+async def cached_or_admitted(http_request: Request, key: str, cost: int, compute):
+    """Serve a cached (or already running) result for free; otherwise compute once admitted."""
+    if not response_cache.is_computing(key):
+        cached = await response_cache.lookup(key)
+        if cached is not None:
+            return cached
+        await admission.acquire(client_id(http_request), cost)
+        try:
+            return await response_cache.get_or_compute(key, compute)
+        finally:
+            # The computation is shielded: it goes on if this client goes
+            # away, so its cost stays in flight until it really ends
+            task = response_cache.computation(key)
+            if task is None:
+                admission.release(cost)
+            else:
+                task.add_done_callback(lambda _: admission.release(cost))
+    return await response_cache.get_or_compute(key, compute)
+
+
 @router.post("/frequent-words", response_model=FrequentWordsResponse)
-async def get_frequent_words(request: FrequentWordsRequest):
+async def get_frequent_words(request: FrequentWordsRequest, http_request: Request):
     try:
-        # Extract frequent words
-        analysis = extract_frequent_words(
-            request.text,
-            lang=request.lang,
-            top_pct=request.top_pct
+        text = normalize_text(request.text)
+        result = await cached_or_admitted(
+            http_request,
+            frequent_words_key(text, request),
+            estimate_cost(text, frequent_words_stages(request)),
+            lambda: compute_frequent_words(text, request.lang, request.top_pct, request.to_lang)
         )
-        vocabulary = [word for word, freq in analysis]
+        return FrequentWordsResponse(**result)
+    except Rejected:
+        raise
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        raise HTTPException(status_code=500, detail=str(e))
 
-        # Extract keyword sentences (includes keyword translations now)
-        output = extract_keyword_sentences(
-            text=request.text,
-            keywords=vocabulary,
-            translate_to=request.to_lang
-        )
 
-        return FrequentWordsResponse(
-            analysis=[{"word": word, "frequency": freq} for word, freq in analysis],
-            vocabulary=vocabulary,
-            sentences=output
-        )
+def stream_frequent_words(text: str, request: FrequentWordsRequest, cached=None) -> Iterator[str]:
+    # A sync generator, iterated in the thread pool so that the spaCy pass
+    # and the translations never block the event loop
+    key = frequent_words_key(text, request)
+    parts = []
+    try:
+        if cached is not None:
+            source = iter([{"type": "analysis", "analysis": cached["analysis"], "vocabulary": cached["vocabulary"]}]
+                          + [{"type": "keyword", "word": word, **entry} for word, entry in cached["sentences"].items()])
+        else:
+            source = iter_frequent_words(text, request.lang, request.top_pct, request.to_lang)
+        for part in source:
+            parts.append(part)
+            yield json.dumps(part, ensure_ascii=False) + "\n"
     except Exception as e:
         import traceback
         traceback.print_exc()
-        raise HTTPException(status_code=500, detail=str(e))
+        yield json.dumps({"type": "error", "detail": str(e)}) + "\n"
+        return
+    if cached is None:
+        response_cache.set(key, collect_frequent_words(parts))
+    yield json.dumps({"type": "done", "keywords": len(parts) - 1}) + "\n"
+
+
+class AdmittedStreamingResponse(StreamingResponse):
+    """A streaming response that returns its admitted cost once it has been sent.
+
+    The cost is released when the response ends, also when the client
+    disconnects before (or while) the body is generated.
+    """
+
+    def __init__(self, content, cost, **kwargs):
+        super().__init__(content, **kwargs)
+        self.cost = cost
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            if self.cost:
+                admission.release(self.cost)
+
+
+@router.post("/frequent-words/stream")
+async def stream_frequent_words_endpoint(request: FrequentWordsRequest, http_request: Request):
+    """
+    NDJSON variant of /frequent-words: an "analysis" line as soon as the
+    frequencies are known, one "keyword" line per keyword as its translations
+    finish, then a "done" (or "error") line.
+    """
+    text = normalize_text(request.text)
+    cached = await response_cache.lookup(frequent_words_key(text, request))
+    cost = 0 if cached is not None else estimate_cost(text, frequent_words_stages(request))
+    if cost:
+        await admission.acquire(client_id(http_request), cost)
+    return AdmittedStreamingResponse(iterate_in_threadpool(stream_frequent_words(text, request, cached)), cost,
+                                     media_type="application/x-ndjson")
 
 
 @router.post("/summarize", response_model=SummarizationResponse)
-async def summarize_text(request: SummarizationRequest):
+async def summarize_text(request: SummarizationRequest, http_request: Request):
     try:
-        summary_data = summarize_and_translate(
-            text=request.text,
-            translate_to=request.summary_translate_to
-        )
-        return SummarizationResponse(
-            summary=summary_data["final_summary"],
-            summary_translated_to=summary_data["translated_to"]
+        text = normalize_text(request.text)
+        result = await cached_or_admitted(
+            http_request,
+            summary_key(text, request),
+            estimate_cost(text, SUMMARY_STAGES),
+            lambda: compute_summary(text, request.summary_translate_to)
         )
+        return SummarizationResponse(**result)
+    except Rejected:
+        raise
     except Exception as e:
         import traceback
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=str(e))
 
 
+# ----------------------------
+# Jobs
+# ----------------------------
+def resolve_job_file(file: str) -> str:
+    """Return the absolute path of a job file, refusing paths outside JOB_FILES_ROOT."""
+    root = os.path.realpath(JOB_FILES_ROOT)
+    path = os.path.realpath(os.path.join(root, file))
+    if os.path.commonpath([root, path]) != root or not os.path.isfile(path):
+        raise ValueError(f"File not found: {file}")
+    return path
+
+
+def load_job_text(params: Dict[str, Any], progress) -> str:
+    if params.get("text") is not None:
+        return normalize_text(params["text"])
+    progress("extract")
+    text = normalize_text("".join(reader.extract_text(resolve_job_file(params["file"]), stream=True)))
+    progress("extract", 1, 1)
+    return text
+
+
+def run_frequent_words_job(params: Dict[str, Any], progress) -> Dict[str, Any]:
+    request = FrequentWordsRequest(text="", **{k: params[k] for k in ("lang", "top_pct", "to_lang")})
+    text = load_job_text(params, progress)
+    key = frequent_words_key(text, request)
+    cached = response_cache.get(key)
+    if cached is not None:
+        return cached
+
+    progress("analysis")
+    parts = []
+    for part in iter_frequent_words(text, request.lang, request.top_pct, request.to_lang):
+        parts.append(part)
+        if part["type"] == "analysis":
+            progress("analysis", 1, 1)
+            total = len(part["vocabulary"])
+        progress("contexts", len(parts) - 1, total)
+    result = collect_frequent_words(parts)
+    response_cache.set(key, result)
+    return result
+
+
+def run_summarize_job(params: Dict[str, Any], progress) -> Dict[str, Any]:
+    request = SummarizationRequest(text="", summary_translate_to=params["summary_translate_to"])
+    text = load_job_text(params, progress)
+    key = summary_key(text, request)
+    cached = response_cache.get(key)
+    if cached is not None:
+        return cached
+
+    progress("summarize")
+    result = compute_summary(text, request.summary_translate_to)
+    progress("summarize", 1, 1)
+    response_cache.set(key, result)
+    return result
+
+
+JOB_HANDLERS = {
+    "frequent-words": run_frequent_words_job,
+    "summarize": run_summarize_job,
+}
+
+job_runner: Optional[JobRunner] = None
+
+
+def job_key(request: JobRequest) -> str:
+    """Identical submissions share one job (for files: same path, size and mtime)."""
+    if request.text is not None:
+        source = normalize_text(request.text)
+    else:
+        stat = os.stat(resolve_job_file(request.file))
+        source = f"file:{resolve_job_file(request.file)}:{stat.st_size}:{stat.st_mtime_ns}"
+    if request.kind == "summarize":
+        return summary_key(source, request)
+    return frequent_words_key(source, request)
+
+
+@router.post("/jobs", response_model=JobResponse, status_code=202)
+async def submit_job(request: JobRequest):
+    if request.kind not in JOB_HANDLERS:
+        raise HTTPException(status_code=400, detail=f"Unknown job kind: {request.kind}")
+    if (request.text is None) == (request.file is None):
+        raise HTTPException(status_code=400, detail="Pass exactly one of 'text' or 'file'")
+    try:
+        key = job_key(request)
+    except (ValueError, OSError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    job_id = job_runner.submit(request.kind, request.model_dump(), key=key)
+    return JobResponse(job_id=job_id, status=job_runner.store.get(job_id)["status"])
+
+
+@router.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Status of a job with per-stage progress, e.g. {"contexts": {"done": 40, "total": 120}}."""
+    job = job_runner.store.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+@router.get("/jobs/{job_id}/result")
+async def get_job_result(job_id: str):
+    job = job_runner.store.get(job_id, with_result=True)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job["status"] == "failed":
+        raise HTTPException(status_code=500, detail=job["error"])
+    if job["status"] != "done":
+        raise HTTPException(status_code=409, detail=f"Job is {job['status']}")
+    return {"job_id": job_id, "kind": job["kind"], "result": job["result"]}
+
+
 # ----------------------------
 # FastAPI app
 # ----------------------------
 app = FastAPI(title="Text Analysis & Summarization API")
 app.include_router(router)
+instrument_app(app, "analysis")
+REGISTRY.register_stats("analysis_cache", "Response cache statistics", response_cache.metrics)
+REGISTRY.register_stats("analysis_admission", "Admission control statistics", admission.metrics)
+REGISTRY.register_stats("analysis_jobs", "Jobs by status", lambda: job_runner.store.counts())
+REGISTRY.register_stats("keyword_lexicon", "Keyword lexicon lookups and size", lexicon.metrics)
+
+
+@app.exception_handler(Rejected)
+async def rejected_handler(http_request: Request, exc: Rejected):
+    headers = {"Retry-After": str(exc.retry_after)} if exc.retry_after else None
+    return JSONResponse(status_code=exc.status_code, content={"detail": exc.detail}, headers=headers)
+
+
+@app.get("/admission/stats")
+async def admission_stats():
+    return admission.metrics()
+
+
+@app.on_event("startup")
+async def startup_event():
+    global job_runner
+    job_runner = JobRunner(JobStore(), JOB_HANDLERS)
+    job_runner.start()
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    # Running jobs are requeued on the next start; don't hold up shutdown for them
+    job_runner.stop(timeout=0)
+
+
+@app.get("/cache/stats")
+async def cache_stats():
+    return response_cache.metrics()
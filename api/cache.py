@@ -0,0 +1,229 @@
+"""
+Response cache of the analysis API.
+
+Results are keyed by a SHA-256 of the normalized text, all request
+parameters and the names of the models that produced them. Entries live in
+an in-memory LRU with a TTL and, when API_CACHE_DIR is set, in a disk tier
+that survives restarts and is shared by the worker processes of one host.
+The disk tier is bounded by API_CACHE_DISK_MAX_BYTES: writes that push it
+over the cap (and the first write after every TTL period) prune expired
+entries, then the oldest ones.
+Concurrent identical requests are coalesced: the first one computes (in a
+worker thread, so the event loop stays free), the others await its result.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+from starlette.concurrency import run_in_threadpool
+
+CACHE_TTL = float(os.environ.get("API_CACHE_TTL", 24 * 3600))
+CACHE_MAX_ENTRIES = int(os.environ.get("API_CACHE_MAX_ENTRIES", 256))
+CACHE_DIR = os.environ.get("API_CACHE_DIR") or None
+CACHE_DISK_MAX_BYTES = int(os.environ.get("API_CACHE_DISK_MAX_BYTES", 1 << 30))
+PRUNE_TARGET = 0.8  # pruning shrinks the disk tier to this share of the cap
+# Bump to invalidate every entry, e.g. after changing model weights in place
+CACHE_VERSION = os.environ.get("API_CACHE_VERSION", "1")
+
+
+def normalize_text(text):
+    """Unicode NFC, Unix newlines and no surrounding whitespace."""
+    text = unicodedata.normalize("NFC", text)
+    return text.replace("\r\n", "\n").replace("\r", "\n").strip()
+
+
+def make_key(namespace, text, **params):
+    """Hash a (normalized) text and its parameters into a cache key."""
+    digest = hashlib.sha256()
+    digest.update(json.dumps([CACHE_VERSION, namespace, params], sort_keys=True).encode("utf-8"))
+    digest.update(b"\0")
+    digest.update(text.encode("utf-8"))
+    return digest.hexdigest()
+
+
+class ResponseCache:
+    """TTL/LRU memory cache with an optional disk tier and request coalescing."""
+
+    def __init__(self, ttl=CACHE_TTL, max_entries=CACHE_MAX_ENTRIES, directory=CACHE_DIR,
+                 disk_max_bytes=CACHE_DISK_MAX_BYTES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.directory = directory
+        self.disk_max_bytes = disk_max_bytes
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk_lock = threading.Lock()
+        self._disk_bytes = None  # running estimate, measured by the first prune
+        self._next_prune = 0.0
+        self._inflight = {}
+        self._stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "coalesced": 0, "disk_pruned": 0}
+
+    # ----------------------------
+    # Tiers
+    # ----------------------------
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], f"{key}.json")
+
+    def _read_disk(self, key):
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if entry["expires_at"] < time.time():
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+        return entry
+
+    def _write_disk(self, key, expires_at, value):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"expires_at": expires_at, "value": value}, f, ensure_ascii=False)
+        os.replace(tmp, path)
+        with self._disk_lock:
+            if self._disk_bytes is not None:
+                self._disk_bytes += os.path.getsize(path)
+            if self._disk_bytes is None or self._disk_bytes > self.disk_max_bytes or time.time() >= self._next_prune:
+                self._prune_disk()
+
+    def _prune_disk(self):
+        """Delete expired entries, then the oldest ones until the tier is below the cap."""
+        # Other processes write to the same directory, so sizes are measured, not tracked
+        now = time.time()
+        entries = []
+        total = 0
+        for dirpath, _, names in os.walk(self.directory):
+            for name in names:
+                if not name.endswith(".json"):
+                    continue
+                path = os.path.join(dirpath, name)
+                try:
+                    stat = os.stat(path)
+                    if stat.st_mtime + self.ttl < now:
+                        os.remove(path)
+                        self._stats["disk_pruned"] += 1
+                        continue
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+                total += stat.st_size
+        if total > self.disk_max_bytes:
+            entries.sort()
+            for _, size, path in entries:
+                if total <= self.disk_max_bytes * PRUNE_TARGET:
+                    break
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+                total -= size
+                self._stats["disk_pruned"] += 1
+        self._disk_bytes = total
+        self._next_prune = now + max(self.ttl, 0)
+
+    def _remember(self, key, expires_at, value):
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get(self, key):
+        """Return the cached value for `key`, or None (blocking: may read the disk tier)."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] >= time.time():
+                    self._entries.move_to_end(key)
+                    self._stats["memory_hits"] += 1
+                    return entry[1]
+                del self._entries[key]
+        if self.directory:
+            entry = self._read_disk(key)
+            if entry is not None:
+                self._remember(key, entry["expires_at"], entry["value"])
+                self._stats["disk_hits"] += 1
+                return entry["value"]
+        self._stats["misses"] += 1
+        return None
+
+    def set(self, key, value):
+        """Store a JSON-serializable value under `key` in every tier."""
+        expires_at = time.time() + self.ttl
+        self._remember(key, expires_at, value)
+        if self.directory:
+            self._write_disk(key, expires_at, value)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def metrics(self):
+        with self._lock:
+            return dict(self._stats, entries=len(self._entries), inflight=len(self._inflight))
+
+    # ----------------------------
+    # Coalescing
+    # ----------------------------
+    async def lookup(self, key):
+        """`get` without blocking the event loop on the disk tier."""
+        if not self.directory:
+            return self.get(key)
+        return await run_in_threadpool(self.get, key)
+
+    def is_computing(self, key):
+        """Whether a computation for `key` is under way (a new request would join it)."""
+        return key in self._inflight
+
+    def computation(self, key):
+        """The task computing `key`, or None when none is under way."""
+        return self._inflight.get(key)
+
+    async def _compute(self, key, compute):
+        try:
+            value = await run_in_threadpool(compute)
+            await run_in_threadpool(self.set, key, value)
+            return value
+        finally:
+            self._inflight.pop(key, None)
+
+    async def get_or_compute(self, key, compute):
+        """Return the cached value for `key`, computing it with `compute()` at most once.
+
+        Args:
+            key (str): The cache key, see `make_key`.
+            compute (Callable[[], Any]): A blocking function returning a JSON-serializable value.
+
+        Returns:
+            Any: The cached or freshly computed value.
+        """
+        task = self._inflight.get(key)
+        if task is None:
+            value = await self.lookup(key)
+            if value is not None:
+                return value
+            task = self._inflight.get(key)  # another request may have started meanwhile
+        if task is None:
+            task = asyncio.ensure_future(self._compute(key, compute))
+            # Mark a failure as retrieved even if every waiting client went away
+            task.add_done_callback(lambda t: t.cancelled() or t.exception())
+            self._inflight[key] = task
+        else:
+            self._stats["coalesced"] += 1
+        # shield: one client disconnecting must not cancel the others' result
+        return await asyncio.shield(task)
+
+
+response_cache = ResponseCache()
@@ -0,0 +1,284 @@
+"""
+Background jobs for book-scale analysis.
+
+A job (e.g. "frequent-words" for a whole book) is stored in a local SQLite
+queue, picked up by one of a fixed number of worker threads, and its result
+is persisted next to it, so clients can disconnect, poll later and fetch the
+result as often as they like. JOB_WORKERS caps how many heavy jobs run at
+once, across all the processes sharing the queue.
+
+A running job is leased to the process that claimed it (its owner), which
+renews the lease while the job runs. Jobs whose lease expired, because their
+process died or hung, are queued again by any runner on the same queue; the
+jobs of live processes are left alone, so several API processes can share
+one queue.
+"""
+
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import traceback
+import uuid
+
+JOBS_DB = os.environ.get("API_JOBS_DB", os.path.join("data", "jobs.sqlite3"))
+JOB_WORKERS = int(os.environ.get("API_JOB_WORKERS", 2))  # jobs running at once, over all processes
+POLL_INTERVAL = 1.0  # seconds between queue checks when nothing wakes a worker
+# Seconds a claimed job stays leased without a heartbeat; runners renew every third of it
+JOB_LEASE = float(os.environ.get("API_JOB_LEASE", 60))
+
+STATUSES = ("queued", "running", "done", "failed")
+
+
+def job_owner(pid=None):
+    """Owner name of the jobs claimed by a process (default: this one)."""
+    return f"{socket.gethostname()}:{pid or os.getpid()}"
+
+
+class JobStore:
+    """Jobs table in an SQLite file (WAL mode; one connection per thread)."""
+
+    def __init__(self, path=JOBS_DB):
+        self.path = path
+        self._local = threading.local()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self._connection() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    key TEXT,
+                    params TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    stage TEXT,
+                    progress TEXT NOT NULL DEFAULT '{}',
+                    result TEXT,
+                    error TEXT,
+                    created_at REAL NOT NULL,
+                    started_at REAL,
+                    finished_at REAL
+                );
+            """)
+            columns = {row["name"] for row in conn.execute("PRAGMA table_info(jobs);")}
+            for column, declaration in (("owner", "TEXT"), ("lease_expires", "REAL")):
+                if column not in columns:  # queues created before leases
+                    conn.execute(f"ALTER TABLE jobs ADD COLUMN {column} {declaration};")
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at);")
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_key ON jobs (key);")
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode = WAL;")
+            self._local.conn = conn
+        return conn
+
+    def submit(self, kind, params, key=None):
+        """Queue a job and return its id; an identical queued, running or done job is reused."""
+        with self._connection() as conn:
+            if key is not None:
+                row = conn.execute(
+                    "SELECT id FROM jobs WHERE key = ? AND status != 'failed' ORDER BY created_at DESC LIMIT 1;",
+                    (key,)
+                ).fetchone()
+                if row is not None:
+                    return row["id"]
+            job_id = uuid.uuid4().hex
+            conn.execute(
+                "INSERT INTO jobs (id, kind, key, params, status, created_at) VALUES (?, ?, ?, ?, 'queued', ?);",
+                (job_id, kind, key, json.dumps(params), time.time())
+            )
+        return job_id
+
+    def claim(self, owner=None, lease=JOB_LEASE, max_running=None):
+        """Mark the oldest queued job as running, leased to `owner` for `lease` seconds, and return it, or None.
+
+        With `max_running`, nothing is claimed while that many jobs (of any
+        process) are running.
+        """
+        owner = owner or job_owner()
+        now = time.time()
+        with self._connection() as conn:
+            row = conn.execute("""
+                UPDATE jobs SET status = 'running', started_at = ?, owner = ?, lease_expires = ?
+                WHERE id = (SELECT id FROM jobs WHERE status = 'queued' ORDER BY created_at LIMIT 1)
+                  AND status = 'queued'
+                  AND (? IS NULL OR (SELECT count(*) FROM jobs WHERE status = 'running') < ?)
+                RETURNING id, kind, params;
+            """, (now, owner, now + lease, max_running, max_running)).fetchone()
+        if row is None:
+            return None
+        return {"id": row["id"], "kind": row["kind"], "params": json.loads(row["params"]), "owner": owner}
+
+    def renew(self, owner, lease=JOB_LEASE):
+        """Extend the leases of the jobs `owner` is running; returns how many."""
+        with self._connection() as conn:
+            return conn.execute(
+                "UPDATE jobs SET lease_expires = ? WHERE status = 'running' AND owner = ?;",
+                (time.time() + lease, owner)
+            ).rowcount
+
+    def set_progress(self, job_id, stage, done=None, total=None):
+        with self._connection() as conn:
+            conn.execute("""
+                UPDATE jobs SET stage = ?, progress = json_set(progress, '$.' || ?, json(?))
+                WHERE id = ?;
+            """, (stage, stage, json.dumps({"done": done, "total": total}), job_id))
+
+    # With an `owner`, finish and fail only apply while that owner still
+    # holds the job: a job requeued from under a hung process is not
+    # overwritten when that process comes back
+
+    def finish(self, job_id, result, owner=None):
+        with self._connection() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = 'done', stage = NULL, result = ?, finished_at = ?, lease_expires = NULL "
+                "WHERE id = ? AND (? IS NULL OR (owner = ? AND status = 'running'));",
+                (json.dumps(result, ensure_ascii=False), time.time(), job_id, owner, owner)
+            )
+
+    def fail(self, job_id, error, owner=None):
+        with self._connection() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = 'failed', error = ?, finished_at = ?, lease_expires = NULL "
+                "WHERE id = ? AND (? IS NULL OR (owner = ? AND status = 'running'));",
+                (error, time.time(), job_id, owner, owner)
+            )
+
+    def requeue_owner(self, owner):
+        """Queue again the running jobs of `owner` (a process known to be dead); returns how many."""
+        with self._connection() as conn:
+            return conn.execute("""
+                UPDATE jobs SET status = 'queued', stage = NULL, started_at = NULL, owner = NULL, lease_expires = NULL
+                WHERE status = 'running' AND owner = ?;
+            """, (owner,)).rowcount
+
+    def requeue_expired(self):
+        """Queue again the running jobs whose lease expired (their process died or hung); returns how many."""
+        with self._connection() as conn:
+            return conn.execute("""
+                UPDATE jobs SET status = 'queued', stage = NULL, started_at = NULL, owner = NULL, lease_expires = NULL
+                WHERE status = 'running' AND (lease_expires IS NULL OR lease_expires < ?);
+            """, (time.time(),)).rowcount
+
+    def get(self, job_id, with_result=False):
+        """Return the job as a dict (the result only if `with_result`), or None."""
+        columns = "*" if with_result else "id, kind, status, stage, progress, error, created_at, started_at, finished_at"
+        row = self._connection().execute(f"SELECT {columns} FROM jobs WHERE id = ?;", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job["progress"] = json.loads(job["progress"])
+        if with_result:
+            job["params"] = json.loads(job["params"])
+            job["result"] = json.loads(job["result"]) if job["result"] else None
+        return job
+
+    def counts(self):
+        rows = self._connection().execute("SELECT status, count(*) AS n FROM jobs GROUP BY status;")
+        return {status: 0 for status in STATUSES} | {row["status"]: row["n"] for row in rows}
+
+
+class JobRunner:
+    """Worker threads that run queued jobs with the handler registered for their kind.
+
+    A handler is called as `handler(params, progress)` and returns a
+    JSON-serializable result; `progress(stage, done=None, total=None)` records
+    how far the job got. A worker only claims a job while fewer than `workers`
+    jobs are running in the store, so runners in several processes together
+    still run at most `workers` jobs.
+    """
+
+    def __init__(self, store, handlers, workers=JOB_WORKERS, lease=JOB_LEASE):
+        self.store = store
+        self.handlers = handlers
+        self.workers = workers
+        self.lease = lease
+        self.owner = job_owner()
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._threads = []
+
+    def start(self):
+        """Start the workers and the heartbeat that renews their leases."""
+        self._requeue_expired()
+        self._stopping.clear()
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f"job-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        thread = threading.Thread(target=self._heartbeat, name="job-heartbeat", daemon=True)
+        thread.start()
+        self._threads.append(thread)
+
+    def stop(self, timeout=None):
+        """Stop taking new jobs and wait for the running ones to finish."""
+        self._stopping.set()
+        self._wakeup.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def _requeue_expired(self):
+        requeued = self.store.requeue_expired()
+        if requeued:
+            print(f"[jobs] Requeued {requeued} jobs with an expired lease")
+            self._wakeup.set()
+
+    def _heartbeat(self):
+        # Keep this process's leases alive and take over the jobs of dead processes
+        while not self._stopping.wait(self.lease / 3):
+            try:
+                self.store.renew(self.owner, self.lease)
+                self._requeue_expired()
+            except sqlite3.Error as e:
+                print(f"[jobs] Heartbeat failed: {e}")
+
+    def submit(self, kind, params, key=None):
+        if kind not in self.handlers:
+            raise ValueError(f"Unknown job kind: {kind}")
+        job_id = self.store.submit(kind, params, key)
+        self._wakeup.set()
+        return job_id
+
+    def _work(self):
+        while not self._stopping.is_set():
+            try:
+                job = self.store.claim(self.owner, self.lease, max_running=self.workers)
+                if job is None:
+                    self._wakeup.wait(POLL_INTERVAL)
+                    self._wakeup.clear()
+                    continue
+                self._run(job)
+            except Exception as e:
+                # e.g. the queue stayed locked past the timeout: keep the worker
+                # alive and back off. A job that could not even be marked failed
+                # stays running until this process is gone, then is requeued
+                traceback.print_exc()
+                print(f"[jobs] Worker error, retrying in {POLL_INTERVAL} s: {e}")
+                self._stopping.wait(POLL_INTERVAL)
+
+    def _run(self, job):
+        def progress(stage, done=None, total=None):
+            # Progress is informational: failing to record it does not fail the job
+            try:
+                self.store.set_progress(job["id"], stage, done, total)
+            except sqlite3.Error as e:
+                print(f"[jobs] Progress of job {job['id']} not recorded: {e}")
+
+        started = time.perf_counter()
+        try:
+            result = self.handlers[job["kind"]](job["params"], progress)
+            # Inside the try: a result that cannot be stored fails the job too
+            self.store.finish(job["id"], result, self.owner)
+        except Exception as e:
+            traceback.print_exc()
+            self.store.fail(job["id"], str(e), self.owner)
+            print(f"[jobs] {job['kind']} job {job['id']} failed: {e}")
+            return
+        print(f"[jobs] {job['kind']} job {job['id']} done in {time.perf_counter() - started:.1f} s")
@@ -0,0 +1,160 @@
+"""
+Pre-fork server for the analysis API.
+
+`uvicorn --workers N` starts every worker as a fresh interpreter, so each of
+them loads its own multi-GB copy of the models. Here the parent process
+imports the app and loads the models once, then forks the workers: they
+inherit the weights copy-on-write and, since inference never writes to
+them, all workers keep sharing the same physical pages. The extra memory of
+a worker is its USS (see instrumentation.memory), not its RSS.
+
+The parent only supervises: it owns the listening socket (workers accept on
+it in turn), restarts workers that die (queueing their running jobs again),
+forwards SIGINT/SIGTERM to them for a graceful shutdown and prints a
+per-worker memory report on SIGUSR1.
+
+Limits stay those of one server: the admission budget is split between the
+workers, and the job queue caps the running jobs over all of them. Each
+worker serves /metrics for itself, so every sample is labelled with its pid.
+
+Usage:
+    python -m api.serve --workers 4 --port 8000
+    kill -USR1 <server pid>                       # memory report
+"""
+
+import argparse
+import gc
+import os
+import signal
+import socket
+import sys
+import time
+
+from instrumentation.memory import format_report, memory_report
+
+HOST = os.environ.get("API_HOST", "127.0.0.1")
+PORT = int(os.environ.get("API_PORT", 8000))
+WORKERS = int(os.environ.get("API_WORKERS", 4))
+# torch threads per worker (default: the CPUs split between the workers)
+TORCH_THREADS = int(os.environ.get("API_TORCH_THREADS", 0)) or None
+RESTART_DELAY = 1.0  # seconds before restarting a worker that died young
+
+
+def preload():
+    """Import the app and load every model in this (the parent) process; returns the app."""
+    import api.api as api_module
+    from translation_summary import mbart
+    from words_context import context
+
+    started = time.perf_counter()
+    context.load_model()
+    mbart.load_models()  # reuses the keyword translator's mBART
+    for model in (context.model, mbart.summarizer_model, mbart.mt_model):
+        model.eval()
+    print(f"[serve] Models loaded in {time.perf_counter() - started:.1f} s")
+    return api_module.app
+
+
+def run_worker(app, sock, threads, log_level):
+    import torch
+    import uvicorn
+
+    # Drop the supervisor's handlers: uvicorn re-raises the signals it caught on exit
+    for sig in (signal.SIGINT, signal.SIGTERM, signal.SIGUSR1):
+        signal.signal(sig, signal.SIG_DFL)
+    torch.set_num_threads(threads)
+    server = uvicorn.Server(uvicorn.Config(app, log_level=log_level))
+    server.run(sockets=[sock])
+
+
+def serve(host=HOST, port=PORT, workers=WORKERS, threads=TORCH_THREADS, log_level="info"):
+    from api.admission import admission
+    from api.jobs import JobStore, job_owner
+    from instrumentation.metrics import REGISTRY
+
+    app = preload()
+    admission.budget = max(1, admission.budget // workers)
+    REGISTRY.pid_label = True
+    threads = threads or max(1, (os.cpu_count() or 1) // workers)
+    sock = socket.create_server((host, port), backlog=2048)
+    sock.set_inheritable(True)
+
+    # Objects that exist now live until exit: keep the collector from writing
+    # to (and so un-sharing) their pages in the workers
+    gc.collect()
+    gc.freeze()
+
+    children = {}  # pid -> start time
+    stopping = False
+
+    def spawn():
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                run_worker(app, sock, threads, log_level)
+            except BaseException:
+                import traceback
+                traceback.print_exc()
+                code = 1
+            finally:
+                os._exit(code)
+        children[pid] = time.monotonic()
+
+    def stop(sig, frame):
+        nonlocal stopping
+        stopping = True
+        # SIGTERM even for Ctrl-C: the workers got that SIGINT already, and a
+        # second one would make uvicorn skip the graceful shutdown
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def report(sig, frame):
+        print(format_report(memory_report([os.getpid(), *children])), flush=True)
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGUSR1, report)
+
+    for _ in range(workers):
+        spawn()
+    print(f"[serve] Listening on http://{host}:{port} with {workers} workers "
+          f"({threads} torch threads and a token budget of {admission.budget} each); "
+          f"memory report: kill -USR1 {os.getpid()}", flush=True)
+
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        started = children.pop(pid, None)
+        if started is None:
+            continue
+        # Its jobs will not finish: queue them again now, not when their lease runs out
+        requeued = JobStore().requeue_owner(job_owner(pid))
+        if requeued:
+            print(f"[serve] Requeued {requeued} jobs of worker {pid}")
+        if stopping:
+            continue
+        print(f"[serve] Worker {pid} exited with status {os.waitstatus_to_exitcode(status)}; restarting")
+        if time.monotonic() - started < RESTART_DELAY:
+            time.sleep(RESTART_DELAY)  # don't spin on a worker that cannot start
+        if not stopping:
+            spawn()
+    sock.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--workers", type=int, default=WORKERS)
+    parser.add_argument("--threads", type=int, default=TORCH_THREADS, help="torch threads per worker")
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args()
+    if not hasattr(os, "fork"):
+        sys.exit("The pre-fork server needs os.fork (Linux/macOS)")
+    serve(args.host, args.port, args.workers, args.threads, args.log_level)
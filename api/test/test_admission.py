@@ -0,0 +1,81 @@
+import asyncio
+
+import pytest
+
+from api.admission import AdmissionController, Rejected, estimate_cost
+
+
+def test_cost_grows_with_text_and_stages():
+    text = "Das Haus ist alt. " * 100
+    assert estimate_cost(text, ["analysis"]) < estimate_cost(text, ["analysis", "translation"])
+    assert estimate_cost(text * 2, ["analysis"]) > estimate_cost(text, ["analysis"])
+
+
+def test_waiting_clients_are_served_round_robin():
+    async def run():
+        controller = AdmissionController(budget=10, max_queue=10, max_queue_per_client=5, max_wait=5)
+        await controller.acquire("busy", 10)
+        order = []
+
+        async def request(client, name):
+            async with controller.admit(client, 10):
+                order.append(name)
+
+        tasks = [asyncio.create_task(request("greedy", f"greedy{i}")) for i in range(3)]
+        tasks.append(asyncio.create_task(request("polite", "polite")))
+        await asyncio.sleep(0)
+        assert controller.metrics()["queue_depth"] == 4
+        controller.release(10)
+        await asyncio.gather(*tasks)
+        return order, controller.metrics()
+
+    order, metrics = asyncio.run(run())
+    assert order == ["greedy0", "polite", "greedy1", "greedy2"]
+    assert metrics["in_flight"] == 0 and metrics["queue_depth"] == 0
+
+
+def test_saturation_is_rejected_fast():
+    async def run():
+        controller = AdmissionController(budget=10, max_queue=1, max_queue_per_client=1, max_wait=0.05)
+        await controller.acquire("a", 10)
+        with pytest.raises(Rejected) as too_large:
+            await controller.acquire("a", 11)
+        waiting = asyncio.create_task(controller.acquire("b", 5))
+        await asyncio.sleep(0)
+        with pytest.raises(Rejected) as queue_full:
+            await controller.acquire("c", 5)
+        with pytest.raises(Rejected) as timed_out:
+            await waiting
+        return too_large.value, queue_full.value, timed_out.value, controller.metrics()
+
+    too_large, queue_full, timed_out, metrics = asyncio.run(run())
+    assert too_large.status_code == 413
+    assert queue_full.status_code == 429 and queue_full.retry_after >= 1
+    assert timed_out.status_code == 429
+    assert metrics["rejected_queue_full"] == 1 and metrics["rejected_timeout"] == 1
+    assert metrics["queue_depth"] == 0
+
+
+def test_leaving_head_of_queue_admits_the_next_waiter():
+    async def run():
+        controller = AdmissionController(budget=10, max_queue=10, max_queue_per_client=5, max_wait=0.3)
+        await controller.acquire("busy", 6)
+        big = asyncio.create_task(controller.acquire("big", 10))
+        await asyncio.sleep(0.1)
+        small = asyncio.create_task(controller.acquire("small", 4))
+        with pytest.raises(Rejected):
+            await big
+        # Admitted when the big request timed out, not at its own timeout
+        await asyncio.wait_for(small, 0.1)
+
+        big = asyncio.create_task(controller.acquire("big", 10))
+        await asyncio.sleep(0)
+        small = asyncio.create_task(controller.acquire("small", 4))
+        await asyncio.sleep(0)
+        controller.release(4)
+        big.cancel()
+        await asyncio.wait_for(small, 0.1)
+        return controller.metrics()
+
+    metrics = asyncio.run(run())
+    assert metrics["in_flight"] == 10 and metrics["queue_depth"] == 0
@@ -0,0 +1,249 @@
+import asyncio
+import importlib
+import json
+import sys
+import threading
+import types
+
+import pytest
+from fastapi.testclient import TestClient
+
+from api.admission import AdmissionController
+from api.cache import ResponseCache
+from words_context.lexicon import Lexicon, build_index
+
+
+def _import_api():
+    """Import api.api; the model modules are stubbed when torch/transformers are missing."""
+    stubs = {
+        "words_context.context": dict(iter_keyword_sentences=None, model_name="stub-mt"),
+        "translation_summary.mbart": dict(summarize_and_translate=None, SUMMARIZER_NAME="stub-sum",
+                                          MT_MODEL_NAME="stub-mt"),
+    }
+    saved = {name: sys.modules.get(name) for name in stubs}
+    for name, attrs in stubs.items():
+        try:
+            importlib.import_module(name)
+        except ImportError:
+            sys.modules[name] = types.SimpleNamespace(**attrs)
+    try:
+        return importlib.import_module("api.api")
+    finally:
+        # Other tests import the real modules (or skip without torch)
+        for name, module in saved.items():
+            if module is None:
+                sys.modules.pop(name, None)
+            else:
+                sys.modules[name] = module
+
+
+api_module = _import_api()
+client = TestClient(api_module.app)
+
+REQUEST = {"text": "Das Haus ist alt. Der Baum ist grün.", "lang": "de", "top_pct": 10, "to_lang": "en"}
+
+
+def keyword_entries(text, keywords, translate_to=None, fail_after=None):
+    for i, word in enumerate(keywords):
+        if i == fail_after:
+            raise RuntimeError("translation failed")
+        yield word, {"translation": word.upper(), "context": [{"sentence": f"{word}.", "translation": "x"}]}
+
+
+@pytest.fixture
+def pipeline(monkeypatch, tmp_path):
+    calls = []
+
+    def frequent_words(text, lang, top_pct):
+        calls.append(text)
+        return [("haus", 2), ("baum", 1)]
+
+    monkeypatch.setattr(api_module, "extract_frequent_words", frequent_words)
+    monkeypatch.setattr(api_module, "iter_keyword_sentences", keyword_entries)
+    monkeypatch.setattr(api_module, "response_cache", ResponseCache(ttl=60))
+    monkeypatch.setattr(api_module, "admission", AdmissionController(budget=10_000))
+    monkeypatch.setattr(api_module, "lexicon", Lexicon(str(tmp_path / "lexicon.idx"), str(tmp_path / "overlay.sqlite3")))
+    return calls
+
+
+def stream(request=REQUEST):
+    response = client.post("/frequent-words/stream", json=request)
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    return [json.loads(line) for line in response.text.splitlines()]
+
+
+def test_stream_lines(pipeline):
+    lines = stream()
+    assert [line["type"] for line in lines] == ["analysis", "keyword", "keyword", "done"]
+    assert lines[0]["vocabulary"] == ["haus", "baum"]
+    assert lines[1] == {"type": "keyword", "word": "haus", "translation": "HAUS",
+                        "context": [{"sentence": "haus.", "translation": "x"}]}
+    assert lines[-1] == {"type": "done", "keywords": 2}
+
+
+def test_completed_stream_fills_the_cache(pipeline):
+    first = stream()
+    key = api_module.frequent_words_key(api_module.normalize_text(REQUEST["text"]),
+                                        api_module.FrequentWordsRequest(**REQUEST))
+    assert api_module.response_cache.get(key) == api_module.collect_frequent_words(first[:-1])
+    # Served from the cache: same lines, no second analysis
+    assert stream() == first
+    assert len(pipeline) == 1
+
+
+def test_error_line_and_no_cache_for_partial_stream(pipeline, monkeypatch):
+    monkeypatch.setattr(api_module, "iter_keyword_sentences",
+                        lambda text, keywords, translate_to=None: keyword_entries(text, keywords, fail_after=1))
+    lines = stream()
+    assert [line["type"] for line in lines] == ["analysis", "keyword", "error"]
+    assert lines[-1]["detail"] == "translation failed"
+    assert api_module.response_cache.metrics()["entries"] == 0
+
+    monkeypatch.setattr(api_module, "iter_keyword_sentences", keyword_entries)
+    assert stream()[-1]["type"] == "done"
+    assert len(pipeline) == 2
+
+
+def test_stream_releases_its_cost(pipeline):
+    stream()
+    assert api_module.admission.in_flight == 0
+    assert api_module.admission.metrics()["admitted"] == 1
+
+
+def test_stream_releases_its_cost_when_never_sent(pipeline):
+    async def run():
+        api_module.admission.in_flight = 5
+        response = api_module.AdmittedStreamingResponse(iter(["line\n"]), 5)
+
+        async def receive():
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            raise OSError("client went away")
+
+        with pytest.raises(OSError):
+            await response({"type": "http", "method": "POST"}, receive, send)
+
+    asyncio.run(run())
+    assert api_module.admission.in_flight == 0
+
+
+def test_cancelled_request_holds_its_cost_until_computed(pipeline):
+    started, unblock = threading.Event(), threading.Event()
+
+    def compute():
+        started.set()
+        unblock.wait(5)
+        return {"value": 1}
+
+    async def run():
+        http_request = types.SimpleNamespace(headers={}, client=None)
+        request = asyncio.ensure_future(api_module.cached_or_admitted(http_request, "key", 100, compute))
+        while not started.is_set():
+            await asyncio.sleep(0.01)
+        request.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await request
+        assert api_module.admission.in_flight == 100  # still computing
+        unblock.set()
+        while api_module.response_cache.computation("key") is not None:
+            await asyncio.sleep(0.01)
+        await asyncio.sleep(0)
+        assert api_module.admission.in_flight == 0
+
+    asyncio.run(run())
+    assert api_module.response_cache.get("key") == {"value": 1}
+
+
+def test_cache_key_follows_pipeline_and_lexicon(pipeline, monkeypatch, tmp_path):
+    request = api_module.FrequentWordsRequest(**REQUEST)
+    key = api_module.frequent_words_key("text", request)
+    lexicon = api_module.lexicon
+
+    lexicon.learn("haus", "de", "en", "house")  # a model translation: same answers
+    assert api_module.frequent_words_key("text", request) == key
+    lexicon.learn("haus", "de", "en", "home", user_id="anna")
+    assert api_module.frequent_words_key("text", request) != key
+
+    key = api_module.frequent_words_key("text", request)
+    build_index([("de", "en", "haus", "house")], lexicon.path)
+    assert api_module.frequent_words_key("text", request) != key
+
+    key = api_module.frequent_words_key("text", request)
+    monkeypatch.setattr(api_module, "pipeline_name", lambda lang: f"{lang}_core_news_sm-9.9.9")
+    assert api_module.frequent_words_key("text", request) != key
+
+
+@pytest.fixture
+def jobs(pipeline, monkeypatch, tmp_path):
+    """A job runner on a fresh queue; its workers are started by the test."""
+    finished = threading.Event()
+
+    def count_words(params, progress):
+        progress("count", 1, 1)
+        finished.set()
+        return {"words": len(params["text"].split())}
+
+    runner = api_module.JobRunner(api_module.JobStore(str(tmp_path / "jobs.sqlite3")),
+                                  {"frequent-words": count_words}, workers=1)
+    monkeypatch.setattr(api_module, "job_runner", runner)
+    yield runner, finished
+    runner.stop()
+
+
+def test_job_submit_poll_and_result(jobs):
+    runner, finished = jobs
+    response = client.post("/jobs", json={"kind": "frequent-words", "text": "a b c"})
+    assert response.status_code == 202 and response.json()["status"] == "queued"
+    job_id = response.json()["job_id"]
+    assert client.post("/jobs", json={"kind": "frequent-words", "text": "a b c"}).json()["job_id"] == job_id
+
+    assert client.get(f"/jobs/{job_id}").json()["status"] == "queued"
+    assert client.get(f"/jobs/{job_id}/result").status_code == 409
+
+    runner.start()
+    assert finished.wait(5)
+    runner.stop()
+    job = client.get(f"/jobs/{job_id}").json()
+    assert job["status"] == "done" and job["progress"] == {"count": {"done": 1, "total": 1}}
+    assert client.get(f"/jobs/{job_id}/result").json() == {
+        "job_id": job_id, "kind": "frequent-words", "result": {"words": 3}
+    }
+
+
+def test_unknown_job_is_404(jobs):
+    assert client.get("/jobs/missing").status_code == 404
+    assert client.get("/jobs/missing/result").status_code == 404
+    assert client.post("/jobs", json={"kind": "translate", "text": "a"}).status_code == 400
+
+
+def test_job_result_of_a_stale_owner_is_not_served(jobs):
+    runner, _ = jobs
+    job_id = client.post("/jobs", json={"kind": "frequent-words", "text": "a b c"}).json()["job_id"]
+    runner.store.claim("host:hung", lease=-1)
+    runner.store.requeue_expired()
+    runner.store.claim("host:alive", lease=60)
+
+    runner.store.finish(job_id, {"words": 0}, owner="host:hung")
+    assert client.get(f"/jobs/{job_id}").json()["status"] == "running"
+    assert client.get(f"/jobs/{job_id}/result").status_code == 409
+
+    runner.store.fail(job_id, "worker crashed", owner="host:alive")
+    response = client.get(f"/jobs/{job_id}/result")
+    assert response.status_code == 500 and response.json()["detail"] == "worker crashed"
+
+
+def test_rejected_requests_get_status_and_retry_after(pipeline, monkeypatch):
+    monkeypatch.setattr(api_module, "admission", AdmissionController(budget=10))
+    response = client.post("/frequent-words", json=REQUEST)
+    assert response.status_code == 413
+    assert "submit it as a job" in response.json()["detail"]
+
+    controller = AdmissionController(budget=10_000, max_queue=0)
+    controller.in_flight = controller.budget
+    monkeypatch.setattr(api_module, "admission", controller)
+    response = client.post("/frequent-words/stream", json=REQUEST)
+    assert response.status_code == 429
+    assert response.json() == {"detail": "Service is saturated"}
+    assert response.headers["retry-after"] == "1"
@@ -0,0 +1,59 @@
+import asyncio
+import threading
+import time
+
+from api.cache import ResponseCache, make_key, normalize_text
+
+
+def test_key_ignores_text_formatting_but_not_parameters():
+    text = normalize_text("Das Haus.\r\n")
+    assert make_key("frequent-words", text, lang="de") == make_key("frequent-words", normalize_text(" Das Haus.\n"), lang="de")
+    assert make_key("frequent-words", text, lang="de") != make_key("frequent-words", text, lang="en")
+
+
+def test_concurrent_requests_share_one_computation():
+    cache = ResponseCache(ttl=60, max_entries=2)
+    calls = []
+
+    def compute():
+        calls.append(threading.get_ident())
+        time.sleep(0.05)
+        return {"summary": "ok"}
+
+    async def run():
+        return await asyncio.gather(*(cache.get_or_compute("k", compute) for _ in range(5)))
+
+    assert asyncio.run(run()) == [{"summary": "ok"}] * 5
+    assert len(calls) == 1
+    assert cache.metrics()["coalesced"] == 4
+    assert asyncio.run(cache.get_or_compute("k", compute)) == {"summary": "ok"}
+    assert len(calls) == 1
+
+
+def test_disk_tier_and_expiry(tmp_path):
+    cache = ResponseCache(ttl=60, directory=str(tmp_path))
+    cache.set("abc", {"value": 1})
+    assert ResponseCache(directory=str(tmp_path)).get("abc") == {"value": 1}
+
+    expired = ResponseCache(ttl=-1, directory=str(tmp_path))
+    expired.set("old", {"value": 2})
+    assert expired.get("old") is None
+
+
+def test_disk_tier_is_pruned_to_its_cap(tmp_path):
+    cache = ResponseCache(ttl=60, directory=str(tmp_path), disk_max_bytes=1000)
+    for i in range(20):
+        cache.set(f"key{i:02d}", {"value": "x" * 100})
+        time.sleep(0.01)  # distinct modification times
+    files = list(tmp_path.rglob("*.json"))
+    assert sum(f.stat().st_size for f in files) <= 1000
+    assert ResponseCache(directory=str(tmp_path)).get("key19") == {"value": "x" * 100}
+    assert ResponseCache(directory=str(tmp_path)).get("key00") is None
+    assert cache.metrics()["disk_pruned"] >= 10
+
+
+def test_expired_disk_entries_are_pruned_on_write(tmp_path):
+    expired = ResponseCache(ttl=-1, directory=str(tmp_path))
+    expired.set("old", {"value": 1})
+    ResponseCache(ttl=60, directory=str(tmp_path)).set("new", {"value": 2})
+    assert [f.name for f in tmp_path.rglob("*.json")] == ["new.json"]
@@ -0,0 +1,126 @@
+import sqlite3
+import threading
+
+from api.jobs import JobRunner, JobStore
+
+
+def test_job_runs_and_result_persists(tmp_path):
+    finished = threading.Event()
+
+    def count_words(params, progress):
+        words = params["text"].split()
+        for i, _ in enumerate(words, 1):
+            progress("count", i, len(words))
+        finished.set()
+        return {"words": len(words)}
+
+    store = JobStore(str(tmp_path / "jobs.sqlite3"))
+    runner = JobRunner(store, {"count": count_words}, workers=1)
+    runner.start()
+    job_id = runner.submit("count", {"text": "a b c"}, key="k")
+    assert runner.submit("count", {"text": "a b c"}, key="k") == job_id
+    assert finished.wait(5)
+    runner.stop()
+
+    job = JobStore(str(tmp_path / "jobs.sqlite3")).get(job_id, with_result=True)
+    assert job["status"] == "done"
+    assert job["progress"] == {"count": {"done": 3, "total": 3}}
+    assert job["result"] == {"words": 3}
+
+
+def test_interrupted_jobs_are_requeued(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.sqlite3"))
+    job_id = store.submit("count", {"text": "a"})
+    assert store.claim("dead", lease=-1)["id"] == job_id
+    assert store.claim() is None
+
+    assert store.requeue_expired() == 1
+    assert store.get(job_id)["status"] == "queued"
+    assert store.counts()["queued"] == 1
+
+
+def test_leased_jobs_are_not_requeued(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.sqlite3"))
+    job_id = store.submit("count", {"text": "a"})
+    assert store.claim("other", lease=60)["id"] == job_id
+    assert store.requeue_expired() == 0
+    assert store.get(job_id)["status"] == "running"
+
+    # Starting another runner on the same queue leaves the job to its owner
+    runner = JobRunner(store, {"count": lambda params, progress: {}}, workers=1)
+    runner.start()
+    runner.stop()
+    assert store.get(job_id)["status"] == "running"
+    assert store.renew("other") == 1
+
+
+def test_stale_owner_cannot_finish_requeued_job(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.sqlite3"))
+    job_id = store.submit("count", {"text": "a"})
+    store.claim("slow", lease=-1)
+    store.requeue_expired()
+    store.claim("fresh", lease=60)
+
+    store.finish(job_id, {"words": 0}, owner="slow")
+    assert store.get(job_id)["status"] == "running"
+    store.finish(job_id, {"words": 1}, owner="fresh")
+    assert store.get(job_id, with_result=True)["result"] == {"words": 1}
+
+
+def test_running_jobs_are_capped_across_runners(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.sqlite3"))
+    first, second = store.submit("count", {}), store.submit("count", {})
+    assert store.claim("worker-1", max_running=1)["id"] == first
+    assert store.claim("worker-2", max_running=1) is None  # another process's job counts too
+    assert store.claim("worker-2", max_running=2)["id"] == second
+
+
+def test_dead_owner_jobs_are_requeued(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.sqlite3"))
+    dead, alive = store.submit("count", {}), store.submit("count", {})
+    store.claim("host:1", lease=60)
+    store.claim("host:2", lease=60)
+    assert store.requeue_owner("host:1") == 1
+    assert store.get(dead)["status"] == "queued" and store.get(alive)["status"] == "running"
+
+
+def test_unstorable_result_fails_the_job(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.sqlite3"))
+    runner = JobRunner(store, {"count": lambda params, progress: {"words": {"a", "b"}}}, workers=1)
+    job_id = store.submit("count", {})
+    runner._run(store.claim(runner.owner))
+    job = store.get(job_id)
+    assert job["status"] == "failed" and "JSON serializable" in job["error"]
+
+
+def test_queue_errors_do_not_kill_workers(tmp_path, monkeypatch):
+    monkeypatch.setattr("api.jobs.POLL_INTERVAL", 0.01)
+    store = JobStore(str(tmp_path / "jobs.sqlite3"))
+    finished = threading.Event()
+
+    def count(params, progress):
+        progress("count", 1, 1)
+        finished.set()
+        return {"words": 1}
+
+    claim, set_progress, errors = store.claim, store.set_progress, []
+
+    def flaky(operation):
+        def call(*args, **kwargs):
+            if operation not in errors:
+                errors.append(operation)
+                raise sqlite3.OperationalError("database is locked")
+            return operation(*args, **kwargs)
+        return call
+
+    monkeypatch.setattr(store, "claim", flaky(claim))
+    monkeypatch.setattr(store, "set_progress", flaky(set_progress))
+    runner = JobRunner(store, {"count": count}, workers=1)
+    job_id = store.submit("count", {})
+    runner.start()
+    assert finished.wait(5)
+    runner.stop()
+
+    job = store.get(job_id, with_result=True)
+    assert errors == [claim, set_progress]
+    assert job["status"] == "done" and job["result"] == {"words": 1}
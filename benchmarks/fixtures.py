@@ -0,0 +1,146 @@
+"""
+Deterministic inputs for the offline benchmarks.
+
+Everything is generated from a fixed seed, nothing is downloaded: book-sized
+German-like texts (a Zipf-distributed vocabulary with real function words, so
+language detection and stopword removal have work to do) and tiny randomly
+initialized BART/mBART models with a word-level tokenizer over the same
+vocabulary. The tiny models make the throughput of the model stages measure
+our pipeline code (chunking, batching, generate calls), not the weights.
+"""
+
+import random
+
+SEED = 1234
+VOCABULARY_SIZE = 5000
+
+# Frequent real words head the vocabulary, so the text is detected as German
+FUNCTION_WORDS = (
+    "der die und in den von zu das mit sich des auf für ist im dem nicht ein "
+    "eine als auch es an werden aus er hat dass sie nach wird bei einer um am "
+    "sind noch wie einem über einen so zum war haben nur oder aber vor zur bis"
+).split()
+SYLLABLES = (
+    "ba be bi bo bu ka ke ki ko ku la le li lo lu ma me mi mo mu na ne ni no nu "
+    "ra re ri ro ru sa se si so su ta te ti to tu ung en er ein au ei sch ch"
+).split()
+PUNCTUATION = [".", ",", "!", "?", ":", ";", "-"]
+
+# mBART language codes known to the tiny tokenizer
+LANG_CODES = ["en_XX", "de_DE", "es_XX", "fr_XX", "ru_RU", "zh_CN", "ar_AR",
+              "it_IT", "pt_XX", "hi_IN", "ja_XX", "ko_KR"]
+
+# Tiny model dimensions (a few hundred thousand parameters)
+TINY_CONFIG = dict(
+    d_model=32,
+    encoder_layers=1,
+    decoder_layers=1,
+    encoder_attention_heads=2,
+    decoder_attention_heads=2,
+    encoder_ffn_dim=64,
+    decoder_ffn_dim=64,
+    max_position_embeddings=1024,
+)
+
+
+# ----------------------------
+# Texts
+# ----------------------------
+def vocabulary(size=VOCABULARY_SIZE, seed=SEED):
+    """Return `size` distinct words, most frequent first."""
+    rng = random.Random(seed)
+    words = list(FUNCTION_WORDS)
+    seen = set(words)
+    while len(words) < size:
+        word = "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4)))
+        if word not in seen:
+            seen.add(word)
+            words.append(word)
+    return words
+
+
+def generate_text(n_chars, seed=SEED):
+    """Generate about `n_chars` characters of paragraphs of German-like sentences."""
+    rng = random.Random(seed)
+    words = vocabulary()
+    weights = [1 / rank for rank in range(1, len(words) + 1)]
+    paragraphs = []
+    size = 0
+    while size < n_chars:
+        sentences = []
+        for _ in range(rng.randint(3, 8)):
+            sentence = " ".join(rng.choices(words, weights, k=rng.randint(5, 20)))
+            sentences.append(sentence[0].upper() + sentence[1:] + rng.choice("....!?"))
+        paragraph = " ".join(sentences)
+        paragraphs.append(paragraph)
+        size += len(paragraph) + 2
+    return "\n\n".join(paragraphs)
+
+
+def to_html(text):
+    """Wrap the paragraphs of `text` in HTML like a scraped web page."""
+    body = "\n".join(f"<p class=\"text\">{paragraph}</p>" for paragraph in text.split("\n\n"))
+    return f"<html><head><title>Buch</title></head><body><div id=\"content\">\n{body}\n</div></body></html>"
+
+
+def write_book(path, n_chars, html=False):
+    text = generate_text(n_chars)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(to_html(text) if html else text)
+    return path
+
+
+# ----------------------------
+# Tiny models
+# ----------------------------
+def tiny_tokenizer(words=None):
+    """Word-level fast tokenizer over `words`, with mBART-50 style language codes."""
+    from tokenizers import Tokenizer, decoders, models, normalizers, pre_tokenizers
+    from transformers import PreTrainedTokenizerFast
+
+    words = vocabulary() if words is None else words
+    tokens = ["<s>", "<pad>", "</s>", "<unk>", *LANG_CODES, *PUNCTUATION, *words]
+    vocab = {token: i for i, token in enumerate(dict.fromkeys(tokens))}
+    backend = Tokenizer(models.WordLevel(vocab, unk_token="<unk>"))
+    backend.normalizer = normalizers.Lowercase()
+    backend.pre_tokenizer = pre_tokenizers.Whitespace()
+    backend.decoder = decoders.WordPiece()  # joins tokens with spaces
+
+    tokenizer = PreTrainedTokenizerFast(
+        tokenizer_object=backend, bos_token="<s>", eos_token="</s>",
+        pad_token="<pad>", unk_token="<unk>", model_max_length=1024,
+    )
+    # What the pipeline uses of MBart50TokenizerFast
+    tokenizer.lang_code_to_id = {code: vocab[code] for code in LANG_CODES}
+    tokenizer.src_lang = "en_XX"
+    return tokenizer
+
+
+def tiny_model(kind, vocab_size, seed=SEED):
+    """Randomly initialized "bart" or "mbart" seq2seq model of TINY_CONFIG size."""
+    import torch
+    from transformers import BartConfig, BartForConditionalGeneration, MBartConfig, MBartForConditionalGeneration
+
+    config_class, model_class = {
+        "bart": (BartConfig, BartForConditionalGeneration),
+        "mbart": (MBartConfig, MBartForConditionalGeneration),
+    }[kind]
+    torch.manual_seed(seed)
+    config = config_class(
+        vocab_size=vocab_size, pad_token_id=1, bos_token_id=0, eos_token_id=2,
+        decoder_start_token_id=2, **TINY_CONFIG,
+    )
+    return model_class(config).eval()
+
+
+def install_tiny_models():
+    """Replace the pipeline's BART/mBART models with tiny random ones (no download)."""
+    import translation_summary.mbart as mbart
+    import words_context.context as context
+
+    tokenizer = tiny_tokenizer()
+    mt_model = tiny_model("mbart", len(tokenizer))
+    context.tokenizer, context.model = tokenizer, mt_model.to(context.device)
+    mbart.mt_tokenizer, mbart.mt_model = tokenizer, mt_model.to(mbart.device)
+    mbart.summarizer_tokenizer = tokenizer
+    mbart.summarizer_model = tiny_model("bart", len(tokenizer)).to(mbart.device)
@@ -0,0 +1,437 @@
+"""
+Offline benchmark suite for every pipeline stage.
+
+Measures throughput and peak memory of each stage on synthetic book-sized
+inputs, without network access: models are tiny random BART/mBART configs,
+spaCy runs as a blank pipeline and the vocabulary operations run against the
+embedded SQLite backend. Each benchmark runs in a fresh process, so its peak
+RSS is its own; the best of `--repeat` timed runs is reported.
+
+Results are written as JSON and compared with the stored baselines
+(benchmarks/baselines.json by default, committed at the CI scale and
+re-recorded on the reference machine with --save-baseline). The run exits
+with status 1 when a stage got slower or bigger than the tolerance allows,
+or a stage that has a baseline failed, and with status 2 when there is
+nothing to compare with (no baselines, or baselines at another scale) or a
+stage ran without a baseline of its own (new, or skipped when the baselines
+were recorded). Stages whose dependencies are missing (e.g. torch) are
+reported as skipped.
+
+Usage:
+    python -m benchmarks.run                      # run all at the CI scale, compare with baselines
+    python -m benchmarks.run --only reader_txt frequent_words --scale 0.25 --baseline other.json
+    python -m benchmarks.run --save-baseline      # record new baselines
+"""
+
+import argparse
+import asyncio
+import importlib.util
+import json
+import multiprocessing
+import os
+import platform
+import queue
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import traceback
+from collections import namedtuple
+
+from benchmarks import fixtures
+
+BASELINES_PATH = os.path.join(os.path.dirname(__file__), "baselines.json")
+TOLERANCE = 0.2  # allowed relative throughput loss
+MEMORY_TOLERANCE = 0.2  # allowed relative peak memory growth
+CI_SCALE = 0.5  # default --scale, the one the committed baselines were recorded at
+
+# Input sizes at --scale 1
+BOOK_CHARS = 4_000_000
+HTML_CHARS = 1_000_000
+ANALYSIS_CHARS = 500_000
+SCAN_KEYWORDS = 50
+TRANSLATE_CHARS = 20_000
+TRANSLATE_KEYWORDS = 5
+SUMMARY_CHARS = 8_000
+VOCAB_WORDS = 2_000
+VOCAB_SENTENCES = 3  # per word
+VOCAB_BATCH = 100  # words per upsert call
+VOCAB_PAGE = 100  # words per page read
+
+Benchmark = namedtuple("Benchmark", ["name", "unit", "requires", "setup"])
+# `run` is timed; `prepare` (optional) restores the state before each run
+Workload = namedtuple("Workload", ["run", "amount", "prepare"], defaults=[None])
+
+BENCHMARKS = {}
+
+
+def benchmark(name, unit, requires=()):
+    """Register `setup(inputs, scale) -> Workload` as the benchmark `name`."""
+    def register(setup):
+        BENCHMARKS[name] = Benchmark(name, unit, tuple(requires), setup)
+        return setup
+    return register
+
+
+# ----------------------------
+# Inputs
+# ----------------------------
+def prepare_inputs(directory, scale):
+    """Write the synthetic books shared by the benchmarks; returns their paths."""
+    return {
+        "book_txt": fixtures.write_book(os.path.join(directory, "book.txt"), int(BOOK_CHARS * scale)),
+        "book_html": fixtures.write_book(os.path.join(directory, "book.html"), int(HTML_CHARS * scale), html=True),
+        "directory": directory,
+    }
+
+
+def read_prefix(path, n_chars):
+    with open(path, "r", encoding="utf-8") as f:
+        return f.read(n_chars)
+
+
+def _mb(path):
+    return os.path.getsize(path) / 1e6
+
+
+# ----------------------------
+# Stages
+# ----------------------------
+@benchmark("reader_txt", "MB")
+def reader_txt(inputs, scale):
+    from reader.reader import extract_text
+
+    path = inputs["book_txt"]
+    return Workload(lambda: sum(len(chunk) for chunk in extract_text(path, stream=True)), _mb(path))
+
+
+@benchmark("reader_html", "MB", requires=["bs4"])
+def reader_html(inputs, scale):
+    from reader.reader import extract_text
+
+    path = inputs["book_html"]
+    return Workload(lambda: sum(len(chunk) for chunk in extract_text(path, stream=True)), _mb(path))
+
+
+@benchmark("frequent_words", "words", requires=["spacy", "nltk", "langdetect"])
+def frequent_words(inputs, scale):
+    import spacy
+    import text_processing.processing as processing
+    from reader.reader import iter_txt_chunks
+
+    # Same pipeline on every machine, whichever spaCy models are installed
+    processing.load_model = spacy.blank
+    path = os.path.join(inputs["directory"], "analysis.txt")
+    with open(path, "w", encoding="utf-8") as f:
+        text = read_prefix(inputs["book_txt"], int(ANALYSIS_CHARS * scale))
+        f.write(text)
+    return Workload(
+        lambda: processing.extract_frequent_words(iter_txt_chunks(path), lang="de"),
+        len(text.split()),
+    )
+
+
+@benchmark("keyword_scan", "MB", requires=["torch", "langid"])
+def keyword_scan(inputs, scale):
+    from words_context.context import extract_keyword_sentences
+
+    text = read_prefix(inputs["book_txt"], int(BOOK_CHARS * scale))
+    # Frequent content words: every one of them matches many sentences
+    keywords = fixtures.vocabulary()[len(fixtures.FUNCTION_WORDS):][:SCAN_KEYWORDS]
+    return Workload(lambda: extract_keyword_sentences(text, keywords), len(text.encode("utf-8")) / 1e6)
+
+
+@benchmark("keyword_translate", "sentences", requires=["torch", "langid"])
+def keyword_translate(inputs, scale):
+    import words_context.context as context
+    from words_context.context import extract_keyword_sentences, find_keyword_sentences
+    from words_context.lexicon import Lexicon
+
+    fixtures.install_tiny_models()
+    # Empty lexicon: the first run translates every keyword with the model,
+    # the following (timed as the best) serve them from the learned overlay
+    directory = inputs["directory"]
+    context.lexicon = Lexicon(os.path.join(directory, "lexicon.idx"), os.path.join(directory, "lexicon.sqlite3"))
+    text = read_prefix(inputs["book_txt"], int(TRANSLATE_CHARS * scale))
+    # Mid-frequency words: a handful of sentences each
+    keywords = fixtures.vocabulary()[500:500 + TRANSLATE_KEYWORDS]
+    n_sentences = sum(len(s) for s in find_keyword_sentences(text, keywords).values())
+    return Workload(lambda: extract_keyword_sentences(text, keywords, translate_to="en"), n_sentences)
+
+
+@benchmark("summarize", "KB", requires=["torch", "langid"])
+def summarize(inputs, scale):
+    from translation_summary.mbart import summarize_and_translate
+
+    fixtures.install_tiny_models()
+    text = read_prefix(inputs["book_txt"], int(SUMMARY_CHARS * scale))
+    keywords = fixtures.vocabulary()[100:105]
+    return Workload(lambda: summarize_and_translate(text, translate_to="de", keywords=keywords),
+                    len(text.encode("utf-8")) / 1e3)
+
+
+def _vocab_entries(n_words, user_id="bench-user"):
+    words = fixtures.vocabulary(max(fixtures.VOCABULARY_SIZE, n_words))[:n_words]
+    return [(user_id, word, f"translation of {word}",
+             [f"Satz {i} mit dem Wort {word}." for i in range(VOCAB_SENTENCES)])
+            for word in words]
+
+
+def _vocab_backend(inputs, name):
+    from vocabulary.backends.sqlite import SQLiteBackend
+
+    loop = asyncio.new_event_loop()
+    backend = SQLiteBackend(os.path.join(inputs["directory"], f"{name}.sqlite3"))
+    loop.run_until_complete(backend.create_schema())
+    return loop, backend
+
+
+@benchmark("vocab_upsert", "words")
+def vocab_upsert(inputs, scale):
+    loop, backend = _vocab_backend(inputs, "vocab_upsert")
+    entries = _vocab_entries(int(VOCAB_WORDS * scale))
+    words = [entry[1] for entry in entries]
+
+    async def upsert_all():
+        for i in range(0, len(entries), VOCAB_BATCH):
+            await backend.upsert(entries[i:i + VOCAB_BATCH])
+
+    return Workload(
+        lambda: loop.run_until_complete(upsert_all()),
+        len(entries),
+        prepare=lambda: loop.run_until_complete(backend.delete_words("bench-user", words)),
+    )
+
+
+@benchmark("vocab_fetch", "words")
+def vocab_fetch(inputs, scale):
+    loop, backend = _vocab_backend(inputs, "vocab_fetch")
+    entries = _vocab_entries(int(VOCAB_WORDS * scale))
+    loop.run_until_complete(backend.upsert(entries))
+
+    async def fetch_all():
+        # One full read, as the export does, then the UI's page by page reads
+        rows = [row async for row in backend.iter_vocab("bench-user")]
+        after_word = None
+        while True:
+            page = await backend.fetch_vocab("bench-user", after_word=after_word, limit=VOCAB_PAGE)
+            rows += page
+            if len(page) < VOCAB_PAGE:
+                return rows
+            after_word = page[-1]["word"]
+
+    return Workload(lambda: loop.run_until_complete(fetch_all()), 2 * len(entries))
+
+
+@benchmark("vocab_delete", "words")
+def vocab_delete(inputs, scale):
+    loop, backend = _vocab_backend(inputs, "vocab_delete")
+    entries = _vocab_entries(int(VOCAB_WORDS * scale))
+    half = len(entries) // 2
+
+    async def delete_all():
+        # Sentence by sentence for the first half (the UI's per-card delete), in one batch for the rest
+        for _, word, _, sentences in entries[:half]:
+            await backend.delete_sentences("bench-user", word, sentences)
+        await backend.delete_words("bench-user", [entry[1] for entry in entries[half:]])
+
+    return Workload(
+        lambda: loop.run_until_complete(delete_all()),
+        len(entries),
+        prepare=lambda: loop.run_until_complete(backend.upsert(entries)),
+    )
+
+
+# ----------------------------
+# Measurement
+# ----------------------------
+def missing_requirements(bench):
+    return [module for module in bench.requires if importlib.util.find_spec(module) is None]
+
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2**20 if sys.platform == "darwin" else peak / 2**10  # bytes on macOS, KiB on Linux
+
+
+def measure(name, inputs, scale=1.0, repeat=3):
+    """Run one benchmark in this process and return its result dict."""
+    bench = BENCHMARKS[name]
+    missing = missing_requirements(bench)
+    if missing:
+        return {"status": "skipped", "reason": f"missing {', '.join(missing)}"}
+    try:
+        workload = bench.setup(inputs, scale)
+        setup_rss = peak_rss_mb()
+        timings = []
+        for _ in range(repeat):
+            if workload.prepare is not None:
+                workload.prepare()
+            started = time.perf_counter()
+            workload.run()
+            timings.append(time.perf_counter() - started)
+    except Exception as e:
+        traceback.print_exc()
+        return {"status": "error", "reason": f"{type(e).__name__}: {e}"}
+    seconds = min(timings)
+    return {
+        "status": "ok",
+        "seconds": seconds,
+        "amount": workload.amount,
+        "unit": bench.unit,
+        "throughput": workload.amount / seconds if seconds > 0 else float("inf"),
+        "setup_rss_mb": setup_rss,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def _measure_child(name, inputs, scale, repeat, results):
+    results.put(measure(name, inputs, scale, repeat))
+
+
+def measure_isolated(name, inputs, scale=1.0, repeat=3):
+    """`measure` in a fresh process, so imports and peak memory are the benchmark's own."""
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    process = context.Process(target=_measure_child, args=(name, inputs, scale, repeat, results))
+    process.start()
+    while True:
+        try:
+            result = results.get(timeout=1)
+            break
+        except queue.Empty:
+            if not process.is_alive():  # crashed, e.g. killed for running out of memory
+                result = {"status": "error", "reason": f"process exited with code {process.exitcode}"}
+                break
+    process.join()
+    return result
+
+
+# ----------------------------
+# Baselines
+# ----------------------------
+def compare(results, baseline, tolerance=TOLERANCE, memory_tolerance=MEMORY_TOLERANCE):
+    """Return the regressions of `results` against `baseline` as messages."""
+    regressions = []
+    for name, base in baseline["benchmarks"].items():
+        current = results["benchmarks"].get(name)
+        if base["status"] != "ok" or current is None or current["status"] == "skipped":
+            continue  # not measured on one side (e.g. torch missing on this machine)
+        if current["status"] != "ok":
+            regressions.append(f"{name}: {current['status']} ({current.get('reason')})")
+            continue
+        if current["throughput"] < base["throughput"] * (1 - tolerance):
+            regressions.append(
+                f"{name}: throughput {current['throughput']:.4g} {base['unit']}/s, "
+                f"baseline {base['throughput']:.4g} ({current['throughput'] / base['throughput'] - 1:+.0%})"
+            )
+        if current["peak_rss_mb"] > base["peak_rss_mb"] * (1 + memory_tolerance):
+            regressions.append(
+                f"{name}: peak memory {current['peak_rss_mb']:.0f} MB, "
+                f"baseline {base['peak_rss_mb']:.0f} MB ({current['peak_rss_mb'] / base['peak_rss_mb'] - 1:+.0%})"
+            )
+    return regressions
+
+
+def missing_baselines(results, baseline):
+    """Return messages for the stages that ran but have no baseline to be compared with."""
+    missing = []
+    for name, current in results["benchmarks"].items():
+        base = baseline["benchmarks"].get(name)
+        if current["status"] != "ok" or (base is not None and base["status"] == "ok"):
+            continue
+        recorded = "not recorded" if base is None else f"recorded as {base['status']}: {base.get('reason')}"
+        missing.append(f"{name}: no baseline ({recorded})")
+    return missing
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True, cwd=os.path.dirname(__file__)).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(names, scale=1.0, repeat=3):
+    """Run the benchmarks `names` (each in its own process) and return the results document."""
+    results = {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "machine": f"{platform.system()} {platform.machine()} ({os.cpu_count()} CPUs)",
+        "scale": scale,
+        "repeat": repeat,
+        "benchmarks": {},
+    }
+    with tempfile.TemporaryDirectory(prefix="benchmarks-") as directory:
+        inputs = prepare_inputs(directory, scale)
+        for name in names:
+            print(f"[bench] {name} ...", flush=True)
+            results["benchmarks"][name] = measure_isolated(name, inputs, scale, repeat)
+    return results
+
+
+def print_results(results):
+    print(f"{'benchmark':<20}{'throughput':>16}{'seconds':>10}{'peak MB':>10}  status")
+    for name, result in results["benchmarks"].items():
+        if result["status"] == "ok":
+            throughput = f"{result['throughput']:.4g} {result['unit']}/s"
+            print(f"{name:<20}{throughput:>16}{result['seconds']:>10.3f}{result['peak_rss_mb']:>10.0f}  ok")
+        else:
+            print(f"{name:<20}{'-':>16}{'-':>10}{'-':>10}  {result['status']}: {result['reason']}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--only", nargs="+", choices=sorted(BENCHMARKS), help="benchmarks to run (default: all)")
+    parser.add_argument("--scale", type=float, default=CI_SCALE, help="multiplier of all input sizes")
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per benchmark (the best is kept)")
+    parser.add_argument("--output", help="write the results JSON here")
+    parser.add_argument("--baseline", default=BASELINES_PATH, help="baselines JSON to compare with")
+    parser.add_argument("--save-baseline", action="store_true", help="store the results as the new baselines")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE, help="allowed relative throughput loss")
+    parser.add_argument("--memory-tolerance", type=float, default=MEMORY_TOLERANCE,
+                        help="allowed relative peak memory growth")
+    args = parser.parse_args(argv)
+
+    results = run(args.only or list(BENCHMARKS), args.scale, args.repeat)
+    print_results(results)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"[bench] Baselines saved to {args.baseline}")
+        return 0
+    if not os.path.exists(args.baseline):
+        print(f"[bench] No baselines at {args.baseline}; record them with --save-baseline")
+        return 2
+    with open(args.baseline, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    if baseline["scale"] != args.scale:
+        print(f"[bench] Baselines were recorded at --scale {baseline['scale']}, not {args.scale}")
+        return 2
+
+    regressions = compare(results, baseline, args.tolerance, args.memory_tolerance)
+    missing = missing_baselines(results, baseline)
+    if missing:
+        print("[bench] Not compared, re-record the baselines with --save-baseline:")
+        for message in missing:
+            print(f"  {message}")
+    if regressions:
+        print(f"[bench] REGRESSIONS against {args.baseline} (commit {baseline.get('commit')}):")
+        for message in regressions:
+            print(f"  {message}")
+        return 1
+    if missing:
+        return 2
+    print(f"[bench] No regressions against {args.baseline}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,66 @@
+from benchmarks import run
+from benchmarks.run import compare, main, measure, missing_baselines
+
+
+def _result(throughput, peak_rss_mb, status="ok"):
+    return {"status": status, "throughput": throughput, "peak_rss_mb": peak_rss_mb, "unit": "MB", "reason": "boom",
+            "seconds": 1 / throughput if throughput else 0}
+
+
+def test_compare_flags_regressions():
+    baseline = {"benchmarks": {
+        "fast": _result(100, 50), "lean": _result(100, 50), "broken": _result(100, 50),
+        "skipped_here": _result(100, 50), "noisy": _result(100, 50),
+    }}
+    results = {"benchmarks": {
+        "fast": _result(70, 50),        # 30% slower
+        "lean": _result(100, 80),       # 60% more memory
+        "broken": _result(0, 0, status="error"),
+        "skipped_here": {"status": "skipped", "reason": "missing torch"},
+        "noisy": _result(90, 55),       # within tolerance
+    }}
+
+    regressions = compare(results, baseline, tolerance=0.2, memory_tolerance=0.2)
+    assert len(regressions) == 3
+    assert regressions[0].startswith("fast: throughput")
+    assert regressions[1].startswith("lean: peak memory")
+    assert regressions[2].startswith("broken: error")
+
+
+def test_measure_vocabulary_stage(tmp_path):
+    result = measure("vocab_upsert", {"directory": str(tmp_path)}, scale=0.01, repeat=2)
+    assert result["status"] == "ok"
+    assert result["amount"] == 20 and result["unit"] == "words"
+    assert result["throughput"] > 0 and result["peak_rss_mb"] > 0
+
+
+def test_missing_baselines_fail_the_run(tmp_path, monkeypatch, capsys):
+    # Fixed results: the exit codes must not depend on how fast this machine is today
+    measured = {"vocab_upsert": _result(100, 50), "vocab_fetch": {"status": "skipped", "reason": "missing bs4"}}
+    monkeypatch.setattr(run, "measure_isolated", lambda name, inputs, scale, repeat: dict(measured[name]))
+    baseline = str(tmp_path / "baselines.json")
+    args = ["--only", "vocab_upsert", "vocab_fetch", "--scale", "0.01", "--repeat", "1", "--baseline", baseline]
+    assert main(args) == 2
+    assert main(args + ["--save-baseline"]) == 0
+    assert main(args) == 0
+
+    measured["vocab_upsert"] = _result(50, 50)
+    assert main(args) == 1
+
+    # A stage that ran but was skipped when the baselines were recorded is not silently passed
+    measured["vocab_upsert"] = _result(100, 50)
+    measured["vocab_fetch"] = _result(100, 50)
+    capsys.readouterr()
+    assert main(args) == 2
+    assert "vocab_fetch: no baseline (recorded as skipped: missing bs4)" in capsys.readouterr().out
+
+
+def test_missing_baselines_lists_new_and_skipped_stages():
+    baseline = {"benchmarks": {"skipped_then": {"status": "skipped", "reason": "missing torch"},
+                               "measured": _result(100, 50)}}
+    results = {"benchmarks": {"skipped_then": _result(100, 50), "measured": _result(100, 50),
+                              "new": _result(100, 50), "skipped_now": {"status": "skipped", "reason": "x"}}}
+    assert missing_baselines(results, baseline) == [
+        "skipped_then: no baseline (recorded as skipped: missing torch)",
+        "new: no baseline (not recorded)",
+    ]
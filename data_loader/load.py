@@ -8,71 +8,471 @@ This code automates the downloading of various open-source textual resources:
 All downloaded files are saved into the `data/` folder. The script includes basic error handling
 and supports filename sanitization for organized storage.
 
+Single items can be fetched with the `download_*` functions; whole corpora are fetched with
+`download_many`, which runs the downloads concurrently over pooled keep-alive sessions, limits
+the number of parallel requests per host, retries transient failures with exponential backoff
+and streams response bodies to disk in chunks.
+
+Downloads are recorded in `data/manifest.jsonl` (see `data_loader.manifest`). Re-runs send
+conditional requests and keep unchanged files, and partial downloads are resumed with HTTP
+Range requests, so repeated or interrupted corpus refreshes only transfer what is missing.
+
+Usage:
+    python -m data_loader.load items.jsonl --workers 16 --per-host 4
+
 Dependencies:
 - requests
 - beautifulsoup4 (for short story scraping)
 """
 
+import argparse
+import json
 import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from urllib.parse import urlsplit
+
 import requests
+from requests.adapters import HTTPAdapter
 from bs4 import BeautifulSoup
 
+from data_loader.manifest import Manifest, file_sha256
+
+DATA_DIR = "data"
+
+GUTENBERG_URL_TEMPLATES = [
+    "https://www.gutenberg.org/files/{book_id}/{book_id}-0.txt",
+    "https://www.gutenberg.org/files/{book_id}/{book_id}.txt",
+]
+ARXIV_URL_TEMPLATE = "https://arxiv.org/pdf/{arxiv_id}.pdf"
+
+DEFAULT_TIMEOUT = (10, 60)  # (connect, read) in seconds
+DEFAULT_RETRIES = 3
+DEFAULT_BACKOFF = 1.0       # seconds; doubled on every retry
+MAX_RETRY_DELAY = 60.0      # seconds; cap of the backoff and of a server's Retry-After
+STREAM_CHUNK_SIZE = 64 * 1024
+POOL_SIZE = 16              # keep-alive connections per host and session
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
 # Create data folder
-os.makedirs("data", exist_ok=True)
+os.makedirs(DATA_DIR, exist_ok=True)
+
+
+class RetryableStatus(requests.HTTPError):
+    """Raised for HTTP statuses that are worth retrying (rate limits, server errors)."""
+
+    def __init__(self, response):
+        super().__init__(f"{response.status_code} for {response.url}", response=response)
+        retry_after = response.headers.get("Retry-After", "")
+        self.retry_after = float(retry_after) if retry_after.isdigit() else None
+
+
+RETRYABLE_ERRORS = (
+    requests.ConnectionError,
+    requests.Timeout,
+    requests.exceptions.ChunkedEncodingError,
+    RetryableStatus,
+)
+
+
+# --- Sessions and concurrency limits ---
+_local = threading.local()
+
+
+def get_session():
+    """Return this thread's pooled HTTP session, creating it on first use.
+
+    Sessions keep connections alive between requests; each worker thread gets
+    its own because `requests.Session` is not guaranteed to be thread-safe.
+    """
+    session = getattr(_local, "session", None)
+    if session is None:
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        _local.session = session
+    return session
+
+
+class HostLimiter:
+    """Bounds the number of concurrent requests sent to each host."""
+
+    def __init__(self, per_host=4):
+        self.per_host = per_host
+        self._semaphores = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, url):
+        host = urlsplit(url).netloc
+        with self._lock:
+            if host not in self._semaphores:
+                self._semaphores[host] = threading.BoundedSemaphore(self.per_host)
+            return self._semaphores[host]
+
+
+def _with_retries(operation, retries=DEFAULT_RETRIES, backoff=DEFAULT_BACKOFF, max_delay=MAX_RETRY_DELAY):
+    """Run `operation`, retrying transient network errors with exponential backoff.
+
+    A server's Retry-After is honoured up to `max_delay` seconds, so a
+    misbehaving mirror cannot stall the loader for hours.
+    """
+    attempt = 0
+    while True:
+        try:
+            return operation()
+        except RETRYABLE_ERRORS as e:
+            if attempt >= retries:
+                raise
+            delay = getattr(e, "retry_after", None)
+            if delay is None:
+                delay = backoff * 2 ** attempt * random.uniform(0.5, 1.5)
+            time.sleep(min(delay, max_delay))
+            attempt += 1
+
+
+def _get(url, stream, timeout, headers=None):
+    response = get_session().get(url, stream=stream, timeout=timeout, headers=headers)
+    if response.status_code in RETRY_STATUSES:
+        response.close()
+        raise RetryableStatus(response)
+    response.raise_for_status()
+    return response
+
+
+def _conditional_headers(entry):
+    """Build If-None-Match / If-Modified-Since headers from a manifest entry."""
+    headers = {}
+    if entry.get("etag"):
+        headers["If-None-Match"] = entry["etag"]
+    if entry.get("last_modified"):
+        headers["If-Modified-Since"] = entry["last_modified"]
+    return headers
+
+
+def _validators(response):
+    return {
+        "etag": response.headers.get("ETag"),
+        "last_modified": response.headers.get("Last-Modified"),
+    }
+
+
+def _range_start(response):
+    """Return the first byte position of a 206 response ("bytes 100-999/1000" -> 100)."""
+    content_range = response.headers.get("Content-Range", "")
+    try:
+        return int(content_range.split()[1].split("-")[0])
+    except (IndexError, ValueError):
+        return None
+
+
+def _download(url, path, timeout=DEFAULT_TIMEOUT, retries=DEFAULT_RETRIES,
+              backoff=DEFAULT_BACKOFF, limiter=None, manifest=None, revalidate=True):
+    """Download `url` to `path`; returns True if the file changed, False if it was up to date."""
+    if manifest and not revalidate and manifest.is_complete(path, url):
+        return False
+    part = f"{path}.part"
+
+    def attempt():
+        entry = (manifest.get(path) if manifest else None) or {}
+        headers, offset = {}, 0
+        if manifest and manifest.is_complete(path, url):
+            headers = _conditional_headers(entry)
+        elif entry.get("url") == url and os.path.exists(part):
+            validator = entry.get("etag") or entry.get("last_modified")
+            if validator:
+                offset = os.path.getsize(part)
+                headers = {"Range": f"bytes={offset}-", "If-Range": validator}
+
+        with limiter(url) if limiter else nullcontext():
+            try:
+                response = _get(url, True, timeout, headers)
+            except requests.HTTPError as e:
+                if offset and e.response is not None and e.response.status_code == 416:
+                    os.remove(part)  # stale partial file; start over on the next attempt
+                    raise RetryableStatus(e.response) from e
+                raise
+            with response:
+                if response.status_code == 304:
+                    return False
+                if response.status_code == 206 and _range_start(response) != offset:
+                    # Not the bytes we asked for: drop the partial file and start over
+                    if os.path.exists(part):
+                        os.remove(part)
+                    raise RetryableStatus(response)
+                resumed = response.status_code == 206 and offset > 0
+                if manifest:
+                    manifest.update(path, url=url, status="partial", **_validators(response))
+                with open(part, "ab" if resumed else "wb") as f:
+                    for chunk in response.iter_content(STREAM_CHUNK_SIZE):
+                        f.write(chunk)
+
+        os.replace(part, path)
+        if manifest:
+            manifest.update(path, url=url, status="complete",
+                            size=os.path.getsize(path), sha256=file_sha256(path))
+        return True
+
+    return _with_retries(attempt, retries, backoff)
+
+
+def fetch_to_file(url, path, timeout=DEFAULT_TIMEOUT, retries=DEFAULT_RETRIES,
+                  backoff=DEFAULT_BACKOFF, limiter=None, manifest=None, revalidate=True):
+    """Stream a URL to disk in chunks.
+
+    The body is written to `<path>.part` and renamed once complete, so an
+    interrupted download never leaves a truncated file under the final name.
+    With a manifest, complete files are revalidated with a conditional request
+    (and kept on 304 Not Modified), and partial files are resumed with a Range
+    request guarded by If-Range.
+
+    Args:
+        url (str): The URL to download.
+        path (str): The destination file path.
+        timeout (tuple): The (connect, read) timeout in seconds.
+        retries (int): How many times transient failures are retried.
+        backoff (float): The initial retry delay in seconds.
+        limiter (HostLimiter, optional): Bounds concurrent requests per host.
+        manifest (Manifest, optional): Records and supplies download state.
+        revalidate (bool): If False, files the manifest lists as complete are
+            kept without contacting the server.
+
+    Returns:
+        str: The destination file path.
+
+    Raises:
+        requests.RequestException: If the download fails for good.
+    """
+    _download(url, path, timeout, retries, backoff, limiter, manifest, revalidate)
+    return path
+
+
+def fetch_page(url, headers=None, timeout=DEFAULT_TIMEOUT, retries=DEFAULT_RETRIES,
+               backoff=DEFAULT_BACKOFF, limiter=None):
+    """Fetch a (small) resource such as a web page, with retries.
+
+    Args:
+        url (str): The URL to fetch.
+        headers (dict, optional): Extra request headers.
+        timeout, retries, backoff, limiter: see `fetch_to_file`.
+
+    Returns:
+        requests.Response: The response with its body loaded.
+    """
+    def attempt():
+        with limiter(url) if limiter else nullcontext():
+            return _get(url, False, timeout, headers)
+
+    return _with_retries(attempt, retries, backoff)
+
+
+_manifests = {}
+_manifests_lock = threading.Lock()
+
+
+def get_manifest(root=None):
+    """Return the shared download manifest of a folder (default: the data folder)."""
+    root = root or DATA_DIR
+    with _manifests_lock:
+        if root not in _manifests:
+            _manifests[root] = Manifest(root)
+        return _manifests[root]
+
 
 # --- 1. PROJECT GUTENBERG ---
-def download_gutenberg_book(book_id, filename):
+def download_gutenberg_book(book_id, filename, manifest=None, **options):
     """Download a book from Project Gutenberg.
 
+    The file is saved byte for byte; its encoding is detected when it is read
+    (see `reader.reader.detect_encoding`).
+
     Args:
         book_id (int): The ID of the Gutenberg book.
         filename (str): The desired filename for the downloaded book.
+        manifest (Manifest, optional): Defaults to the data folder manifest.
+        **options: Passed to `fetch_to_file` (timeout, retries, backoff, limiter, revalidate).
+
+    Returns:
+        str | None: The saved file path, or None if the download failed.
     """
-    urls = [
-        f"https://www.gutenberg.org/files/{book_id}/{book_id}-0.txt",
-        f"https://www.gutenberg.org/files/{book_id}/{book_id}.txt"
-    ]
+    manifest = manifest or get_manifest()
+    path = os.path.join(DATA_DIR, f"{filename}.txt")
+    urls = [template.format(book_id=book_id) for template in GUTENBERG_URL_TEMPLATES]
+    known_url = (manifest.get(path) or {}).get("url")
+    if known_url in urls:  # try the URL that worked last time first
+        urls.remove(known_url)
+        urls.insert(0, known_url)
     for url in urls:
-        response = requests.get(url)
-        if response.status_code == 200:
-            with open(f"data/{filename}.txt", "w", encoding="utf-8") as f:
-                f.write(response.text)
-            print(f"[Gutenberg] Downloaded: {filename}")
-            return
+        try:
+            changed = _download(url, path, manifest=manifest, **options)
+        except requests.RequestException:
+            continue
+        print(f"[Gutenberg] {'Downloaded' if changed else 'Up to date'}: {filename}")
+        return path
     print(f"[Gutenberg] Failed: {book_id}")
+    return None
 
 # --- 2. ARXIV ---
-def download_arxiv_paper(arxiv_id, filename):
+def download_arxiv_paper(arxiv_id, filename, manifest=None, **options):
     """Download a paper from arXiv.
 
     Args:
         arxiv_id (str): The ID of the arXiv paper.
         filename (str): The desired filename for the downloaded paper.
+        manifest (Manifest, optional): Defaults to the data folder manifest.
+        **options: Passed to `fetch_to_file` (timeout, retries, backoff, limiter, revalidate).
+
+    Returns:
+        str | None: The saved file path, or None if the download failed.
     """
-    url = f"https://arxiv.org/pdf/{arxiv_id}.pdf"
-    response = requests.get(url)
-    if response.status_code == 200:
-        with open(f"data/{filename}.pdf", "wb") as f:
-            f.write(response.content)
-        print(f"[arXiv] Downloaded: {filename}")
-    else:
+    manifest = manifest or get_manifest()
+    path = os.path.join(DATA_DIR, f"{filename}.pdf")
+    try:
+        changed = _download(ARXIV_URL_TEMPLATE.format(arxiv_id=arxiv_id), path,
+                            manifest=manifest, **options)
+    except requests.RequestException:
         print(f"[arXiv] Failed: {arxiv_id}")
+        return None
+    print(f"[arXiv] {'Downloaded' if changed else 'Up to date'}: {filename}")
+    return path
 
 # --- 3. SHORT STORY (web scraping) ---
-def download_short_story(url, filename):
+def download_short_story(url, filename, manifest=None, revalidate=True, **options):
     """Download a short story from a website.
 
     Args:
         url (str): The URL of the short story.
         filename (str): The desired filename for the downloaded story.
+        manifest (Manifest, optional): Defaults to the data folder manifest.
+        revalidate (bool): If False, a story already in the manifest is kept as is.
+        **options: Passed to `fetch_page` (timeout, retries, backoff, limiter).
+
+    Returns:
+        str | None: The saved file path, or None if the download failed.
     """
+    manifest = manifest or get_manifest()
+    path = os.path.join(DATA_DIR, f"{filename}.txt")
     try:
-        response = requests.get(url)
+        complete = manifest.is_complete(path, url)
+        if complete and not revalidate:
+            print(f"[Short Story] Up to date: {filename}")
+            return path
+        headers = _conditional_headers(manifest.get(path)) if complete else None
+        response = fetch_page(url, headers=headers, **options)
+        if response.status_code == 304:
+            print(f"[Short Story] Up to date: {filename}")
+            return path
         soup = BeautifulSoup(response.text, "html.parser")
         text = soup.get_text()
-        with open(f"data/{filename}.txt", "w", encoding="utf-8") as f:
+        with open(path, "w", encoding="utf-8") as f:
             f.write(text)
+        manifest.update(path, url=url, status="complete", size=os.path.getsize(path),
+                        sha256=file_sha256(path), **_validators(response))
         print(f"[Short Story] Downloaded: {filename}")
+        return path
     except Exception as e:
         print(f"[Short Story] Failed ({filename}): {e}")
+        return None
+
+# --- 4. ANY URL ---
+def download_file(url, filename, manifest=None, **options):
+    """Download a URL as-is.
+
+    Args:
+        url (str): The URL to download.
+        filename (str): The file name (with extension) inside the data folder.
+        manifest (Manifest, optional): Defaults to the data folder manifest.
+        **options: Passed to `fetch_to_file` (timeout, retries, backoff, limiter, revalidate).
+
+    Returns:
+        str | None: The saved file path, or None if the download failed.
+    """
+    manifest = manifest or get_manifest()
+    path = os.path.join(DATA_DIR, filename)
+    try:
+        changed = _download(url, path, manifest=manifest, **options)
+    except requests.RequestException as e:
+        print(f"[File] Failed ({filename}): {e}")
+        return None
+    print(f"[File] {'Downloaded' if changed else 'Up to date'}: {filename}")
+    return path
+
+
+# --- BULK DOWNLOADS ---
+SOURCES = {
+    "gutenberg": download_gutenberg_book,   # {"book_id": ..., "filename": ...}
+    "arxiv": download_arxiv_paper,          # {"arxiv_id": ..., "filename": ...}
+    "story": download_short_story,          # {"url": ..., "filename": ...}
+    "file": download_file,                  # {"url": ..., "filename": ...}
+}
+
+
+def read_items(path):
+    """Read download items from a JSON list or a JSON Lines file.
+
+    Args:
+        path (str): The manifest file path.
+
+    Returns:
+        list[dict]: Items such as {"source": "gutenberg", "book_id": 1342, "filename": "pride"}.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        if path.endswith(".jsonl"):
+            return [json.loads(line) for line in f if line.strip()]
+        return json.load(f)
+
+
+def download_many(items, max_workers=16, per_host=4, manifest=None, **options):
+    """Download many items concurrently.
+
+    Args:
+        items (list[dict]): Items with a "source" key (see `SOURCES`, default
+            "file") and the keyword arguments of the matching download function.
+        max_workers (int): The number of downloads running at the same time.
+        per_host (int): The maximum number of concurrent requests per host.
+        manifest (Manifest, optional): Defaults to the data folder manifest.
+            Items it lists as complete are revalidated (or skipped when
+            revalidate=False), so an interrupted run picks up where it stopped.
+        **options: Passed to every download (timeout, retries, backoff, revalidate).
+
+    Returns:
+        list[str | None]: The saved file path for each item (None on failure),
+        in the order of `items`.
+    """
+    limiter = HostLimiter(per_host)
+    manifest = manifest or get_manifest()
+
+    def run(item):
+        # A malformed item fails on its own instead of aborting the whole batch
+        item = dict(item)
+        source = item.pop("source", "file")
+        if source not in SOURCES:
+            print(f"[Bulk] Failed: unknown source {source!r} in {item}")
+            return None
+        try:
+            return SOURCES[source](**item, limiter=limiter, manifest=manifest, **options)
+        except Exception as e:
+            print(f"[Bulk] Failed ({item}): {e}")
+            return None
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        results = list(executor.map(run, items))
+
+    ok = sum(path is not None for path in results)
+    print(f"[Bulk] Downloaded {ok}/{len(results)} items")
+    return results
+
 
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Download a manifest of corpus items into data/.")
+    parser.add_argument("items", help="JSON or JSON Lines file with download items")
+    parser.add_argument("--workers", type=int, default=16, help="concurrent downloads")
+    parser.add_argument("--per-host", type=int, default=4, help="concurrent requests per host")
+    parser.add_argument("--no-revalidate", action="store_true",
+                        help="skip files the manifest lists as complete without contacting the server")
+    args = parser.parse_args()
+    download_many(read_items(args.items), max_workers=args.workers, per_host=args.per_host,
+                  revalidate=not args.no_revalidate)
@@ -0,0 +1,116 @@
+"""
+Download manifest for the `data/` folder.
+
+Every downloaded file gets an entry with its source URL, size, HTTP validators
+(ETag / Last-Modified), SHA-256 checksum and status ("partial" or "complete").
+A file only counts as complete while its size and checksum still match.
+The manifest is an append-only JSON Lines log (the last line for a file wins),
+so recording progress is cheap and an interrupted run never corrupts it.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+
+MANIFEST_NAME = "manifest.jsonl"
+
+
+def file_sha256(path, chunk_size=1 << 20):
+    """Compute the SHA-256 checksum of a file.
+
+    Args:
+        path (str): The file path.
+        chunk_size (int): The number of bytes hashed per read.
+
+    Returns:
+        str: The hex digest.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class Manifest:
+    """Thread-safe record of the files downloaded into a folder."""
+
+    def __init__(self, root, name=MANIFEST_NAME):
+        self.root = root
+        self.path = os.path.join(root, name)
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._verified = {}  # key -> (size, mtime_ns, sha256) of the last hashed file
+        lines = 0
+        if os.path.exists(self.path):
+            with open(self.path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue  # torn last line of an interrupted run
+                    self._entries[entry["file"]] = entry
+                    lines += 1
+        if lines > 2 * len(self._entries):
+            self.compact()
+
+    def key(self, path):
+        """Return the manifest key (path relative to the root) for a file path."""
+        return os.path.relpath(path, self.root).replace(os.sep, "/")
+
+    def get(self, path):
+        """Return the entry for a file path, or None."""
+        with self._lock:
+            entry = self._entries.get(self.key(path))
+            return dict(entry) if entry else None
+
+    def update(self, path, **fields):
+        """Merge `fields` into the entry for a file path and persist it."""
+        key = self.key(path)
+        with self._lock:
+            entry = dict(self._entries.get(key, {}), **fields, file=key, updated_at=time.time())
+            self._entries[key] = entry
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        return dict(entry)
+
+    def is_complete(self, path, url=None):
+        """Check that a file was fully downloaded (from `url`, if given) and is unchanged on disk.
+
+        The file must match the recorded size and SHA-256 checksum; it is only
+        hashed again when its size or modification time changed.
+        """
+        entry = self.get(path)
+        if not (
+            entry
+            and entry.get("status") == "complete"
+            and entry.get("sha256")
+            and (url is None or entry.get("url") == url)
+            and os.path.exists(path)
+        ):
+            return False
+        stat = os.stat(path)
+        if stat.st_size != entry.get("size"):
+            return False
+        key = self.key(path)
+        verified = self._verified.get(key)
+        if verified is None or verified[:2] != (stat.st_size, stat.st_mtime_ns):
+            verified = (stat.st_size, stat.st_mtime_ns, file_sha256(path))
+            self._verified[key] = verified
+        return verified[2] == entry["sha256"]
+
+    def entries(self):
+        """Return a copy of all entries keyed by file."""
+        with self._lock:
+            return {key: dict(entry) for key, entry in self._entries.items()}
+
+    def compact(self):
+        """Rewrite the log with one line per file."""
+        with self._lock:
+            tmp = f"{self.path}.tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                for entry in self._entries.values():
+                    f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            os.replace(tmp, self.path)
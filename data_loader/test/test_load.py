@@ -0,0 +1,201 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from data_loader import load
+from data_loader.manifest import Manifest, file_sha256
+
+BOOKS = {f"/files/{i}/{i}.txt": f"Book {i}\n".encode("utf-8") * 1000 for i in range(1, 9)}
+
+
+class Handler(BaseHTTPRequestHandler):
+    active = 0
+    max_active = 0
+    not_modified = 0
+    bytes_sent = 0
+    bad_range = False  # answer Range requests with bytes from the wrong offset
+    failures = {}
+    lock = threading.Lock()
+
+    def do_GET(self):
+        with Handler.lock:
+            Handler.active += 1
+            Handler.max_active = max(Handler.max_active, Handler.active)
+            fail = Handler.failures.get(self.path, 0)
+            Handler.failures[self.path] = fail - 1
+        try:
+            time.sleep(0.05)
+            if fail > 0:
+                self.send_response(503)
+                self.send_header("Retry-After", "0")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+            elif self.path in BOOKS:
+                body = BOOKS[self.path]
+                etag = f'"{hash(body)}"'
+                start = 0
+                if self.headers.get("If-None-Match") == etag:
+                    Handler.not_modified += 1
+                    self.send_response(304)
+                    self.end_headers()
+                    return
+                if self.headers.get("Range") and self.headers.get("If-Range") == etag:
+                    start = int(self.headers["Range"][len("bytes="):].rstrip("-"))
+                    if Handler.bad_range:
+                        start = max(start - 10, 0)
+                    self.send_response(206)
+                    self.send_header("Content-Range", f"bytes {start}-{len(body) - 1}/{len(body)}")
+                else:
+                    self.send_response(200)
+                self.send_header("ETag", etag)
+                self.send_header("Content-Length", str(len(body) - start))
+                self.end_headers()
+                self.wfile.write(body[start:])
+                Handler.bytes_sent += len(body) - start
+            else:
+                self.send_error(404)
+        finally:
+            with Handler.lock:
+                Handler.active -= 1
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server(tmp_path, monkeypatch):
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    base = f"http://127.0.0.1:{httpd.server_port}"
+    monkeypatch.setattr(load, "DATA_DIR", str(tmp_path))
+    monkeypatch.setattr(load, "GUTENBERG_URL_TEMPLATES", [
+        base + "/files/{book_id}/{book_id}-0.txt",
+        base + "/files/{book_id}/{book_id}.txt",
+    ])
+    Handler.max_active = 0
+    Handler.not_modified = 0
+    Handler.bytes_sent = 0
+    Handler.failures = {}
+    Handler.bad_range = False
+    yield base
+    httpd.shutdown()
+
+
+def test_download_many_gutenberg(server, tmp_path):
+    items = [{"source": "gutenberg", "book_id": i, "filename": f"book_{i}"} for i in range(1, 9)]
+    items.append({"source": "gutenberg", "book_id": 99, "filename": "missing"})
+    results = load.download_many(items, max_workers=8, per_host=3, backoff=0)
+
+    assert results[-1] is None
+    for i, path in enumerate(results[:-1], start=1):
+        assert path == str(tmp_path / f"book_{i}.txt")
+        assert (tmp_path / f"book_{i}.txt").read_bytes() == BOOKS[f"/files/{i}/{i}.txt"]
+    assert Handler.max_active <= 3
+    assert not list(tmp_path.glob("*.part"))
+
+
+def test_download_many_reports_bad_items(server, tmp_path):
+    items = [
+        {"source": "gutenberg", "book_id": 1, "filename": "book_1"},
+        {"source": "nowhere", "filename": "lost"},
+        {"source": "gutenberg", "filename": "no_id"},
+    ]
+    results = load.download_many(items, backoff=0)
+    assert results == [str(tmp_path / "book_1.txt"), None, None]
+
+
+def test_retries_transient_errors(server, tmp_path):
+    Handler.failures = {"/files/1/1.txt": 2}
+    load.fetch_to_file(server + "/files/1/1.txt", str(tmp_path / "one.txt"), backoff=0)
+    assert (tmp_path / "one.txt").read_bytes() == BOOKS["/files/1/1.txt"]
+
+    Handler.failures = {"/files/2/2.txt": 5}
+    with pytest.raises(load.RetryableStatus):
+        load.fetch_to_file(server + "/files/2/2.txt", str(tmp_path / "two.txt"), retries=2, backoff=0)
+
+
+def test_manifest_skips_unchanged_files(server, tmp_path):
+    items = [{"source": "gutenberg", "book_id": i, "filename": f"book_{i}"} for i in range(1, 4)]
+    load.download_many(items, backoff=0)
+
+    entries = Manifest(str(tmp_path)).entries()
+    assert entries["book_1.txt"]["url"].endswith("/files/1/1.txt")
+    assert entries["book_1.txt"]["status"] == "complete"
+    assert entries["book_1.txt"]["sha256"] == file_sha256(str(tmp_path / "book_1.txt"))
+
+    Handler.bytes_sent = 0
+    load.download_many(items, backoff=0)
+    assert Handler.not_modified == 3
+    assert Handler.bytes_sent == 0
+
+
+def test_resumes_partial_download(server, tmp_path):
+    url = server + "/files/1/1.txt"
+    path = str(tmp_path / "one.txt")
+    body = BOOKS["/files/1/1.txt"]
+    manifest = Manifest(str(tmp_path))
+    load.fetch_to_file(url, path, manifest=manifest)
+
+    # Simulate a dropped connection: half of the file is left in "<path>.part"
+    etag = manifest.get(path)["etag"]
+    (tmp_path / "one.txt").unlink()
+    (tmp_path / "one.txt.part").write_bytes(body[:1000])
+    manifest.update(path, url=url, status="partial", etag=etag)
+
+    Handler.bytes_sent = 0
+    load.fetch_to_file(url, path, manifest=Manifest(str(tmp_path)))
+    assert (tmp_path / "one.txt").read_bytes() == body
+    assert Handler.bytes_sent == len(body) - 1000
+
+
+def test_restarts_download_on_mismatched_range(server, tmp_path):
+    url = server + "/files/1/1.txt"
+    path = str(tmp_path / "one.txt")
+    body = BOOKS["/files/1/1.txt"]
+    manifest = Manifest(str(tmp_path))
+    load.fetch_to_file(url, path, manifest=manifest)
+    etag = manifest.get(path)["etag"]
+    (tmp_path / "one.txt").unlink()
+    (tmp_path / "one.txt.part").write_bytes(body[:1000])
+    manifest.update(path, url=url, status="partial", etag=etag)
+
+    Handler.bad_range = True
+    load.fetch_to_file(url, path, manifest=manifest, backoff=0)
+    assert (tmp_path / "one.txt").read_bytes() == body
+    assert manifest.is_complete(path, url)
+
+
+def test_manifest_detects_corrupted_file(server, tmp_path):
+    url = server + "/files/1/1.txt"
+    path = str(tmp_path / "one.txt")
+    body = BOOKS["/files/1/1.txt"]
+    manifest = Manifest(str(tmp_path))
+    load.fetch_to_file(url, path, manifest=manifest)
+    assert manifest.is_complete(path, url)
+
+    # Same size, different bytes
+    (tmp_path / "one.txt").write_bytes(body.replace(b"Book", b"Buch"))
+    assert not manifest.is_complete(path, url)
+    load.fetch_to_file(url, path, manifest=manifest, revalidate=False)
+    assert (tmp_path / "one.txt").read_bytes() == body
+
+
+def test_retry_after_is_capped(monkeypatch):
+    delays = []
+    monkeypatch.setattr(load.time, "sleep", delays.append)
+    response = load.requests.Response()
+    response.status_code, response.url = 503, "http://mirror/book.txt"
+    response.headers["Retry-After"] = "86400"
+    attempts = []
+
+    def operation():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise load.RetryableStatus(response)
+        return "ok"
+
+    assert load._with_retries(operation, retries=3, backoff=1, max_delay=5) == "ok"
+    assert delays == [5, 5]
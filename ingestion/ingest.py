@@ -0,0 +1,296 @@
+"""
+Bulk offline ingestion of a directory of books.
+
+Every book under the input directory goes through the same pipeline as the
+`/frequent-words` endpoint, without the HTTP API:
+
+1. extract + NLP (process pool): `reader.extract_text`, `extract_frequent_words`
+   and keyword sentence matching, one book per task;
+2. translate (main process, optional): keywords and context sentences of each
+   book are translated with mBART in batches;
+3. write: one JSON record per book is appended to the output JSON Lines file.
+
+A checkpoint next to the output records which books are done and how much of
+the output is valid, so an interrupted run resumes where it stopped. Progress
+and per-stage throughput are printed while the run goes on.
+
+Usage:
+    python -m ingestion.ingest data/ --out data/vocabulary.jsonl --workers 8 --translate-to en
+"""
+
+import argparse
+import itertools
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import langid
+
+from reader import reader
+from text_processing.processing import extract_frequent_words
+from words_context.sentences import find_keyword_sentences
+
+BOOK_EXTENSIONS = (".txt", ".pdf", ".epub", ".html", ".htm")
+CHUNK_SIZE = 256 * 1024   # keeps every spaCy call well below its max_length
+LANGID_SAMPLE = 100_000   # characters from the start of a book used to detect its language
+
+
+# ----------------------------
+# Helpers
+# ----------------------------
+def iter_books(root):
+    """Yield the book files under `root` in a stable order."""
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        for name in sorted(filenames):
+            if name.lower().endswith(BOOK_EXTENSIONS):
+                yield os.path.join(dirpath, name)
+
+
+class StageStats:
+    """Counts items, bytes and busy time of one pipeline stage."""
+
+    def __init__(self, name):
+        self.name = name
+        self.items = 0
+        self.bytes = 0
+        self.busy = 0.0
+
+    def add(self, seconds, nbytes=0):
+        self.items += 1
+        self.bytes += nbytes
+        self.busy += seconds
+
+    def report(self, elapsed):
+        rate = self.items / elapsed if elapsed else 0.0
+        per_item = self.busy / self.items if self.items else 0.0
+        line = f"[{self.name}] {self.items} books, {rate:.2f} books/s, {per_item:.2f} s/book"
+        if self.bytes:
+            line += f", {self.bytes / elapsed / 1e6:.2f} MB/s"
+        return line
+
+
+class Checkpoint:
+    """Books already written and the size of the output that holds them."""
+
+    def __init__(self, path):
+        self.path = path
+        self.done = set()
+        self.offset = 0
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            self.done = set(data["done"])
+            self.offset = data["offset"]
+
+    def save(self, offset):
+        self.offset = offset
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"done": sorted(self.done), "offset": offset, "updated_at": time.time()}, f)
+        os.replace(tmp, self.path)
+
+
+# ----------------------------
+# Stage 1: extraction + NLP (worker processes)
+# ----------------------------
+def analyse_book(path, lang=None, top_pct=10, max_contexts=5):
+    """Extract text, frequent words and keyword contexts of one book.
+
+    Args:
+        path (str): The book file path.
+        lang (str, optional): The language code (ISO 639-1); detected when omitted.
+        top_pct (float): The share of unique words to keep.
+        max_contexts (int): The maximum number of context sentences per keyword.
+
+    Returns:
+        dict: The untranslated record for the book.
+    """
+    started = time.perf_counter()
+    # The book is streamed twice (frequent words, then contexts of the keywords
+    # found); only the sample for language detection is held in memory
+    chunks = reader.extract_text(path, stream=True, chunk_size=CHUNK_SIZE)
+    head = []
+    for chunk in chunks:
+        head.append(chunk)
+        if sum(map(len, head)) >= LANGID_SAMPLE:
+            break
+    detected_lang, _ = langid.classify("".join(head)[:LANGID_SAMPLE])
+    detected = time.perf_counter()
+
+    analysis = extract_frequent_words(itertools.chain(head, chunks), lang=lang or detected_lang, top_pct=top_pct)
+    vocabulary = [word for word, freq in analysis]
+    counted = time.perf_counter()
+
+    contexts = find_keyword_sentences(
+        reader.extract_text(path, stream=True, chunk_size=CHUNK_SIZE), vocabulary, max_sentences=max_contexts
+    )
+    finished = time.perf_counter()
+
+    return {
+        "path": path,
+        "language": lang or detected_lang,  # the translation source language
+        "detected_language": detected_lang,
+        "bytes": os.path.getsize(path),
+        "analysis": [{"word": word, "frequency": freq} for word, freq in analysis],
+        "vocabulary": vocabulary,
+        "sentences": {
+            word: {"translation": None, "context": [{"sentence": sent} for sent in sents]}
+            for word, sents in contexts.items()
+        },
+        "timings": {
+            "langid": detected - started,
+            "frequent_words": counted - detected,
+            "contexts": finished - counted,
+        },
+    }
+
+
+# ----------------------------
+# Stage 2: batched translation (main process)
+# ----------------------------
+def translate_record(record, translate_to, batch_size=32):
+    """Translate the keywords and context sentences of a record in place."""
+    from words_context.context import LANGUAGE_CODES, translate_batch_with_mbart
+
+    src = LANGUAGE_CODES.get(record["language"], "en_XX")
+    tgt = LANGUAGE_CODES.get(translate_to.lower(), "en_XX")
+    sentences = record["sentences"]
+
+    keywords = list(sentences)
+    # The same sentence often holds several keywords; translate it once
+    unique_sentences = list(dict.fromkeys(
+        match["sentence"] for entry in sentences.values() for match in entry["context"]
+    ))
+    translated = translate_batch_with_mbart(keywords + unique_sentences, src, tgt, batch_size=batch_size)
+    keyword_translations = dict(zip(keywords, translated[:len(keywords)]))
+    sentence_translations = dict(zip(unique_sentences, translated[len(keywords):]))
+
+    for keyword, entry in sentences.items():
+        entry["translation"] = keyword_translations[keyword]
+        for match in entry["context"]:
+            match["translation"] = sentence_translations[match["sentence"]]
+    record["translated_to"] = translate_to
+
+
+# ----------------------------
+# Driver
+# ----------------------------
+def ingest(root, out, workers=None, lang=None, top_pct=10, max_contexts=5,
+           translate_to=None, batch_size=32, checkpoint_every=20, report_every=10.0):
+    """Run the ingestion pipeline over every book under `root`.
+
+    Args:
+        root (str): The directory to walk.
+        out (str): The JSON Lines output file; a `.checkpoint` file is kept next to it.
+        workers (int, optional): The number of worker processes (default: CPU count).
+        lang (str, optional): The language code (ISO 639-1); detected per book when omitted.
+        top_pct (float): The share of unique words kept per book.
+        max_contexts (int): The maximum number of context sentences per keyword.
+        translate_to (str, optional): The target language for translations.
+        batch_size (int): The translation batch size.
+        checkpoint_every (int): Write a checkpoint after this many books.
+        report_every (float): Seconds between progress reports.
+
+    Returns:
+        int: The number of books written in this run.
+    """
+    workers = workers or os.cpu_count() or 1
+    os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
+    checkpoint = Checkpoint(f"{out}.checkpoint")
+    if checkpoint.offset > (os.path.getsize(out) if os.path.exists(out) else 0):
+        print("[ingest] Output is shorter than the checkpoint says; starting over")
+        checkpoint.done, checkpoint.offset = set(), 0
+    books = [path for path in iter_books(root) if path not in checkpoint.done]
+    print(f"[ingest] {len(books)} books to process, {len(checkpoint.done)} already done")
+
+    stats = {name: StageStats(name) for name in ("nlp", "translate", "write")}
+    started = last_report = time.perf_counter()
+    written = 0
+
+    with open(out, "ab") as out_file:
+        # Drop records written after the last checkpoint; their books are redone
+        out_file.truncate(checkpoint.offset)
+
+        # spawn: workers must not inherit a parent that may hold a loaded model
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+            pending = set()
+            queue = iter(books)
+
+            def submit_next():
+                for path in queue:
+                    pending.add(pool.submit(analyse_book, path, lang, top_pct, max_contexts))
+                    return
+
+            for _ in range(2 * workers):  # bounded look-ahead keeps memory flat
+                submit_next()
+
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    pending.discard(future)
+                    submit_next()
+                    try:
+                        record = future.result()
+                    except Exception as e:
+                        print(f"[ingest] Failed: {e}")
+                        continue
+                    stats["nlp"].add(sum(record["timings"].values()), record["bytes"])
+
+                    if translate_to:
+                        t0 = time.perf_counter()
+                        translate_record(record, translate_to, batch_size)
+                        stats["translate"].add(time.perf_counter() - t0)
+
+                    t0 = time.perf_counter()
+                    out_file.write((json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8"))
+                    checkpoint.done.add(record["path"])
+                    written += 1
+                    if written % checkpoint_every == 0:
+                        out_file.flush()
+                        os.fsync(out_file.fileno())
+                        checkpoint.save(out_file.tell())
+                    stats["write"].add(time.perf_counter() - t0)
+
+                now = time.perf_counter()
+                if now - last_report >= report_every:
+                    last_report = now
+                    print(f"[ingest] {written}/{len(books)} books | " + " | ".join(
+                        s.report(now - started) for s in stats.values() if s.items))
+
+        out_file.flush()
+        os.fsync(out_file.fileno())
+        checkpoint.save(out_file.tell())
+
+    elapsed = time.perf_counter() - started
+    print(f"[ingest] Done: {written} books in {elapsed:.1f} s")
+    for s in stats.values():
+        if s.items:
+            print("  " + s.report(elapsed))
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pre-compute vocabularies for a directory of books.")
+    parser.add_argument("root", help="directory with .txt/.pdf/.epub/.html books")
+    parser.add_argument("--out", default="data/vocabulary.jsonl", help="JSON Lines output file")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument("--lang", default=None, help="language code, e.g. de (default: detect per book)")
+    parser.add_argument("--top-pct", type=float, default=10, help="share of unique words to keep")
+    parser.add_argument("--max-contexts", type=int, default=5, help="context sentences per keyword")
+    parser.add_argument("--translate-to", default=None, help="translate keywords and contexts to this language")
+    parser.add_argument("--batch-size", type=int, default=32, help="translation batch size")
+    parser.add_argument("--checkpoint-every", type=int, default=20, help="books between checkpoints")
+    args = parser.parse_args()
+    ingest(
+        args.root, args.out, workers=args.workers, lang=args.lang, top_pct=args.top_pct,
+        max_contexts=args.max_contexts, translate_to=args.translate_to,
+        batch_size=args.batch_size, checkpoint_every=args.checkpoint_every,
+    )
+
+
+if __name__ == "__main__":
+    main()
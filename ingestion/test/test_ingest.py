@@ -0,0 +1,104 @@
+import json
+import sys
+import types
+
+import pytest
+
+from ingestion import ingest as ingest_module
+from ingestion.ingest import Checkpoint, analyse_book, ingest
+from words_context.sentences import find_keyword_sentences
+
+BOOKS = {
+    f"book_{i}.txt": "\n\n".join(
+        f"Der Hund{i} läuft durch den Garten. Die Katze schläft im Haus{i}. Kapitel {n}."
+        for n in range(30)
+    )
+    for i in range(3)
+}
+
+
+@pytest.fixture
+def library(tmp_path):
+    root = tmp_path / "books"
+    root.mkdir()
+    for name, text in BOOKS.items():
+        (root / name).write_text(text, encoding="utf-8")
+    return root
+
+
+def read_records(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def test_analyse_book_streams_the_text(library, monkeypatch):
+    monkeypatch.setattr(ingest_module, "CHUNK_SIZE", 64)
+    record = analyse_book(str(library / "book_1.txt"), lang="de", max_contexts=2)
+    assert record["language"] == "de"
+    assert record["sentences"]["katze"]["context"] == [
+        {"sentence": "Die Katze schläft im Haus1."}, {"sentence": "Die Katze schläft im Haus1."}
+    ]
+
+
+def test_given_language_is_the_translation_source(library, monkeypatch):
+    record = analyse_book(str(library / "book_1.txt"), lang="en", max_contexts=1)
+    assert (record["language"], record["detected_language"]) == ("en", "de")
+
+    calls = []
+
+    def translate_batch(texts, src, tgt, batch_size):
+        calls.append((src, tgt))
+        return [text.upper() for text in texts]
+
+    monkeypatch.setitem(sys.modules, "words_context.context", types.SimpleNamespace(
+        LANGUAGE_CODES={"de": "de_DE", "en": "en_XX", "fr": "fr_XX"}, translate_batch_with_mbart=translate_batch
+    ))
+    ingest_module.translate_record(record, "fr")
+    assert calls == [("en_XX", "fr_XX")]
+
+
+def test_find_keyword_sentences_joins_sentences_cut_between_chunks():
+    chunks = ["Der Hund läuft. Die Katze", "schläft im Haus. Ende."]
+    assert find_keyword_sentences(chunks, ["katze", "ende"]) == {
+        "katze": ["Die Katze\nschläft im Haus."], "ende": ["Ende."]
+    }
+
+
+def test_resume_after_interruption(library, tmp_path, monkeypatch):
+    out = str(tmp_path / "out.jsonl")
+    save = Checkpoint.save
+    saves = []
+
+    def save_then_crash(self, offset):
+        save(self, offset)
+        saves.append(offset)
+        if len(saves) == 2:
+            raise KeyboardInterrupt
+
+    monkeypatch.setattr(Checkpoint, "save", save_then_crash)
+    with pytest.raises(KeyboardInterrupt):
+        ingest(str(library), out, workers=1, checkpoint_every=1)
+    monkeypatch.setattr(Checkpoint, "save", save)
+
+    checkpoint = Checkpoint(f"{out}.checkpoint")
+    assert len(checkpoint.done) == 2
+    assert checkpoint.offset == saves[-1]
+    # A record written after the last checkpoint, cut by the crash
+    with open(out, "ab") as f:
+        f.write(b'{"path": "torn')
+
+    assert ingest(str(library), out, workers=1, checkpoint_every=1) == 1
+    records = read_records(out)
+    assert sorted(record["path"] for record in records) == sorted(str(library / name) for name in BOOKS)
+    assert Checkpoint(f"{out}.checkpoint").offset == (tmp_path / "out.jsonl").stat().st_size
+
+
+def test_restart_when_output_is_shorter_than_checkpoint(library, tmp_path):
+    out = str(tmp_path / "out.jsonl")
+    assert ingest(str(library), out, workers=1) == 3
+    with open(out, "r+b") as f:
+        f.truncate(10)
+
+    assert ingest(str(library), out, workers=1) == 3
+    assert len(read_records(out)) == 3
+    assert len(Checkpoint(f"{out}.checkpoint").done) == 3
@@ -0,0 +1,93 @@
+"""
+Per-process memory breakdown from /proc (Linux).
+
+RSS counts every resident page, including pages shared with other processes,
+so it overstates what forked workers that share model weights really cost.
+USS (pages private to the process) is what one more worker adds; PSS splits
+each shared page between the processes that map it, so the PSS of all
+workers sums to their real footprint.
+
+Usage:
+    python -m instrumentation.memory <pid> [<pid> ...]
+    python -m instrumentation.memory --tree <server pid>   # the server and its workers
+"""
+
+import argparse
+import os
+
+FIELDS = ("Rss", "Pss", "Private_Clean", "Private_Dirty", "Shared_Clean", "Shared_Dirty", "Swap")
+
+
+def parse_smaps(lines):
+    """Sum the kB fields of smaps or smaps_rollup lines into bytes."""
+    totals = dict.fromkeys(FIELDS, 0)
+    for line in lines:
+        parts = line.split()
+        if len(parts) == 3 and parts[2] == "kB" and parts[0].endswith(":"):
+            name = parts[0][:-1]
+            if name in totals:
+                totals[name] += int(parts[1]) * 1024
+    return {
+        "rss": totals["Rss"],
+        "pss": totals["Pss"],
+        "uss": totals["Private_Clean"] + totals["Private_Dirty"],
+        "shared": totals["Shared_Clean"] + totals["Shared_Dirty"],
+        "swap": totals["Swap"],
+    }
+
+
+def process_memory(pid="self"):
+    """RSS, PSS, USS, shared and swap bytes of a process."""
+    try:
+        with open(f"/proc/{pid}/smaps_rollup", "r") as f:
+            return parse_smaps(f)
+    except FileNotFoundError:  # kernels before 4.14: sum the per-mapping entries
+        with open(f"/proc/{pid}/smaps", "r") as f:
+            return parse_smaps(f)
+
+
+def child_pids(pid):
+    """Direct children of `pid`."""
+    children = []
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat", "r") as f:
+                stat = f.read()
+        except OSError:
+            continue  # exited meanwhile
+        # The command name may contain spaces; the fields after it are fixed
+        ppid = int(stat.rsplit(")", 1)[1].split()[1])
+        if ppid == pid:
+            children.append(int(entry))
+    return sorted(children)
+
+
+def memory_report(pids):
+    """Return one row per process plus a "total" row (values in bytes)."""
+    rows = []
+    for pid in pids:
+        try:
+            rows.append(dict(process_memory(pid), pid=pid))
+        except OSError:
+            continue
+    total = {key: sum(row[key] for row in rows) for key in ("rss", "pss", "uss", "shared", "swap")}
+    return rows + [dict(total, pid="total")]
+
+
+def format_report(rows):
+    lines = [f"{'pid':>8}{'RSS MB':>10}{'PSS MB':>10}{'USS MB':>10}{'shared MB':>11}"]
+    for row in rows:
+        lines.append(f"{row['pid']:>8}{row['rss'] / 2**20:>10.1f}{row['pss'] / 2**20:>10.1f}"
+                     f"{row['uss'] / 2**20:>10.1f}{row['shared'] / 2**20:>11.1f}")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("pids", type=int, nargs="*")
+    parser.add_argument("--tree", type=int, help="report this process and its direct children")
+    args = parser.parse_args()
+    pids = args.pids + ([args.tree, *child_pids(args.tree)] if args.tree else [])
+    print(format_report(memory_report(pids or [os.getpid()])))
@@ -0,0 +1,265 @@
+"""
+Minimal in-process metrics in the Prometheus text format.
+
+Modules record what they do with `stage_timer` (latency per pipeline stage)
+and the counters/histograms defined here; services expose everything on
+`/metrics` with `instrument_app`. Requests that send `X-Timing: 1` (or all
+requests, with METRICS_SERVER_TIMING=1) get a `Server-Timing` header that
+breaks their latency down by stage.
+
+Metrics live in the process that records them. Where several worker
+processes serve one port (api.serve, or METRICS_PID_LABEL=1), every sample
+gets a `pid` label, so the scrapes of different workers are told apart and
+can be summed.
+"""
+
+import bisect
+import contextvars
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+SERVER_TIMING_DEFAULT = os.environ.get("METRICS_SERVER_TIMING", "0") == "1"
+PID_LABEL_DEFAULT = os.environ.get("METRICS_PID_LABEL", "0") == "1"
+
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024, 4096)
+
+
+def _label_str(labelnames, values, extra=()):
+    pairs = list(zip(labelnames, values)) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+
+class Metric:
+    type = "untyped"
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def header(self):
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"]
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self, extra=()):
+        with self._lock:
+            items = list(self._values.items())
+        return self.header() + [f"{self.name}{_label_str(self.labelnames, k, extra)} {v}" for k, v in items]
+
+
+class Gauge(Metric):
+    type = "gauge"
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    render = Counter.render
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            counts = self._values.get(key)
+            if counts is None:
+                counts = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            counts[0][bisect.bisect_left(self.buckets, value)] += 1
+            counts[1] += value
+
+    def render(self, extra=()):
+        with self._lock:
+            items = [(k, list(c[0]), c[1]) for k, c in self._values.items()]
+        lines = self.header()
+        for key, buckets, total in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), buckets):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f"{self.name}_bucket{_label_str(self.labelnames, key, [*extra, ('le', le)])} {cumulative}")
+            lines.append(f"{self.name}_sum{_label_str(self.labelnames, key, extra)} {total}")
+            lines.append(f"{self.name}_count{_label_str(self.labelnames, key, extra)} {cumulative}")
+        return lines
+
+
+class Registry:
+    def __init__(self, pid_label=PID_LABEL_DEFAULT):
+        self.pid_label = pid_label  # label every sample with the pid of the process
+        self._metrics = {}
+        self._collectors = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        """Register a metric; a metric of the same name is returned instead if it exists."""
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+    def register_stats(self, prefix, help, collect):
+        """Expose the numeric entries of the dict returned by `collect()` as `<prefix>_<key>`."""
+        with self._lock:
+            self._collectors[prefix] = (help, collect)
+
+    def render(self):
+        with self._lock:
+            metrics = list(self._metrics.values())
+            collectors = list(self._collectors.items())
+        # The pid is read here: workers forked after the registry was created
+        extra = [("pid", os.getpid())] if self.pid_label else []
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render(extra))
+        for prefix, (help, collect) in collectors:
+            try:
+                stats = collect()
+            except Exception:  # e.g. the pool is not created yet
+                continue
+            for key, value in _flatten(stats):
+                if isinstance(value, bool) or not isinstance(value, (int, float)):
+                    continue
+                name = f"{prefix}_{key}"
+                lines += [f"# HELP {name} {help}", f"# TYPE {name} untyped",
+                          f"{name}{_label_str((), (), extra)} {value}"]
+        return "\n".join(lines) + "\n"
+
+
+def _flatten(stats, prefix=""):
+    for key, value in stats.items():
+        if isinstance(value, dict):
+            yield from _flatten(value, f"{prefix}{key}_")
+        else:
+            yield f"{prefix}{key}", value
+
+
+REGISTRY = Registry()
+
+
+def counter(name, help, labelnames=()):
+    return REGISTRY.register(Counter(name, help, labelnames))
+
+
+def gauge(name, help, labelnames=()):
+    return REGISTRY.register(Gauge(name, help, labelnames))
+
+
+def histogram(name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+    return REGISTRY.register(Histogram(name, help, labelnames, buckets))
+
+
+# ----------------------------
+# Shared pipeline metrics
+# ----------------------------
+STAGE_SECONDS = histogram("stage_duration_seconds", "Time spent per pipeline stage", ["stage"])
+GENERATE_CALLS = counter("model_generate_calls_total", "Calls of model.generate", ["model", "task"])
+GENERATE_BATCH_SIZE = histogram("model_generate_batch_size", "Sequences per generate call",
+                                ["model", "task"], SIZE_BUCKETS)
+GENERATE_TOKENS = counter("model_generate_tokens_total", "Tokens fed to and produced by generate",
+                          ["model", "task", "direction"])
+
+# Stage timings of the current request (None outside instrumented requests)
+_request_timings = contextvars.ContextVar("request_timings", default=None)
+
+
+@contextmanager
+def stage_timer(stage):
+    """Time a block as `stage` (histogram, plus the Server-Timing breakdown of the request)."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        STAGE_SECONDS.observe(elapsed, stage=stage)
+        timings = _request_timings.get()
+        if timings is not None:
+            with _timings_lock:
+                timings[stage] = timings.get(stage, 0.0) + elapsed
+
+
+_timings_lock = threading.Lock()
+
+
+def record_generate(model, task, batch_size, input_tokens, output_tokens):
+    """Count one `generate` call with its batch size and token counts."""
+    GENERATE_CALLS.inc(model=model, task=task)
+    GENERATE_BATCH_SIZE.observe(batch_size, model=model, task=task)
+    GENERATE_TOKENS.inc(input_tokens, model=model, task=task, direction="input")
+    GENERATE_TOKENS.inc(output_tokens, model=model, task=task, direction="output")
+
+
+# ----------------------------
+# Web services
+# ----------------------------
+def instrument_app(app, service):
+    """Add request metrics, the opt-in Server-Timing header and GET /metrics to a FastAPI app."""
+    from fastapi import Request
+    from fastapi.responses import PlainTextResponse
+    from instrumentation.memory import process_memory
+
+    request_seconds = histogram("http_request_duration_seconds", "HTTP request latency",
+                                ["service", "method", "route", "status"])
+    in_progress = gauge("http_requests_in_progress", "HTTP requests being served", ["service"])
+    REGISTRY.register_stats("process_memory_bytes", "Memory of the process serving the scrape "
+                            "(uss: private to it, pss: its share of shared pages)", process_memory)
+
+    @app.middleware("http")
+    async def metrics_middleware(request: Request, call_next):
+        if request.url.path == "/metrics":
+            return await call_next(request)
+        timings = {}
+        token = _request_timings.set(timings)
+        in_progress.inc(service=service)
+        started = time.perf_counter()
+        status = 500
+        try:
+            response = await call_next(request)
+            status = response.status_code
+        finally:
+            elapsed = time.perf_counter() - started
+            in_progress.dec(service=service)
+            _request_timings.reset(token)
+            route = request.scope.get("route")
+            request_seconds.observe(elapsed, service=service, method=request.method,
+                                    route=getattr(route, "path", "unmatched"), status=status)
+        if SERVER_TIMING_DEFAULT or request.headers.get("x-timing") == "1":
+            with _timings_lock:
+                parts = [f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in timings.items()]
+            response.headers["Server-Timing"] = ", ".join(parts + [f"total;dur={elapsed * 1000:.1f}"])
+        return response
+
+    @app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+    async def metrics_endpoint():
+        return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+    return app
@@ -0,0 +1,33 @@
+import os
+
+import pytest
+
+from instrumentation.memory import memory_report, parse_smaps
+
+SMAPS_ROLLUP = """\
+00400000-7ffd3f1fe000 ---p 00000000 00:00 0                              [rollup]
+Rss:              685204 kB
+Pss:              148540 kB
+Pss_Anon:         140000 kB
+Shared_Clean:      10240 kB
+Shared_Dirty:     660480 kB
+Private_Clean:      1024 kB
+Private_Dirty:     13460 kB
+Swap:                  0 kB
+"""
+
+
+def test_parse_smaps_rollup():
+    memory = parse_smaps(SMAPS_ROLLUP.splitlines())
+    assert memory["rss"] == 685204 * 1024
+    assert memory["pss"] == 148540 * 1024  # Pss_Anon is not added to it
+    assert memory["uss"] == (1024 + 13460) * 1024
+    assert memory["shared"] == (10240 + 660480) * 1024
+
+
+@pytest.mark.skipif(not os.path.exists("/proc/self/smaps"), reason="needs Linux /proc")
+def test_memory_report_of_this_process():
+    rows = memory_report([os.getpid()])
+    assert [row["pid"] for row in rows] == [os.getpid(), "total"]
+    assert 0 < rows[0]["uss"] <= rows[0]["pss"] <= rows[0]["rss"]
+    assert rows[1]["rss"] == rows[0]["rss"]
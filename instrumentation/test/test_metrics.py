@@ -0,0 +1,49 @@
+import os
+
+from instrumentation.metrics import Registry, Counter, Histogram, _request_timings, stage_timer
+
+
+def test_prometheus_text_format():
+    registry = Registry()
+    calls = registry.register(Counter("calls_total", "Calls", ["task"]))
+    latency = registry.register(Histogram("latency_seconds", "Latency", buckets=(0.1, 1)))
+    calls.inc(task="translate")
+    calls.inc(2, task="translate")
+    latency.observe(0.05)
+    latency.observe(0.5)
+    registry.register_stats("pool", "Pool stats", lambda: {"open": 3, "name": "ignored", "wait": {"max": 0.5}})
+
+    text = registry.render()
+    assert 'calls_total{task="translate"} 3' in text
+    assert 'latency_seconds_bucket{le="0.1"} 1' in text
+    assert 'latency_seconds_bucket{le="+Inf"} 2' in text
+    assert "latency_seconds_count 2" in text
+    assert "pool_open 3" in text and "pool_wait_max 0.5" in text
+    assert "pool_name" not in text
+
+
+def test_stage_timer_adds_to_request_breakdown():
+    timings = {}
+    token = _request_timings.set(timings)
+    try:
+        with stage_timer("spacy"):
+            pass
+        with stage_timer("spacy"):
+            pass
+    finally:
+        _request_timings.reset(token)
+    assert list(timings) == ["spacy"] and timings["spacy"] >= 0
+
+
+def test_pid_label():
+    registry = Registry(pid_label=True)
+    registry.register(Counter("calls_total", "Calls", ["task"])).inc(task="translate")
+    registry.register(Histogram("latency_seconds", "Latency", buckets=(1,))).observe(0.5)
+    registry.register_stats("pool", "Pool stats", lambda: {"open": 3})
+
+    text = registry.render()
+    pid = os.getpid()
+    assert f'calls_total{{task="translate",pid="{pid}"}} 1' in text
+    assert f'latency_seconds_bucket{{pid="{pid}",le="1"}} 1' in text
+    assert f'latency_seconds_count{{pid="{pid}"}} 1' in text
+    assert f'pool_open{{pid="{pid}"}} 3' in text
@@ -1,11 +1,154 @@
 """
 Reads text from various file formats.
+
+Every format can be read in one go (``read_*`` / ``extract_text``) or streamed
+piece by piece (``iter_*`` / ``extract_text(path, stream=True)``). Plain-text
+files are memory-mapped and decoded incrementally, so very large corpora can be
+fed into the processing pipeline without loading them into memory.
 """
 
+import codecs
+import mmap
+import os
+from html.parser import HTMLParser
+
 import fitz  # PyMuPDF for PDF reading
 from ebooklib import epub
 from bs4 import BeautifulSoup
 
+try:  # ships with requests; used only when a file is not valid UTF-8
+    from charset_normalizer import from_bytes as _detect_charset
+except ImportError:  # pragma: no cover
+    _detect_charset = None
+
+
+DEFAULT_CHUNK_SIZE = 1 << 20       # bytes mapped per step when streaming
+ENCODING_SAMPLE_SIZE = 1 << 16     # bytes inspected per window by detect_encoding
+FALLBACK_ENCODING = "cp1252"
+
+_BOMS = (
+    (codecs.BOM_UTF32_LE, "utf-32"),
+    (codecs.BOM_UTF32_BE, "utf-32"),
+    (codecs.BOM_UTF8, "utf-8-sig"),
+    (codecs.BOM_UTF16_LE, "utf-16"),
+    (codecs.BOM_UTF16_BE, "utf-16"),
+)
+
+
+def _sample_windows(mm, sample_size):
+    """Returns byte windows from the start, middle and end of a mapped file."""
+    size = len(mm)
+    if size <= 3 * sample_size:
+        return [mm[:]]
+    windows = [mm[:sample_size]]
+    for start in (size // 2, size - sample_size):
+        window = mm[start:start + sample_size]
+        # Do not start in the middle of a UTF-8 multi-byte sequence
+        windows.append(window.lstrip(bytes(range(0x80, 0xC0))))
+    return windows
+
+
+def _is_utf8(windows):
+    for window in windows:
+        try:
+            codecs.getincrementaldecoder("utf-8")().decode(window, final=False)
+        except UnicodeDecodeError:
+            return False
+    return True
+
+
+def detect_encoding(path, sample_size=ENCODING_SAMPLE_SIZE):
+    """Detects the text encoding of a file from a sample of its bytes.
+
+    Args:
+        path (str): The file path to inspect.
+        sample_size (int): The number of bytes read from each sampled window.
+
+    Returns:
+        str: A codec name usable with ``codecs``.
+    """
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return "utf-8"
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            head = mm[:4]
+            for bom, encoding in _BOMS:
+                if head.startswith(bom):
+                    return encoding
+            windows = _sample_windows(mm, sample_size)
+
+    if _is_utf8(windows):
+        return "utf-8"
+    if _detect_charset is not None:
+        best = _detect_charset(b"".join(windows)).best()
+        if best is not None:
+            return best.encoding
+    return FALLBACK_ENCODING
+
+
+def _paragraph_cut(text, max_buffer):
+    """Returns the index after the last paragraph break, or 0 if there is none.
+
+    When no paragraph break exists and ``text`` has grown beyond ``max_buffer``,
+    falls back to the last line break, then the last space, then a hard cut.
+    """
+    idx = text.rfind("\n\n")
+    if idx != -1:
+        return idx + 2
+    if len(text) < max_buffer:
+        return 0
+    for sep in ("\n", " "):
+        idx = text.rfind(sep)
+        if idx != -1:
+            return idx + 1
+    return len(text)
+
+
+def iter_txt_chunks(path, chunk_size=DEFAULT_CHUNK_SIZE, encoding=None):
+    """Streams text from a TXT file in paragraph-aligned chunks.
+
+    The file is memory-mapped and decoded with an incremental decoder, so memory
+    use stays bounded by ``chunk_size`` regardless of the file size. Line endings
+    are normalized to ``\\n`` and undecodable bytes are replaced.
+
+    Args:
+        path (str): The file path to the TXT file.
+        chunk_size (int): The number of bytes decoded per step.
+        encoding (str, optional): The file encoding. Detected when omitted.
+
+    Yields:
+        str: Consecutive pieces of the text, each ending on a paragraph break
+        where possible. Joined together they form the whole text.
+    """
+    if encoding is None:
+        encoding = detect_encoding(path)
+    decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+    max_buffer = 4 * chunk_size
+
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            pending = ""
+            for start in range(0, len(mm), chunk_size):
+                pending += decoder.decode(mm[start:start + chunk_size])
+                # A "\r" at the end may be the first half of a "\r\n"
+                tail = ""
+                if pending.endswith("\r"):
+                    pending, tail = pending[:-1], "\r"
+                pending = pending.replace("\r\n", "\n").replace("\r", "\n")
+
+                cut = _paragraph_cut(pending, max_buffer)
+                if cut:
+                    yield pending[:cut]
+                    pending = pending[cut:]
+                pending += tail
+
+    pending += decoder.decode(b"", final=True)
+    pending = pending.replace("\r\n", "\n").replace("\r", "\n")
+    if pending:
+        yield pending
+
 
 def read_txt(path):
     """Reads text from a TXT file.
@@ -16,8 +159,21 @@ def read_txt(path):
     Returns:
         str: The extracted text from the TXT file.
     """
-    with open(path, 'r', encoding='utf-8') as f:
-        return f.read()
+    return "".join(iter_txt_chunks(path))
+
+
+def iter_pdf_pages(path):
+    """Streams text from a PDF file one page at a time.
+
+    Args:
+        path (str): The file path to the PDF file.
+
+    Yields:
+        str: The text of each page.
+    """
+    with fitz.open(path) as doc:
+        for page in doc:
+            yield page.get_text()
 
 
 def read_pdf(path):
@@ -29,26 +185,80 @@ def read_pdf(path):
     Returns:
         str: The extracted text from the PDF file.
     """
-    
-    doc = fitz.open(path)
-    return "\n".join(page.get_text() for page in doc)
+    return "\n".join(iter_pdf_pages(path))
 
-def read_epub(path):
-    """Reads text from an EPUB file.
+
+def iter_epub_documents(path):
+    """Streams text from an EPUB file one document at a time.
 
     Args:
         path (str): The file path to the EPUB file.
 
-    Returns:
-        str: The extracted text from the EPUB file.
+    Yields:
+        str: The text of each document in the book.
     """
     book = epub.read_epub(path)
-    text = ""
     for item in book.get_items():
         if item.get_type() == epub.ITEM_DOCUMENT:
             soup = BeautifulSoup(item.get_content(), 'html.parser')
-            text += soup.get_text() + "\n"
-    return text
+            yield soup.get_text() + "\n"
+
+
+def read_epub(path):
+    """Reads text from an EPUB file.
+
+    Args:
+        path (str): The file path to the EPUB file.
+
+    Returns:
+        str: The extracted text from the EPUB file.
+    """
+    return "".join(iter_epub_documents(path))
+
+
+class _TextExtractor(HTMLParser):
+    """Collects the text of HTML fed to it piece by piece.
+
+    ``HTMLParser`` keeps an unfinished tag or entity at the end of a piece
+    until the next one arrives, so markup cut at a chunk boundary is still
+    recognised.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self._parts = []
+
+    def handle_data(self, data):
+        self._parts.append(data)
+
+    def pop_text(self):
+        text = "".join(self._parts)
+        self._parts.clear()
+        return text
+
+
+def iter_html_txt_chunks(path, chunk_size=DEFAULT_CHUNK_SIZE, encoding=None):
+    """Streams text from an HTML file in paragraph-aligned chunks.
+
+    Args:
+        path (str): The file path to the HTML file.
+        chunk_size (int): The number of bytes decoded per step.
+        encoding (str, optional): The file encoding. Detected when omitted.
+
+    Yields:
+        str: The text of each chunk with HTML markup removed.
+    """
+    parser = _TextExtractor()
+    for chunk in iter_txt_chunks(path, chunk_size=chunk_size, encoding=encoding):
+        parser.feed(chunk)
+        text = parser.pop_text()
+        if text:
+            yield text
+    parser.close()
+    text = parser.pop_text()
+    if text:
+        yield text
+
 
 def read_html_txt(path):  # from web-scraped .txt with HTML remnants
     """Reads text from an HTML file.
@@ -59,22 +269,60 @@ def read_html_txt(path):  # from web-scraped .txt with HTML remnants
     Returns:
         str: The extracted text from the HTML file.
     """
-    with open(path, 'r', encoding='utf-8') as f:
-        soup = BeautifulSoup(f.read(), "html.parser")
-        return soup.get_text()
+    soup = BeautifulSoup(read_txt(path), "html.parser")
+    return soup.get_text()
+
+
+def iter_text(path, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Streams text from various file formats.
+
+    The format is decided before any text is read, so errors while reading
+    are raised to the caller instead of ending the stream early.
+
+    Args:
+        path (str): The file path to extract text from.
+        chunk_size (int): The number of bytes decoded per step for text files.
+
+    Returns:
+        Iterator[str]: Consecutive pieces of the extracted text; empty if the
+        file cannot be read as text.
+    """
+    if path.endswith(".pdf"):
+        return iter_pdf_pages(path)
+    elif path.endswith(".txt"):
+        return iter_txt_chunks(path, chunk_size=chunk_size)
+    elif path.endswith(".epub"):
+        return iter_epub_documents(path)
+    try:
+        encoding = detect_encoding(path)
+    except Exception:
+        print(f"Unsupported format: {path}")
+        return iter(())
+    return iter_html_txt_chunks(path, chunk_size=chunk_size, encoding=encoding)
 
 
-def extract_text(path):
+def extract_text(path, stream=False, chunk_size=DEFAULT_CHUNK_SIZE):
     """Extract text from various file formats.
 
     Args:
         path (str): The file path to extract text from.
+        stream (bool): If True, return an iterator over text chunks instead of
+            a single string. Supported for every format.
+        chunk_size (int): The number of bytes decoded per step when streaming
+            text files.
 
     Returns:
-        str: The extracted text or an error message.
+        str | Iterator[str]: The extracted text, an iterator over its chunks
+        when ``stream`` is True, or an error message (printed instead when
+        streaming, with an empty iterator returned).
     """
     if not path:
+        if stream:
+            print("No file path provided.")
+            return iter(())
         return "No file path provided."
+    if stream:
+        return iter_text(path, chunk_size=chunk_size)
     if path.endswith(".pdf"):
         return read_pdf(path)
     elif path.endswith(".txt"):
@@ -86,4 +334,4 @@ def extract_text(path):
             return read_html_txt(path)
         except:
             print(f"Unsupported format: {path}")
-        return None
\ No newline at end of file
+        return None
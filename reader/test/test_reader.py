@@ -0,0 +1,56 @@
+from reader.reader import detect_encoding, extract_text, iter_txt_chunks, read_txt
+
+paragraphs = ["Über die Brücke ging der Bär." * 20, "Zweiter Absatz — mit Gedankenstrich.", "Ende."]
+text = "\n\n".join(paragraphs) + "\n"
+
+
+def test_read_txt_utf8(tmp_path):
+    path = tmp_path / "book.txt"
+    path.write_bytes(text.encode("utf-8"))
+    assert detect_encoding(str(path)) == "utf-8"
+    assert read_txt(str(path)) == text
+
+def test_read_txt_legacy_encoding(tmp_path):
+    path = tmp_path / "book.txt"
+    path.write_bytes(text.replace("—", "-").encode("cp1252"))
+    assert read_txt(str(path)) == text.replace("—", "-")
+
+def test_read_txt_utf16_bom(tmp_path):
+    path = tmp_path / "book.txt"
+    path.write_bytes(text.encode("utf-16"))
+    assert detect_encoding(str(path)) == "utf-16"
+    assert read_txt(str(path)) == text
+
+def test_chunks_are_paragraph_aligned(tmp_path):
+    path = tmp_path / "book.txt"
+    short_text = "\n\n".join(p[:30] for p in paragraphs) + "\n"
+    path.write_bytes(short_text.replace("\n", "\r\n").encode("utf-8"))
+    # A tiny chunk size splits multi-byte characters and "\r\n" pairs
+    chunks = list(iter_txt_chunks(str(path), chunk_size=16))
+    assert "".join(chunks) == short_text
+    assert all(chunk.endswith("\n\n") for chunk in chunks[:-1])
+    assert len(chunks) == len(paragraphs)
+
+def test_extract_text_stream(tmp_path):
+    path = tmp_path / "book.txt"
+    path.write_bytes(text.encode("utf-8"))
+    chunks = extract_text(str(path), stream=True, chunk_size=16)
+    assert not isinstance(chunks, str)
+    assert "".join(chunks) == extract_text(str(path))
+
+def test_html_chunks_keep_markup_cut_at_boundaries(tmp_path):
+    path = tmp_path / "page.html"
+    html = "<html><body>" + "".join(
+        f"<p class=\"text\">Absatz {i} &amp; Br&uuml;cke.</p>\n\n" for i in range(20)
+    ) + "</body></html>"
+    path.write_bytes(html.encode("utf-8"))
+    # Chunks of 7 bytes cut through tags and entities
+    streamed = "".join(extract_text(str(path), stream=True, chunk_size=7))
+    assert streamed.split() == extract_text(str(path)).split()
+    assert "Absatz 3 & Brücke." in streamed
+
+def test_extract_text_stream_without_path():
+    assert list(extract_text("", stream=True)) == []
+
+def test_extract_text_stream_unreadable_file(tmp_path):
+    assert list(extract_text(str(tmp_path / "missing.html"), stream=True)) == []
@@ -25,19 +25,29 @@ def clean_text(text):
     return text.strip()
 
 
-def remove_stopwords(text: str):
-    # Detect language
-    lang = detect(text)  
+def detect_stopword_language(text: str):
+    """Detect the language of a text for `remove_stopwords` (once per document)."""
+    lang = detect(text)
     print(f"Detected language: {lang}")
+    return lang
+
+
+def remove_stopwords(text: str, lang: str = None):
+    # Detect language unless the caller did it for the whole document
+    if lang is None:
+        lang = detect_stopword_language(text)
 
     # Load stopwords if available
-    if lang in stopwords.fileids():
-        stop_words = set(stopwords.words(lang))
-    else:
+    try:
+        stop_words = set(stopwords.words(lang)) if lang in stopwords.fileids() else set()
+    except LookupError:  # corpus not downloaded (offline machine)
         stop_words = set()
 
     # Tokenize and filter
-    tokens = word_tokenize(text.lower())
+    try:
+        tokens = word_tokenize(text.lower())
+    except LookupError:  # punkt not downloaded: plain word split
+        tokens = re.findall(r"\w+", text.lower())
     filtered_tokens = [w for w in tokens if w.isalpha() and w not in stop_words]
 
     # Join back into a string for spaCy
@@ -1,17 +1,51 @@
 from collections import Counter
+from typing import Iterable, Union
 import spacy
 import re
 import text_preprocessing.preprocessing as text_prep
+from instrumentation.metrics import stage_timer
+
+# spaCy pipelines by language code (ISO 639-1, as langid/langdetect return them)
+SPACY_MODELS = {
+    "ca": "ca_core_news_sm", "da": "da_core_news_sm", "de": "de_core_news_sm",
+    "el": "el_core_news_sm", "en": "en_core_web_sm", "es": "es_core_news_sm",
+    "fi": "fi_core_news_sm", "fr": "fr_core_news_sm", "hr": "hr_core_news_sm",
+    "it": "it_core_news_sm", "ja": "ja_core_news_sm", "ko": "ko_core_news_sm",
+    "lt": "lt_core_news_sm", "mk": "mk_core_news_sm", "nb": "nb_core_news_sm",
+    "nl": "nl_core_news_sm", "pl": "pl_core_news_sm", "pt": "pt_core_news_sm",
+    "ro": "ro_core_news_sm", "ru": "ru_core_news_sm", "sl": "sl_core_news_sm",
+    "sv": "sv_core_news_sm", "uk": "uk_core_news_sm", "zh": "zh_core_web_sm",
+}
+
+def pipeline_name(lang: str) -> str:
+    """Name and version of the pipeline `load_model(lang)` returns, without loading it."""
+    lang = lang.lower().split("-")[0]
+    if lang in SPACY_MODELS:
+        version = spacy.util.get_package_version(SPACY_MODELS[lang])
+        if version is not None:
+            return f"{SPACY_MODELS[lang]}-{version}"
+    try:
+        spacy.util.get_lang_class(lang)
+    except ImportError:
+        lang = "xx"
+    return f"blank_{lang}-{spacy.__version__}"
 
 def load_model(lang: str):
     """Load spaCy model for a given language code."""
+    lang = lang.lower().split("-")[0]  # "zh-cn" -> "zh"
+    if lang in SPACY_MODELS:
+        try:
+            return spacy.load(SPACY_MODELS[lang])
+        except OSError:
+            pass  # not installed
+    # fallback: tokenizer only (multi-language for codes spaCy does not know)
     try:
-        return spacy.load(f"{lang}_core_news_sm")
-    except OSError:
-        return spacy.blank(lang)  # fallback: tokenizer only
+        return spacy.blank(lang)
+    except ImportError:
+        return spacy.blank("xx")
 
 def extract_frequent_words(
-    text: str,
+    text: Union[str, Iterable[str]],
     lang: str = "de",
     top_pct: float = 10,
     min_len: int = 2,
@@ -19,27 +53,46 @@ def extract_frequent_words(
     min_words: int = 5,
     debug: bool = False
 ):
-    nlp = load_model(lang)
-    text = text_prep.clean_text(text)
-    text = text_prep.remove_stopwords(text)
-    
-    doc = nlp(text)
+    """Count content-word lemmas and return the most frequent ones.
 
-    has_pos = any(token.pos_ for token in doc)
-    
-    content_words = []
-    for token in doc:
-        if not token.is_alpha or token.is_stop or len(token) < min_len:
-            continue
-        if require_pos and has_pos and token.pos_ not in {"NOUN", "VERB", "ADJ"}:
+    ``text`` may be a single string or an iterable of text chunks (e.g.
+    ``reader.extract_text(path, stream=True)``); chunks are processed one at a
+    time so whole books can be analysed with bounded memory.
+    """
+    with stage_timer("spacy_load"):
+        nlp = load_model(lang)
+    chunks = [text] if isinstance(text, str) else text
+
+    counter = Counter()
+    stopword_lang = None  # detected on the first chunk, kept for the whole text
+    for chunk in chunks:
+        with stage_timer("clean_text"):
+            chunk = text_prep.clean_text(chunk)
+        if not chunk:
             continue
-        content_words.append(token.lemma_.lower() if token.lemma_ else token.text.lower())
-    
-    counter = Counter(content_words)
+        with stage_timer("remove_stopwords"):
+            if stopword_lang is None:
+                stopword_lang = text_prep.detect_stopword_language(chunk)
+            chunk = text_prep.remove_stopwords(chunk, stopword_lang)
+
+        with stage_timer("spacy"):
+            doc = nlp(chunk)
+
+        has_pos = any(token.pos_ for token in doc)
+
+        content_words = []
+        for token in doc:
+            if not token.is_alpha or token.is_stop or len(token) < min_len:
+                continue
+            if require_pos and has_pos and token.pos_ not in {"NOUN", "VERB", "ADJ"}:
+                continue
+            content_words.append(token.lemma_.lower() if token.lemma_ else token.text.lower())
+        counter.update(content_words)
+
     sorted_words = counter.most_common()
     
     # Take top X% of unique words
     num_unique = len(sorted_words)
     cutoff = max(min_words, int(num_unique * (top_pct / 100)))
 
-    return sorted_words[:cutoff]
\ No newline at end of file
+    return sorted_words[:cutoff]
@@ -7,6 +7,8 @@ from transformers import (
     MBartForConditionalGeneration, MBart50TokenizerFast,
     BartForConditionalGeneration, BartTokenizer
 )
+from instrumentation.metrics import record_generate, stage_timer
+from words_context import context
 
 device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
 
@@ -26,15 +28,38 @@ def to_mbart_code(lang_code: str) -> str:
 # -----------------------------
 # Load models and tokenizers
 # -----------------------------
+# Loaded on first use by `load_models`, which keeps anything assigned to
+# these globals beforehand (e.g. the tiny models of the offline benchmarks)
+
 # English summarizer
 SUMMARIZER_NAME = "facebook/bart-large-cnn"
-summarizer_tokenizer = BartTokenizer.from_pretrained(SUMMARIZER_NAME)
-summarizer_model = BartForConditionalGeneration.from_pretrained(SUMMARIZER_NAME).to(device)
+summarizer_tokenizer = None
+summarizer_model = None
 
 # Multilingual translation
 MT_MODEL_NAME = "facebook/mbart-large-50-many-to-many-mmt"
-mt_tokenizer = MBart50TokenizerFast.from_pretrained(MT_MODEL_NAME)
-mt_model = MBartForConditionalGeneration.from_pretrained(MT_MODEL_NAME).to(device)
+mt_tokenizer = None
+mt_model = None
+
+
+def load_models():
+    """Load the summarizer and translation models (once)."""
+    global summarizer_tokenizer, summarizer_model, mt_tokenizer, mt_model
+    if summarizer_model is None:
+        with stage_timer("model_load"):
+            summarizer_tokenizer = BartTokenizer.from_pretrained(SUMMARIZER_NAME)
+            summarizer_model = BartForConditionalGeneration.from_pretrained(SUMMARIZER_NAME).to(device)
+    if mt_model is None:
+        if MT_MODEL_NAME == context.model_name:
+            # Same checkpoint as the keyword translator: share one copy of the
+            # weights, but not the tokenizer (not safe to share between threads)
+            _, mt_model = context.load_model()
+            with stage_timer("model_load"):
+                mt_tokenizer = MBart50TokenizerFast.from_pretrained(MT_MODEL_NAME)
+        else:
+            with stage_timer("model_load"):
+                mt_tokenizer = MBart50TokenizerFast.from_pretrained(MT_MODEL_NAME)
+                mt_model = MBartForConditionalGeneration.from_pretrained(MT_MODEL_NAME).to(device)
 
 
 # -----------------------------
@@ -67,31 +92,36 @@ def translate_with_mbart(text: str, src_lang: str, tgt_lang: str) -> str:
     """Translate text using mBART safely."""
     if not text.strip():
         return ""
-    mt_tokenizer.src_lang = to_mbart_code(src_lang)
-    inputs = mt_tokenizer(text, return_tensors="pt", truncation=True, max_length=512).to(device)
-    translated_ids = mt_model.generate(
-        **inputs,
-        forced_bos_token_id=mt_tokenizer.lang_code_to_id[to_mbart_code(tgt_lang)],
-        max_new_tokens=150,
-        num_beams=4
-    )
+    load_models()
+    with stage_timer("translate"):
+        inputs = context.encode_for_mbart(mt_tokenizer, [text], to_mbart_code(src_lang)).to(device)
+        translated_ids = mt_model.generate(
+            **inputs,
+            forced_bos_token_id=mt_tokenizer.lang_code_to_id[to_mbart_code(tgt_lang)],
+            max_new_tokens=150,
+            num_beams=4
+        )
+    record_generate(MT_MODEL_NAME, "translate", 1, inputs["input_ids"].numel(), translated_ids.numel())
     return mt_tokenizer.decode(translated_ids[0], skip_special_tokens=True)
 
 
 def summarize_text_chunks(chunks: List[str]) -> str:
     """Summarize a list of text chunks safely."""
+    load_models()
     summaries = []
     for chunk in chunks:
         if not chunk.strip():
             continue
-        inputs = summarizer_tokenizer(chunk, return_tensors="pt", truncation=True, max_length=1024).to(device)
-        summary_ids = summarizer_model.generate(
-            **inputs,
-            max_length=150,
-            min_length=20,
-            num_beams=4,
-            no_repeat_ngram_size=2
-        )
+        with stage_timer("summarize"):
+            inputs = summarizer_tokenizer(chunk, return_tensors="pt", truncation=True, max_length=1024).to(device)
+            summary_ids = summarizer_model.generate(
+                **inputs,
+                max_length=150,
+                min_length=20,
+                num_beams=4,
+                no_repeat_ngram_size=2
+            )
+        record_generate(SUMMARIZER_NAME, "summarize", 1, inputs["input_ids"].numel(), summary_ids.numel())
         decoded = summarizer_tokenizer.decode(summary_ids[0], skip_special_tokens=True).strip()
         if decoded:
             summaries.append(decoded)
@@ -115,7 +145,8 @@ def summarize_and_translate(
         - translated_to
     """
     # Detect source language
-    detected_lang, _ = langid.classify(text)
+    with stage_timer("langid"):
+        detected_lang, _ = langid.classify(text)
 
     # Step 1: Translate to English if needed
     if detected_lang != "en":
@@ -127,7 +158,9 @@ def summarize_and_translate(
     text_with_keywords = inject_keywords(text_en, keywords)
 
     # Step 3: Chunk and summarize
-    chunks = chunk_text(text_with_keywords, max_tokens=500, tokenizer=summarizer_tokenizer)
+    load_models()
+    with stage_timer("chunk_text"):
+        chunks = chunk_text(text_with_keywords, max_tokens=500, tokenizer=summarizer_tokenizer)
     summary_en = summarize_text_chunks(chunks)
 
     # Step 4: Translate back if needed
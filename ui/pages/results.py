@@ -1,6 +1,12 @@
+import json
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
 import streamlit as st
 import requests
 import pandas as pd
+from requests.adapters import HTTPAdapter
 
 st.set_page_config(
     page_title="Results of text analysis",
@@ -16,25 +22,192 @@ LANGUAGE_CODES = {
     "it": "it_IT", "pt": "pt_XX", "hi": "hi_IN", "ja": "ja_XX", "ko": "ko_KR"
 }
 
-# --- Cached API calls ---
-@st.cache_data(show_spinner="Fetching frequent words...")
-def fetch_frequent_words(text, lang, top_pct, to_lang):
-    response = requests.post(
-        "http://127.0.0.1:8000/frequent-words",
-        json={"text": text},
-        params={"lang": lang, "top_pct": top_pct, "to_lang": to_lang}
+API_URL = "http://127.0.0.1:8000"
+POLL_INTERVAL = 0.1  # seconds between checks for new data while rendering
+SESSION_WORKERS = 2  # concurrent API calls per browser session: the stream and the summary
+
+
+# --- API calls ---
+# The API is called from worker threads, so the requests run concurrently;
+# Streamlit elements are only ever created by the script thread.
+@st.cache_resource
+def get_session():
+    """HTTP session shared by all reruns: keeps the connections to the API open."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def get_executor():
+    """This session's pool for API calls, so busy sessions cannot hold up the others.
+
+    Its threads end once the session (and with it the pool) is gone.
+    """
+    executor = st.session_state.get("api_executor")
+    if executor is None:
+        executor = ThreadPoolExecutor(max_workers=SESSION_WORKERS, thread_name_prefix="api-call")
+        st.session_state.api_executor = executor
+    return executor
+
+
+def stream_frequent_words(session, text, lang, top_pct, to_lang, cancelled=None):
+    """Yield the parts of /frequent-words/stream as they arrive."""
+    with session.post(
+        f"{API_URL}/frequent-words/stream",
+        json={"text": text, "lang": lang, "top_pct": top_pct, "to_lang": to_lang},
+        stream=True,
+        timeout=(10, 600)  # read timeout applies per line, not to the whole book
+    ) as response:
+        response.raise_for_status()
+        for line in response.iter_lines():
+            if cancelled is not None and cancelled.is_set():
+                return  # closing the response stops the work on the server too
+            if line:
+                yield json.loads(line)
+
+
+def stream_in_background(text, lang, top_pct, to_lang, cancelled):
+    """Read the stream in a worker thread; returns a queue of its parts, ended by None."""
+    parts = queue.Queue()
+    session = get_session()  # cached resources are looked up on the script thread
+
+    def produce():
+        try:
+            for part in stream_frequent_words(session, text, lang, top_pct, to_lang, cancelled):
+                parts.put(part)
+        except Exception as e:
+            parts.put({"type": "error", "detail": str(e)})
+        finally:
+            parts.put(None)
+
+    get_executor().submit(produce)
+    return parts
+
+
+def fetch_summary(session, text, summary_translate_to):
+    response = session.post(
+        f"{API_URL}/summarize",
+        json={"text": text, "summary_translate_to": summary_translate_to},
+        timeout=(10, 600)
     )
     response.raise_for_status()
     return response.json()
 
-@st.cache_data(show_spinner="Generating summary...")
-def fetch_summary(text, summary_translate_to):
-    response = requests.post(
-        "http://127.0.0.1:8000/summarize",
-        json={"text": text, "summary_translate_to": summary_translate_to}
-    )
-    response.raise_for_status()
-    return response.json()
+
+def render_keyword(word, entry):
+    title = f"**{word}**"
+    if entry.get("translation"):
+        title += f" — {entry['translation']}"
+    st.markdown(title)
+    for match in entry.get("context", []):
+        st.write(f"- {match.get('sentence', '')}")
+        if match.get("translation"):
+            st.caption(f"→ {match.get('translation')}")
+
+
+class SummarySection:
+    """Placeholder for the summary, filled in as soon as its request (started at once) completes.
+
+    The request outlives the script run that started it: a rerun waits for
+    the same request instead of sending another one.
+    """
+
+    def __init__(self, text, to_lang):
+        self.request_key = (text, to_lang)
+        self.slot = st.empty()
+        self.future = None
+        cached = st.session_state.get("summary")
+        if cached and cached.get("request") == self.request_key:
+            self.render(cached["data"])
+            return
+        pending = st.session_state.get("summary_pending")
+        if pending and pending["request"] == self.request_key:
+            self.future = pending["future"]
+        else:
+            if pending:
+                pending["future"].cancel()  # for other input: dropped unless already sent
+            self.future = get_executor().submit(fetch_summary, get_session(), text, to_lang)
+            st.session_state.summary_pending = {"request": self.request_key, "future": self.future}
+        self.slot.info("Generating summary...")
+
+    def render(self, summary_data):
+        with self.slot.container():
+            st.subheader("Summary")
+            if isinstance(summary_data, dict):
+                st.write(summary_data.get("summary", "No summary returned"))
+                st.caption(f"Summary translated to: {summary_data.get('summary_translated_to', self.request_key[1])}")
+            else:
+                st.error("API returned unexpected format for summary.")
+
+    def poll(self):
+        """Render the summary if it has arrived (call from the script thread)."""
+        if self.future is None or not self.future.done():
+            return
+        future, self.future = self.future, None
+        st.session_state.pop("summary_pending", None)  # failed ones are retried on the next run
+        try:
+            summary_data = future.result()
+        except Exception as e:
+            self.slot.error(f"Failed to get the summary: {e}")
+            return
+        st.session_state.summary = {"request": self.request_key, "data": summary_data}
+        self.render(summary_data)
+
+    def wait(self):
+        if self.future is not None:
+            self.future.exception()  # blocks until done
+            self.poll()
+
+
+def show_frequent_words(text, lang, top_pct, to_lang, poll=None):
+    """Render the analysis progressively and keep the assembled result in session_state.
+
+    `poll` is called while waiting for data, so other sections can render meanwhile.
+    """
+    request_key = (text, lang, top_pct, to_lang)
+    cached = st.session_state.get("analysis")
+    if cached and cached.get("request") == request_key:
+        st.subheader("Word Frequencies")
+        st.dataframe(pd.DataFrame(cached["analysis"]))
+        st.subheader("Keyword Contexts")
+        for word, entry in cached["sentences"].items():
+            render_keyword(word, entry)
+        return
+
+    result = {"request": request_key, "analysis": [], "vocabulary": [], "sentences": {}}
+    status = st.empty()
+    status.info("Analysing word frequencies...")
+    cancelled = threading.Event()
+    parts = stream_in_background(text, lang, top_pct, to_lang, cancelled)
+    try:
+        while True:
+            if poll is not None:
+                poll()
+            try:
+                part = parts.get(timeout=POLL_INTERVAL)
+            except queue.Empty:
+                continue
+            if part is None:
+                break
+            if part["type"] == "error":
+                raise RuntimeError(part["detail"])
+            if part["type"] == "analysis":
+                result["analysis"], result["vocabulary"] = part["analysis"], part["vocabulary"]
+                st.subheader("Word Frequencies")
+                st.dataframe(pd.DataFrame(result["analysis"]))
+                st.subheader("Keyword Contexts")
+            elif part["type"] == "keyword":
+                result["sentences"][part["word"]] = {"translation": part["translation"], "context": part["context"]}
+                render_keyword(part["word"], result["sentences"][part["word"]])
+                status.info(f"Translating contexts... {len(result['sentences'])}/{len(result['vocabulary'])} keywords")
+    finally:
+        # Also when the script is stopped (new input, page left): drop the stream
+        cancelled.set()
+    status.empty()
+    # Only a complete result is kept, so an interrupted run is redone on the next visit
+    st.session_state.analysis = result
 
 
 # --- Main UI ---
@@ -58,46 +231,20 @@ if __name__ == "__main__":
         f"({LANGUAGE_CODES.get(st.session_state.to_lang, 'en_XX')})"
     )
 
+    # --- Summary only if requested; its request runs while the analysis streams ---
+    summary = SummarySection(st.session_state.text, st.session_state.to_lang) if st.session_state.summarize else None
+
     try:
-        # --- Always fetch frequent words (cached) ---
-        result = fetch_frequent_words(
+        # --- Always fetch frequent words (streamed, rendered as they arrive) ---
+        show_frequent_words(
             st.session_state.text,
             lang="de",
             top_pct=10,
-            to_lang=st.session_state.to_lang
+            to_lang=st.session_state.to_lang,
+            poll=summary.poll if summary else None
         )
-
-        if isinstance(result, dict):
-            # --- Word Frequencies ---
-            df = pd.DataFrame(result.get("analysis", []))
-            st.subheader("Word Frequencies")
-            st.dataframe(df)
-
-            # --- Keyword Contexts ---
-            st.subheader("Keyword Contexts")
-            sentences = result.get("sentences", {})
-            if isinstance(sentences, dict):
-                for word, matches in sentences.items():
-                    st.markdown(f"**{word}**")
-                    for match in matches or []:
-                        st.write(f"- {match.get('sentence', '')}")
-                        if match.get("translation"):
-                            st.caption(f"→ {match.get('translation')}")
-
-        else:
-            st.error("API returned unexpected format for frequent words.")
-
-        # --- Fetch summary only if requested ---
-        if st.session_state.summarize:
-            summary_data = fetch_summary(st.session_state.text, st.session_state.to_lang)
-            if isinstance(summary_data, dict):
-                st.subheader("Summary")
-                st.write(summary_data.get("final_summary", "No summary returned"))
-                st.caption(
-                    f"Summary translated to: {summary_data.get('translated_to', st.session_state.to_lang)}"
-                )
-            else:
-                st.error("API returned unexpected format for summary.")
-
     except Exception as e:
         st.error(f"Failed to connect to API: {e}")
+
+    if summary:
+        summary.wait()
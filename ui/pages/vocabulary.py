@@ -1,5 +1,10 @@
+import os
+from urllib.parse import quote, urlencode
+
 import streamlit as st
+import requests
 import pandas as pd
+from requests.adapters import HTTPAdapter
 
 st.set_page_config(
     page_title="Build Vocabulary",
@@ -8,69 +13,248 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-# Check that analysis results exist
-if 'analysis' not in st.session_state or st.session_state.analysis is None:
-    st.warning("No analysis results available. Please run text analysis first.")
-    st.stop()
+VOCAB_API_URL = os.environ.get("VOCAB_API_URL", "http://127.0.0.1:8001")
+# Where browsers reach the vocabulary service (export downloads), if not at VOCAB_API_URL
+VOCAB_PUBLIC_URL = os.environ.get("VOCAB_PUBLIC_URL", VOCAB_API_URL)
+PAGE_SIZE = 50  # words per page of the editor
+SOURCE_LANG = "de"
+
+
+# --- API calls ---
+@st.cache_resource
+def get_session():
+    """HTTP session shared by all reruns: keeps the connections to the vocabulary service open."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=2, pool_maxsize=8)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def user_url(user_id, path="", base_url=VOCAB_API_URL):
+    return f"{base_url}/vocabulary/{quote(user_id, safe='')}{path}"
+
+
+def fetch_page(user_id, after_word):
+    """Return one page of the user's words; an unchanged page is revalidated with its ETag."""
+    params = {"limit": PAGE_SIZE}
+    if after_word is not None:
+        params["after_word"] = after_word
+    cached = st.session_state.get("vocab_page")
+    key = (user_id, after_word)
+    headers = {}
+    if cached and cached["key"] == key:
+        headers["If-None-Match"] = cached["etag"]
+    response = get_session().get(user_url(user_id), params=params, headers=headers, timeout=(5, 30))
+    if response.status_code == 304:
+        return cached["data"]
+    response.raise_for_status()
+    data = response.json()
+    st.session_state.vocab_page = {"key": key, "etag": response.headers.get("ETag"), "data": data}
+    return data
+
+
+def sync(user_id, payload):
+    response = get_session().post(user_url(user_id, "/sync/"), json=payload, timeout=(5, 120))
+    response.raise_for_status()
+    return response.json()
+
+
+# --- Staged edits ---
+# Nothing is written until "Sync": edits of every visited page are kept here
+# (page cursor -> edits) and sent to the service in one batch.
+def init_state(user_id):
+    if st.session_state.get("vocab_user") != user_id:
+        st.session_state.vocab_user = user_id
+        st.session_state.vocab_cursors = [None]  # after_word of each page up to the current one
+        reset_staged()
+
+
+def reset_staged():
+    # after_word -> {"translations": {word: ...}, "removed": [(word, sentence)], "deleted": [word]}
+    st.session_state.vocab_staged = {}
+    st.session_state.vocab_added = {}  # word -> {"translation": ..., "sentences": [...]}
+    st.session_state.vocab_editor = None
+    st.session_state.setdefault("vocab_generation", 0)
+
 
-# Initialize vocabulary table in session_state
-if 'vocab_table' not in st.session_state:
+def page_rows(words):
+    """One row per (word, example sentence) of a page of the vocabulary."""
     rows = []
-    analysis = st.session_state.analysis
-    for word, matches in analysis.get("sentences", {}).items():
-        word_translation = analysis.get("translation", {}).get(word, "")
-        if not matches:
-            rows.append({
-                "Word": word,
-                "Word Translation": word_translation,
-                "Context": "",
-                "Context Translation": ""
-            })
+    for entry in words:
+        for sentence in entry["sentences"] or [""]:
+            rows.append({"Word": entry["word"], "Translation": entry["translation"],
+                         "Context": sentence, "Remove": False})
+    return pd.DataFrame(rows, columns=["Word", "Translation", "Context", "Remove"])
+
+
+def apply_staged(rows, staged):
+    rows = rows.copy()
+    translations = staged.get("translations", {})
+    removed = set(staged.get("removed", []))
+    for i, row in rows.iterrows():
+        if row["Word"] in translations:
+            rows.at[i, "Translation"] = translations[row["Word"]]
+        rows.at[i, "Remove"] = (row["Word"], row["Context"]) in removed
+    return rows
+
+
+def diff_page(server_rows, edited):
+    """Edits of a page relative to the server's version of it."""
+    translations = {}
+    removed = []
+    rows_kept = {}  # word -> rows not removed (all rows of a word are on one page)
+    for i, row in edited.iterrows():
+        word, original = server_rows.at[i, "Word"], server_rows.at[i, "Translation"]
+        # A word spans several rows: an edit in any of them renames it
+        translation = (row["Translation"] or "").strip()
+        if translation and translation != original:
+            translations[word] = translation
+        rows_kept.setdefault(word, 0)
+        if row["Remove"]:
+            removed.append((word, server_rows.at[i, "Context"]))
         else:
-            for match in matches:
-                rows.append({
-                    "Word": word,
-                    "Word Translation": word_translation,
-                    "Context": match.get("sentence", ""),
-                    "Context Translation": match.get("translation", "")
-                })
-    st.session_state.vocab_table = pd.DataFrame(rows)
+            rows_kept[word] += 1
+    deleted = [word for word, kept in rows_kept.items() if not kept]
+    return {"translations": translations, "removed": removed, "deleted": deleted}
+
+
+def build_payload(staged_pages, added, to_lang):
+    """The sync request for the staged edits of every page and the added words."""
+    upsert = [{"word": word, "translation": entry["translation"], "sentences": entry["sentences"]}
+              for word, entry in added.items()]
+    delete_sentences = {}
+    delete_words = []
+    for staged in staged_pages.values():
+        # A word losing only some examples keeps its translation edit
+        deleted = set(staged["deleted"])
+        for word, sentence in staged["removed"]:
+            if sentence:
+                delete_sentences.setdefault(word, []).append(sentence)
+            else:
+                delete_words.append(word)  # a word without example sentences
+        upsert += [{"word": word, "translation": translation, "corrected": True}
+                   for word, translation in staged["translations"].items() if word not in deleted]
+    return {
+        "upsert": upsert,
+        "delete_sentences": [{"word": word, "sentences": sentences} for word, sentences in delete_sentences.items()],
+        "delete_words": delete_words,
+        "src_lang": SOURCE_LANG,
+        "tgt_lang": to_lang,
+    }
+
 
+def stage_analysis(analysis):
+    """Stage the analysed keywords (with their example sentences) for saving."""
+    for word, entry in analysis.get("sentences", {}).items():
+        st.session_state.vocab_added[word] = {
+            "translation": entry.get("translation") or "",
+            "sentences": [match.get("sentence", "") for match in entry.get("context", []) if match.get("sentence")],
+        }
 
-def remove_word(word):
-    st.session_state.vocab_table = st.session_state.vocab_table[st.session_state.vocab_table["Word"] != word]
 
-def remove_context(idx):
-    st.session_state.vocab_table = st.session_state.vocab_table.drop(idx).reset_index(drop=True)
+# --- Main UI ---
+if 'to_lang' not in st.session_state:
+    st.session_state.to_lang = "en"
 
 if __name__ == "__main__":
     st.title("Build Vocabulary")
 
+    user_id = st.sidebar.text_input("User", value=st.session_state.get("vocab_user") or "default_user").strip()
+    if not user_id:
+        st.warning("Enter a user name in the sidebar.")
+        st.stop()
+    init_state(user_id)
+
+    analysis = st.session_state.get("analysis")
+    if analysis and analysis.get("sentences"):
+        if st.button(f"Add {len(analysis['sentences'])} analysed words"):
+            stage_analysis(analysis)
+    else:
+        st.info("Run a text analysis to add its keywords to your vocabulary.")
+
+    # --- Editor: one page of the stored vocabulary ---
     st.subheader("Manage Vocabulary")
+    after_word = st.session_state.vocab_cursors[-1]
+    try:
+        page = fetch_page(user_id, after_word)
+    except Exception as e:
+        st.error(f"Failed to load the vocabulary: {e}")
+        st.stop()
+
+    server_rows = page_rows(page["vocabulary"])
+    editor_key = (user_id, after_word, st.session_state.vocab_page["etag"])
+    editor = st.session_state.vocab_editor
+    if editor is None or editor["key"] != editor_key:
+        # The editor's input stays fixed while the page (in this version) is
+        # shown: the editor keeps its edits as changes to that input
+        editor = {"key": editor_key,
+                  "data": apply_staged(server_rows, st.session_state.vocab_staged.get(after_word, {}))}
+        st.session_state.vocab_editor = editor
+        st.session_state.vocab_generation += 1
+
+    if server_rows.empty:
+        st.caption("No words on this page yet.")
+    else:
+        edited = st.data_editor(
+            editor["data"],
+            key=f"vocab_editor_{st.session_state.vocab_generation}",
+            hide_index=True,
+            num_rows="fixed",
+            disabled=["Word", "Context"],
+            column_config={
+                "Translation": st.column_config.TextColumn(help="Edit in any row of the word"),
+                "Context": st.column_config.TextColumn(width="large"),
+                "Remove": st.column_config.CheckboxColumn(help="Remove this example; a word goes with its last one"),
+            },
+        )
+        st.session_state.vocab_staged[after_word] = diff_page(server_rows, edited)
+
+    page_number = len(st.session_state.vocab_cursors)
+    col_prev, col_page, col_next = st.columns([1, 2, 1])
+    if col_prev.button("← Previous", disabled=page_number == 1):
+        st.session_state.vocab_cursors.pop()
+        st.rerun()
+    col_page.caption(f"Page {page_number}")
+    if col_next.button("Next →", disabled=page["next_after_word"] is None):
+        st.session_state.vocab_cursors.append(page["next_after_word"])
+        st.rerun()
+
+    # --- Pending changes, written in one batch ---
+    payload = build_payload(st.session_state.vocab_staged, st.session_state.vocab_added, st.session_state.to_lang)
+    n_sentences = sum(len(item["sentences"]) for item in payload["delete_sentences"])
+    pending = len(payload["upsert"]) + n_sentences + len(payload["delete_words"])
+    st.subheader("Pending Changes")
+    if pending:
+        n_added = len(st.session_state.vocab_added)
+        st.write(f"{n_added} words to add, {len(payload['upsert']) - n_added} translations changed, "
+                 f"{n_sentences + len(payload['delete_words'])} examples to remove.")
+    else:
+        st.caption("No unsaved changes.")
+    col_sync, col_discard = st.columns(2)
+    if col_sync.button("Sync", type="primary", disabled=not pending):
+        try:
+            result = sync(user_id, payload)
+        except Exception as e:
+            st.error(f"Failed to save the changes: {e}")
+        else:
+            reset_staged()
+            st.session_state.vocab_cursors = [None]
+            st.session_state.vocab_synced = result
+            st.rerun()
+    if col_discard.button("Discard", disabled=not pending):
+        reset_staged()
+        st.rerun()
+    synced = st.session_state.pop("vocab_synced", None)
+    if synced:
+        st.success(f"Saved: {synced['upserted']} words written, {synced['deleted_words']} removed.")
+        if synced["missing_words"]:
+            st.warning(f"No longer in the vocabulary: {', '.join(synced['missing_words'])}")
 
-    df = st.session_state.vocab_table.copy()
-
-    for idx, row in df.iterrows():
-        st.markdown(f"**{row['Word']}**")
-        if row['Word Translation']:
-            st.caption(f"→ Word Translation: {row['Word Translation']}")
-        st.write(f"- Context: {row['Context']}")
-        if row['Context Translation']:
-            st.caption(f"→ Context Translation: {row['Context Translation']}")
-        col1, col2 = st.columns(2)
-        if col1.button("Remove Word", key=f"word_{idx}"):
-            remove_word(row['Word'])
-        if col2.button("Remove This Example", key=f"context_{idx}"):
-            remove_context(idx)
-
-    st.subheader("Current Vocabulary Table")
-    st.dataframe(st.session_state.vocab_table)
-
-    # Download CSV
-    csv = st.session_state.vocab_table.to_csv(index=False).encode("utf-8")
-    st.download_button(
-        "Download Vocabulary CSV",
-        data=csv,
-        file_name="vocabulary.csv",
-        mime="text/csv"
-    )
+    # --- Export, streamed by the vocabulary service ---
+    st.subheader("Export Deck")
+    col_csv, col_anki = st.columns(2)
+    export_url = user_url(user_id, "/export", VOCAB_PUBLIC_URL)
+    col_csv.link_button("Download CSV", f"{export_url}?{urlencode({'format': 'csv'})}")
+    col_anki.link_button("Download for Anki", f"{export_url}?{urlencode({'format': 'anki'})}")
+    st.caption("Saved words only: sync pending changes first.")
@@ -0,0 +1,64 @@
+import importlib.util
+import os
+
+PAGE = os.path.join(os.path.dirname(__file__), os.pardir, "pages", "vocabulary.py")
+
+
+def _load_page():
+    # Pages are scripts, not a package; outside `streamlit run` the UI part is skipped
+    spec = importlib.util.spec_from_file_location("vocabulary_page", PAGE)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+page = _load_page()
+
+WORDS = [
+    {"word": "Haus", "translation": "house", "sentences": ["Das Haus.", "Ein Haus."]},
+    {"word": "Baum", "translation": "tree", "sentences": ["Der Baum."]},
+    {"word": "Maus", "translation": "mouse", "sentences": []},
+]
+
+
+def edit(server_rows, changes):
+    edited = server_rows.copy()
+    for i, column, value in changes:
+        edited.at[i, column] = value
+    return edited
+
+
+def test_partly_removed_word_keeps_its_translation_edit():
+    server_rows = page.page_rows(WORDS)
+    edited = edit(server_rows, [(0, "Translation", "home"), (0, "Remove", True)])
+    staged = {None: page.diff_page(server_rows, edited)}
+
+    payload = page.build_payload(staged, {}, "en")
+    assert payload["upsert"] == [{"word": "Haus", "translation": "home", "corrected": True}]
+    assert payload["delete_sentences"] == [{"word": "Haus", "sentences": ["Das Haus."]}]
+    assert payload["delete_words"] == []
+
+
+def test_deleted_words_drop_their_translation_edits():
+    server_rows = page.page_rows(WORDS)
+    edited = edit(server_rows, [
+        (0, "Translation", "home"), (0, "Remove", True), (1, "Remove", True),  # every example of Haus
+        (3, "Translation", "rodent"), (3, "Remove", True),                     # Maus, without examples
+        (2, "Translation", "wood"),
+    ])
+    staged = {None: page.diff_page(server_rows, edited)}
+    added = {"Hund": {"translation": "dog", "sentences": ["Der Hund."]}}
+
+    payload = page.build_payload(staged, added, "en")
+    assert payload["upsert"] == [
+        {"word": "Hund", "translation": "dog", "sentences": ["Der Hund."]},
+        {"word": "Baum", "translation": "wood", "corrected": True},
+    ]
+    assert payload["delete_sentences"] == [{"word": "Haus", "sentences": ["Das Haus.", "Ein Haus."]}]
+    assert payload["delete_words"] == ["Maus"]
+    assert (payload["src_lang"], payload["tgt_lang"]) == ("de", "en")
+
+
+def test_page_rows_without_sentences():
+    rows = page.page_rows(WORDS[2:])
+    assert list(rows.itertuples(index=False, name=None)) == [("Maus", "mouse", "", False)]
@@ -0,0 +1,120 @@
+"""
+Storage backend interface of the vocabulary service.
+
+A backend stores words (with translation and example sentences) per user and
+a version per user that every write advances in the same transaction. The
+service picks one backend from the VOCAB_BACKEND environment variable:
+
+- "postgres" (default): asyncpg pool, see `vocabulary.backends.postgres`;
+- "sqlite": embedded database file in WAL mode, see `vocabulary.backends.sqlite`.
+"""
+
+import os
+from abc import ABC, abstractmethod
+from typing import AsyncIterator, Dict, List, Optional, Sequence, Tuple
+
+BACKEND = os.environ.get("VOCAB_BACKEND", "postgres")
+
+# (user_id, word, translation, sentences) with unique (user_id, word) pairs
+VocabEntry = Tuple[str, str, str, List[str]]
+
+
+class VocabularyBackend(ABC):
+    """Operations every storage backend implements (abstract: a backend missing one cannot be created)."""
+
+    name = "base"
+
+    @abstractmethod
+    async def create_schema(self):
+        """Create (or migrate) the tables; must be idempotent."""
+        raise NotImplementedError
+
+    @abstractmethod
+    async def close(self):
+        raise NotImplementedError
+
+    @abstractmethod
+    async def ping(self):
+        """Raise if the storage is not reachable."""
+        raise NotImplementedError
+
+    def metrics(self) -> Dict:
+        return {"backend": self.name}
+
+    @abstractmethod
+    async def get_version(self, user_id: str) -> int:
+        """Return the user's vocabulary version (0 if never written)."""
+        raise NotImplementedError
+
+    @abstractmethod
+    async def count_words(self, user_id: str) -> int:
+        """Return the number of words the user has."""
+        raise NotImplementedError
+
+    @abstractmethod
+    async def upsert(self, entries: Sequence[VocabEntry]):
+        """Insert or update words; the translation is replaced, new sentences are appended."""
+        raise NotImplementedError
+
+    @abstractmethod
+    async def fetch_vocab(
+        self,
+        user_id: str,
+        after_word: Optional[str] = None,
+        limit: Optional[int] = None,
+        fields: Sequence[str] = ("word", "translation", "sentences")
+    ) -> List[Dict]:
+        """Return a page of words ordered by word (keyset pagination on `after_word`)."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def iter_vocab(self, user_id: str, fields: Sequence[str]) -> AsyncIterator[Dict]:
+        """Yield all of a user's words ordered by word, in constant memory."""
+        raise NotImplementedError
+
+    @abstractmethod
+    async def delete_words(self, user_id: str, words: Sequence[str]) -> int:
+        """Delete words of a user; returns the number deleted."""
+        raise NotImplementedError
+
+    @abstractmethod
+    async def delete_sentences(self, user_id: str, word: str, sentences: Sequence[str]) -> bool:
+        """Delete sentences of a word, and the word once none are left.
+
+        Returns False if the word does not exist.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    async def update_translation(self, user_id: str, word: str, translation: str) -> bool:
+        """Replace a word's translation; returns False if the word does not exist."""
+        raise NotImplementedError
+
+    @abstractmethod
+    async def sync(
+        self,
+        user_id: str,
+        upserts: Sequence[VocabEntry] = (),
+        delete_sentences: Sequence[Tuple[str, List[str]]] = (),
+        delete_words: Sequence[str] = ()
+    ) -> Dict:
+        """Apply a batch of edits of one user in a single transaction.
+
+        Upserts run first, then sentence deletions (word, sentences), then word
+        deletions. Returns the counts "upserted" and "deleted_words" and the
+        "missing_words" whose sentences could not be deleted.
+        """
+        raise NotImplementedError
+
+
+def create_backend(name: Optional[str] = None) -> VocabularyBackend:
+    """Instantiate the backend called `name` (default: VOCAB_BACKEND)."""
+    name = (name or BACKEND).lower()
+    # Imported lazily so that each backend's driver is only needed when used
+    if name == "postgres":
+        from vocabulary.backends.postgres import PostgresBackend
+        return PostgresBackend()
+    if name == "sqlite":
+        from vocabulary.backends.sqlite import SQLiteBackend
+        return SQLiteBackend()
+    raise ValueError(f"Unknown vocabulary backend: {name}")
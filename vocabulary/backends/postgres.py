@@ -0,0 +1,267 @@
+"""
+PostgreSQL storage backend (asyncpg pool from `vocabulary.db`).
+
+Connection settings come from the VOCAB_PG_* environment variables;
+VOCAB_PG_PASSWORD has no default and must be set.
+"""
+
+import json
+import os
+from contextlib import asynccontextmanager
+from typing import Dict, List, Optional, Sequence
+
+from vocabulary import db
+from vocabulary.backends.base import VocabEntry, VocabularyBackend
+
+PG_CONN_PARAMS = {
+    "host": os.environ.get("VOCAB_PG_HOST", "localhost"),
+    "port": int(os.environ.get("VOCAB_PG_PORT", 5432)),
+    "user": os.environ.get("VOCAB_PG_USER"),  # None: the login user, as for psql
+    "password": os.environ.get("VOCAB_PG_PASSWORD"),
+    "database": os.environ.get("VOCAB_PG_DATABASE", "SmartVocabulary"),
+}
+
+EXPORT_BATCH = 500  # words read per query by `iter_vocab`
+
+VOCAB_COLUMNS = {
+    "word": "v.word",
+    "translation": "v.translation",
+    "sentences": """COALESCE((
+        SELECT array_agg(s.sentence ORDER BY s.id)
+        FROM user_vocabulary_sentences s WHERE s.vocab_id = v.id
+    ), '{}') AS sentences""",
+}
+
+
+def _vocab_query(fields: Sequence[str]) -> str:
+    # Column expressions come from VOCAB_COLUMNS only, never from the request directly
+    columns = ", ".join(VOCAB_COLUMNS[f] for f in VOCAB_COLUMNS if f in fields)
+    return f"""
+        SELECT {columns}
+        FROM user_vocabulary v
+        WHERE v.user_id = $1 AND ($2::text IS NULL OR v.word > $2)
+        ORDER BY v.word
+        LIMIT $3;
+    """
+
+
+def _rowcount(status: str) -> int:
+    """Parse the affected row count from a command status such as 'DELETE 3'."""
+    return int(status.split()[-1])
+
+
+async def _bump_versions(conn, user_ids):
+    """Advance the vocabulary version of users written in this transaction."""
+    await conn.execute("""
+        INSERT INTO user_vocabulary_versions (user_id, version)
+        SELECT DISTINCT unnest($1::text[]), 1
+        ON CONFLICT (user_id) DO UPDATE
+        SET version = user_vocabulary_versions.version + 1;
+    """, list(user_ids))
+
+
+async def _upsert(conn, entries: Sequence[VocabEntry]):
+    user_ids, words, translations, sentences = zip(*entries)
+    # Sentence lists differ in length, so they travel as JSON arrays next to the other columns
+    await conn.execute("""
+        WITH input AS (
+            SELECT * FROM unnest($1::text[], $2::text[], $3::text[], $4::jsonb[])
+                AS i(user_id, word, translation, sentences)
+        ), v AS (
+            INSERT INTO user_vocabulary (user_id, word, translation)
+            SELECT user_id, word, translation FROM input
+            ON CONFLICT (user_id, word) DO UPDATE
+            SET translation = EXCLUDED.translation
+            RETURNING id, user_id, word
+        )
+        INSERT INTO user_vocabulary_sentences (vocab_id, sentence)
+        SELECT v.id, s.sentence
+        FROM v
+        JOIN input USING (user_id, word),
+            jsonb_array_elements_text(input.sentences) WITH ORDINALITY AS s(sentence, n)
+        ORDER BY v.id, s.n
+        ON CONFLICT (vocab_id, sentence_hash) DO NOTHING;
+    """, list(user_ids), list(words), list(translations), [json.dumps(s) for s in sentences])
+
+
+async def _delete_words(conn, user_id: str, words: Sequence[str]) -> int:
+    status = await conn.execute("""
+        DELETE FROM user_vocabulary
+        WHERE user_id = $1 AND word = ANY($2::text[]);
+    """, user_id, list(words))
+    return _rowcount(status)
+
+
+async def _delete_sentences(conn, user_id: str, word: str, sentences: Sequence[str]) -> bool:
+    # One statement: lock the word, drop the sentences and drop the word too if
+    # none of its sentences remain (all CTEs see the rows as they were before)
+    found = await conn.fetchval("""
+        WITH v AS (
+            SELECT id FROM user_vocabulary
+            WHERE user_id = $1 AND word = $2
+            FOR UPDATE
+        ), removed AS (
+            DELETE FROM user_vocabulary_sentences s
+            USING v
+            WHERE s.vocab_id = v.id AND s.sentence = ANY($3::text[])
+        ), emptied AS (
+            DELETE FROM user_vocabulary u
+            USING v
+            WHERE u.id = v.id AND NOT EXISTS (
+                SELECT 1 FROM user_vocabulary_sentences s
+                WHERE s.vocab_id = v.id AND s.sentence <> ALL($3::text[])
+            )
+        )
+        SELECT count(*) FROM v;
+    """, user_id, word, list(sentences))
+    return bool(found)
+
+
+class PostgresBackend(VocabularyBackend):
+    name = "postgres"
+
+    def __init__(self, conn_params=None, **pool_options):
+        self.conn_params = conn_params or PG_CONN_PARAMS
+        if not self.conn_params.get("password"):
+            raise RuntimeError("VOCAB_PG_PASSWORD is not set: it is required for the postgres backend")
+        self.pool_options = pool_options
+
+    @asynccontextmanager
+    async def connection(self):
+        """Check out a pooled connection (commits on success, rolls back on error)."""
+        pool = await db.init_pool(self.conn_params, **self.pool_options)
+        async with pool.connection() as conn:
+            yield conn
+
+    async def create_schema(self):
+        # Example sentences live in their own table, one row per (word, sentence),
+        # deduplicated by an MD5 hash so long sentences stay cheap to index.
+        # UNIQUE(user_id, word) also serves lookups by user_id alone and the
+        # ORDER BY word of paginated reads.
+        async with self.connection() as conn:
+            await conn.execute("""
+                CREATE TABLE IF NOT EXISTS user_vocabulary (
+                    id SERIAL PRIMARY KEY,
+                    user_id TEXT NOT NULL,
+                    word TEXT NOT NULL,
+                    translation TEXT NOT NULL,
+                    created_at TIMESTAMP DEFAULT NOW(),
+                    UNIQUE(user_id, word)
+                );
+                CREATE TABLE IF NOT EXISTS user_vocabulary_sentences (
+                    id BIGSERIAL PRIMARY KEY,
+                    vocab_id INTEGER NOT NULL REFERENCES user_vocabulary(id) ON DELETE CASCADE,
+                    sentence TEXT NOT NULL,
+                    sentence_hash BYTEA GENERATED ALWAYS AS (decode(md5(sentence), 'hex')) STORED,
+                    UNIQUE(vocab_id, sentence_hash)
+                );
+                CREATE TABLE IF NOT EXISTS user_vocabulary_versions (
+                    user_id TEXT PRIMARY KEY,
+                    version BIGINT NOT NULL
+                );
+            """)
+            await self.migrate_sentences_to_table(conn)
+
+    async def migrate_sentences_to_table(self, conn):
+        """Move sentences out of the former user_vocabulary.sentences TEXT[] column (idempotent)."""
+        await conn.execute("""
+            DO $$
+            BEGIN
+                IF EXISTS (
+                    SELECT 1 FROM information_schema.columns
+                    WHERE table_schema = current_schema()
+                      AND table_name = 'user_vocabulary' AND column_name = 'sentences'
+                ) THEN
+                    INSERT INTO user_vocabulary_sentences (vocab_id, sentence)
+                    SELECT v.id, s.sentence
+                    FROM user_vocabulary v, unnest(v.sentences) WITH ORDINALITY AS s(sentence, n)
+                    ORDER BY v.id, s.n
+                    ON CONFLICT (vocab_id, sentence_hash) DO NOTHING;
+                    ALTER TABLE user_vocabulary DROP COLUMN sentences;
+                END IF;
+            END $$;
+        """)
+
+    async def close(self):
+        await db.close_pool()
+
+    async def ping(self):
+        pool = await db.init_pool(self.conn_params, **self.pool_options)
+        await pool.ping()
+
+    def metrics(self) -> Dict:
+        try:
+            return {"backend": self.name, "pool": db.get_pool().metrics()}
+        except RuntimeError:  # no pool yet
+            return {"backend": self.name}
+
+    async def get_version(self, user_id: str) -> int:
+        async with self.connection() as conn:
+            version = await conn.fetchval(
+                "SELECT version FROM user_vocabulary_versions WHERE user_id = $1;", user_id
+            )
+        return version or 0
+
+    async def count_words(self, user_id: str) -> int:
+        async with self.connection() as conn:
+            return await conn.fetchval("SELECT count(*) FROM user_vocabulary WHERE user_id = $1;", user_id)
+
+    async def upsert(self, entries: Sequence[VocabEntry]):
+        """Upsert all entries with one multi-row statement."""
+        if not entries:
+            return
+        async with self.connection() as conn:
+            await _upsert(conn, entries)
+            await _bump_versions(conn, {entry[0] for entry in entries})
+
+    async def fetch_vocab(self, user_id, after_word=None, limit=None, fields=tuple(VOCAB_COLUMNS)) -> List[Dict]:
+        async with self.connection() as conn:
+            rows = await conn.fetch(_vocab_query(fields), user_id, after_word, limit)
+        return [dict(r) for r in rows]
+
+    async def iter_vocab(self, user_id, fields=tuple(VOCAB_COLUMNS)):
+        # Keyset batches, each on a pooled connection held for one query: a slow
+        # client never pins a connection (or a transaction) for the whole export
+        after_word = None
+        while True:
+            rows = await self.fetch_vocab(user_id, after_word, EXPORT_BATCH, ("word", *fields))
+            for row in rows:
+                yield {f: row[f] for f in fields}
+            if len(rows) < EXPORT_BATCH:
+                return
+            after_word = rows[-1]["word"]
+
+    async def delete_words(self, user_id, words) -> int:
+        async with self.connection() as conn:
+            deleted = await _delete_words(conn, user_id, words)
+            await _bump_versions(conn, [user_id])
+        return deleted
+
+    async def delete_sentences(self, user_id, word, sentences) -> bool:
+        async with self.connection() as conn:
+            found = await _delete_sentences(conn, user_id, word, sentences)
+            if found:
+                await _bump_versions(conn, [user_id])
+        return found
+
+    async def sync(self, user_id, upserts=(), delete_sentences=(), delete_words=()) -> Dict:
+        async with self.connection() as conn:
+            if upserts:
+                await _upsert(conn, upserts)
+            missing = [word for word, sentences in delete_sentences
+                       if not await _delete_sentences(conn, user_id, word, sentences)]
+            deleted = await _delete_words(conn, user_id, delete_words) if delete_words else 0
+            await _bump_versions(conn, [user_id])
+        return {"upserted": len(upserts), "deleted_words": deleted, "missing_words": missing}
+
+    async def update_translation(self, user_id, word, translation) -> bool:
+        async with self.connection() as conn:
+            status = await conn.execute("""
+                UPDATE user_vocabulary
+                SET translation = $1
+                WHERE user_id = $2 AND word = $3;
+            """, translation, user_id, word)
+            updated = _rowcount(status) > 0
+            if updated:
+                await _bump_versions(conn, [user_id])
+        return updated
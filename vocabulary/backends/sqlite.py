@@ -0,0 +1,287 @@
+"""
+Embedded SQLite storage backend for single-node installs, CI and benchmarks.
+
+The database is one file (VOCAB_SQLITE_PATH) in WAL mode, so readers never
+wait for the writer. sqlite3 calls are blocking; they run in worker threads
+(`asyncio.to_thread`) on a small pool of connections, and write transactions
+start with BEGIN IMMEDIATE so concurrent writers queue up instead of failing
+halfway through.
+"""
+
+import asyncio
+import os
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Dict, List, Sequence
+
+from vocabulary.backends.base import VocabEntry, VocabularyBackend
+
+SQLITE_PATH = os.environ.get("VOCAB_SQLITE_PATH", os.path.join("data", "vocabulary.sqlite3"))
+SQLITE_POOL_SIZE = int(os.environ.get("VOCAB_SQLITE_POOL_SIZE", 4))
+# Milliseconds a writer waits for the database lock before failing
+SQLITE_BUSY_TIMEOUT = int(os.environ.get("VOCAB_SQLITE_BUSY_TIMEOUT", 5000))
+
+EXPORT_BATCH = 500  # words read per query by `iter_vocab`
+SQL_VARIABLES = 900  # stay below SQLite's bound-parameter limit
+
+
+class SQLiteBackend(VocabularyBackend):
+    name = "sqlite"
+
+    def __init__(self, path=None, pool_size=SQLITE_POOL_SIZE):
+        self.path = path or SQLITE_PATH
+        self.pool_size = pool_size
+        self._connections = queue.Queue()
+        self._opened = 0
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        if os.path.dirname(self.path):
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        # isolation_level=None: transactions are started explicitly below
+        conn = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False)
+        conn.execute(f"PRAGMA busy_timeout = {SQLITE_BUSY_TIMEOUT};")
+        conn.execute("PRAGMA journal_mode = WAL;")
+        conn.execute("PRAGMA synchronous = NORMAL;")
+        conn.execute("PRAGMA foreign_keys = ON;")
+        return conn
+
+    @contextmanager
+    def connection(self, write=False):
+        """Check out a connection for one transaction (blocking; call from a thread)."""
+        try:
+            conn = self._connections.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                open_new = self._opened < self.pool_size
+                if open_new:
+                    self._opened += 1
+            if not open_new:
+                conn = self._connections.get()
+            else:
+                try:
+                    conn = self._connect()
+                except Exception:
+                    with self._lock:
+                        self._opened -= 1
+                    raise
+        try:
+            conn.execute("BEGIN IMMEDIATE;" if write else "BEGIN;")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK;")
+                raise
+            conn.execute("COMMIT;")
+        finally:
+            self._connections.put(conn)
+
+    def _run(self, func, *args, write=False):
+        def call():
+            with self.connection(write) as conn:
+                return func(conn, *args)
+        return asyncio.to_thread(call)
+
+    # ----------------------------
+    # Blocking implementations
+    # ----------------------------
+    @staticmethod
+    def _create_schema(conn):
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS user_vocabulary (
+                id INTEGER PRIMARY KEY,
+                user_id TEXT NOT NULL,
+                word TEXT NOT NULL,
+                translation TEXT NOT NULL,
+                created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+                UNIQUE(user_id, word)
+            );
+        """)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS user_vocabulary_sentences (
+                id INTEGER PRIMARY KEY,
+                vocab_id INTEGER NOT NULL REFERENCES user_vocabulary(id) ON DELETE CASCADE,
+                sentence TEXT NOT NULL,
+                UNIQUE(vocab_id, sentence)
+            );
+        """)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS user_vocabulary_versions (
+                user_id TEXT PRIMARY KEY,
+                version INTEGER NOT NULL
+            );
+        """)
+
+    @staticmethod
+    def _bump_versions(conn, user_ids):
+        conn.executemany("""
+            INSERT INTO user_vocabulary_versions (user_id, version) VALUES (?, 1)
+            ON CONFLICT (user_id) DO UPDATE SET version = version + 1;
+        """, [(user_id,) for user_id in set(user_ids)])
+
+    @staticmethod
+    def _get_version(conn, user_id):
+        row = conn.execute(
+            "SELECT version FROM user_vocabulary_versions WHERE user_id = ?;", (user_id,)
+        ).fetchone()
+        return row[0] if row else 0
+
+    @staticmethod
+    def _count_words(conn, user_id):
+        return conn.execute("SELECT count(*) FROM user_vocabulary WHERE user_id = ?;", (user_id,)).fetchone()[0]
+
+    @classmethod
+    def _upsert(cls, conn, entries):
+        # Two statements executed over all rows: the words, then their sentences
+        # (the vocab id is looked up through the UNIQUE(user_id, word) index)
+        conn.executemany("""
+            INSERT INTO user_vocabulary (user_id, word, translation) VALUES (?, ?, ?)
+            ON CONFLICT (user_id, word) DO UPDATE SET translation = excluded.translation;
+        """, [(user_id, word, translation) for user_id, word, translation, _ in entries])
+        conn.executemany("""
+            INSERT OR IGNORE INTO user_vocabulary_sentences (vocab_id, sentence)
+            SELECT id, ? FROM user_vocabulary WHERE user_id = ? AND word = ?;
+        """, [(sentence, user_id, word) for user_id, word, _, sentences in entries for sentence in sentences])
+        cls._bump_versions(conn, [entry[0] for entry in entries])
+
+    @staticmethod
+    def _fetch_vocab(conn, user_id, after_word, limit, fields):
+        # BINARY collation orders words like the keyset comparison `word > ?`
+        rows = conn.execute("""
+            SELECT id, word, translation FROM user_vocabulary
+            WHERE user_id = ? AND (? IS NULL OR word > ?)
+            ORDER BY word
+            LIMIT ?;
+        """, (user_id, after_word, after_word, -1 if limit is None else limit)).fetchall()
+        sentences = {vocab_id: [] for vocab_id, _, _ in rows}
+        if "sentences" in fields:
+            ids = list(sentences)
+            for i in range(0, len(ids), SQL_VARIABLES):
+                chunk = ids[i:i + SQL_VARIABLES]
+                for vocab_id, sentence in conn.execute(f"""
+                    SELECT vocab_id, sentence FROM user_vocabulary_sentences
+                    WHERE vocab_id IN ({",".join("?" * len(chunk))})
+                    ORDER BY id;
+                """, chunk):
+                    sentences[vocab_id].append(sentence)
+        values = {}
+        result = []
+        for vocab_id, word, translation in rows:
+            values.update(word=word, translation=translation, sentences=sentences[vocab_id])
+            result.append({f: values[f] for f in ("word", "translation", "sentences") if f in fields})
+        return result
+
+    @classmethod
+    def _delete_words(cls, conn, user_id, words):
+        deleted = 0
+        words = list(words)
+        for i in range(0, len(words), SQL_VARIABLES):
+            chunk = words[i:i + SQL_VARIABLES]
+            deleted += conn.execute(f"""
+                DELETE FROM user_vocabulary
+                WHERE user_id = ? AND word IN ({",".join("?" * len(chunk))});
+            """, [user_id, *chunk]).rowcount
+        cls._bump_versions(conn, [user_id])
+        return deleted
+
+    @classmethod
+    def _delete_sentences(cls, conn, user_id, word, sentences):
+        # BEGIN IMMEDIATE holds the write lock, so this read-modify-write is atomic
+        row = conn.execute(
+            "SELECT id FROM user_vocabulary WHERE user_id = ? AND word = ?;", (user_id, word)
+        ).fetchone()
+        if row is None:
+            return False
+        vocab_id = row[0]
+        conn.executemany(
+            "DELETE FROM user_vocabulary_sentences WHERE vocab_id = ? AND sentence = ?;",
+            [(vocab_id, sentence) for sentence in sentences]
+        )
+        conn.execute("""
+            DELETE FROM user_vocabulary WHERE id = ? AND NOT EXISTS (
+                SELECT 1 FROM user_vocabulary_sentences WHERE vocab_id = ?
+            );
+        """, (vocab_id, vocab_id))
+        cls._bump_versions(conn, [user_id])
+        return True
+
+    @classmethod
+    def _update_translation(cls, conn, user_id, word, translation):
+        updated = conn.execute(
+            "UPDATE user_vocabulary SET translation = ? WHERE user_id = ? AND word = ?;",
+            (translation, user_id, word)
+        ).rowcount > 0
+        if updated:
+            cls._bump_versions(conn, [user_id])
+        return updated
+
+    @classmethod
+    def _sync(cls, conn, user_id, upserts, delete_sentences, delete_words):
+        if upserts:
+            cls._upsert(conn, upserts)
+        missing = [word for word, sentences in delete_sentences
+                   if not cls._delete_sentences(conn, user_id, word, sentences)]
+        deleted = cls._delete_words(conn, user_id, delete_words) if delete_words else 0
+        cls._bump_versions(conn, [user_id])
+        return {"upserted": len(upserts), "deleted_words": deleted, "missing_words": missing}
+
+    # ----------------------------
+    # Backend interface
+    # ----------------------------
+    async def create_schema(self):
+        await self._run(self._create_schema, write=True)
+
+    async def close(self):
+        while True:
+            try:
+                self._connections.get_nowait().close()
+            except queue.Empty:
+                break
+        self._opened = 0
+
+    async def ping(self):
+        await self._run(lambda conn: conn.execute("SELECT 1;").fetchone())
+
+    def metrics(self) -> Dict:
+        return {"backend": self.name, "path": self.path, "open": self._opened,
+                "idle": self._connections.qsize(), "max_size": self.pool_size}
+
+    async def get_version(self, user_id: str) -> int:
+        return await self._run(self._get_version, user_id)
+
+    async def count_words(self, user_id: str) -> int:
+        return await self._run(self._count_words, user_id)
+
+    async def upsert(self, entries: Sequence[VocabEntry]):
+        if entries:
+            await self._run(self._upsert, list(entries), write=True)
+
+    async def fetch_vocab(self, user_id, after_word=None, limit=None,
+                          fields=("word", "translation", "sentences")) -> List[Dict]:
+        return await self._run(self._fetch_vocab, user_id, after_word, limit, tuple(fields))
+
+    async def iter_vocab(self, user_id, fields=("word", "translation", "sentences")):
+        # Keyset batches keep memory flat without holding a read transaction open
+        after_word = None
+        while True:
+            rows = await self._run(self._fetch_vocab, user_id, after_word, EXPORT_BATCH, ("word", *fields))
+            for row in rows:
+                yield {f: row[f] for f in fields}
+            if len(rows) < EXPORT_BATCH:
+                return
+            after_word = rows[-1]["word"]
+
+    async def delete_words(self, user_id, words) -> int:
+        return await self._run(self._delete_words, user_id, list(words), write=True)
+
+    async def delete_sentences(self, user_id, word, sentences) -> bool:
+        return await self._run(self._delete_sentences, user_id, word, list(sentences), write=True)
+
+    async def update_translation(self, user_id, word, translation) -> bool:
+        return await self._run(self._update_translation, user_id, word, translation, write=True)
+
+    async def sync(self, user_id, upserts=(), delete_sentences=(), delete_words=()) -> Dict:
+        return await self._run(self._sync, user_id, list(upserts), list(delete_sentences),
+                               list(delete_words), write=True)
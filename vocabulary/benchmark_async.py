@@ -0,0 +1,163 @@
+"""
+Concurrency benchmark: blocking data access vs. the asyncpg pool.
+
+Simulates N concurrent users inside one event loop, the way uvicorn runs the
+`async def` endpoints of the vocabulary service. Each user issues a mix of
+vocabulary reads and upserts. Both variants run the queries of the Postgres
+storage backend, on the same schema (no vocabulary cache in front of it):
+the "blocking" variant waits for each call to finish without yielding to the
+event loop, as the previous synchronous driver did, the "async" variant
+awaits the backend. For every variant and concurrency level the script
+reports requests/s, p50/p99 latency and the longest event-loop stall.
+
+Usage (needs the Postgres server from VOCAB_PG_*):
+    python -m vocabulary.benchmark_async --users 1 50 200 500 --requests 20
+"""
+
+import argparse
+import asyncio
+import statistics
+import threading
+import time
+from contextlib import asynccontextmanager
+
+from vocabulary import db
+from vocabulary.backends.postgres import PG_CONN_PARAMS, PostgresBackend
+from vocabulary.vocabulary import VocabItem
+
+BENCH_USER = "benchmark_user"
+WRITE_EVERY = 10  # one upsert per ten requests
+
+
+# ----------------------------
+# Blocking data access
+# ----------------------------
+class _PrivatePoolBackend(PostgresBackend):
+    """The Postgres backend on a pool of its own instead of the shared one of `vocabulary.db`."""
+
+    def __init__(self, pool):
+        super().__init__()
+        self._pool = pool
+
+    @asynccontextmanager
+    async def connection(self):
+        async with self._pool.connection() as conn:
+            yield conn
+
+
+class BlockingVocabulary:
+    """The backend's queries as blocking calls: they run on an event loop in
+    a helper thread while the caller waits for them without yielding."""
+
+    def __init__(self, max_size):
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="blocking-db", daemon=True)
+        self._thread.start()
+        self.backend = _PrivatePoolBackend(self._call(db.ConnectionPool.create(PG_CONN_PARAMS, max_size=max_size)))
+
+    def _call(self, coroutine):
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop).result()
+
+    async def get_user_vocab(self, user_id):
+        return self._call(self.backend.fetch_vocab(user_id))
+
+    async def insert_or_update_vocab(self, item):
+        self._call(self.backend.upsert([(item.user_id, item.word, item.translation, item.sentences)]))
+
+    def close(self):
+        self._call(self.backend._pool.close())
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+
+
+class BackendVocabulary:
+    """Benchmark adapter around a storage backend."""
+
+    def __init__(self, backend):
+        self.backend = backend
+
+    async def get_user_vocab(self, user_id):
+        return await self.backend.fetch_vocab(user_id)
+
+    async def insert_or_update_vocab(self, item):
+        await self.backend.upsert([(item.user_id, item.word, item.translation, item.sentences)])
+
+    async def seed(self, words):
+        await self.backend.create_schema()
+        await self.backend.upsert([
+            (BENCH_USER, f"word{i}", "translation", [f"Example sentence {i}.{j}" for j in range(3)])
+            for i in range(words)
+        ])
+
+    async def cleanup(self, words):
+        await self.backend.delete_words(BENCH_USER, [f"word{i}" for i in range(max(words, 200))])
+
+
+# ----------------------------
+# Load generation
+# ----------------------------
+async def _watch_loop(stalls, interval=0.005):
+    """Record how late the event loop wakes up a sleeping task."""
+    while True:
+        expected = time.perf_counter() + interval
+        await asyncio.sleep(interval)
+        stalls.append(time.perf_counter() - expected)
+
+
+async def _user(backend, user_index, requests, latencies):
+    for i in range(requests):
+        started = time.perf_counter()
+        if i % WRITE_EVERY == WRITE_EVERY - 1:
+            await backend.insert_or_update_vocab(VocabItem(
+                user_id=BENCH_USER, word=f"word{user_index % 200}",
+                translation="translation", sentences=[f"Sentence from user {user_index}."],
+            ))
+        else:
+            await backend.get_user_vocab(BENCH_USER)
+        latencies.append(time.perf_counter() - started)
+        await asyncio.sleep(0)
+
+
+async def run_level(backend, users, requests):
+    latencies, stalls = [], []
+    watcher = asyncio.create_task(_watch_loop(stalls))
+    started = time.perf_counter()
+    await asyncio.gather(*(_user(backend, u, requests, latencies) for u in range(users)))
+    elapsed = time.perf_counter() - started
+    watcher.cancel()
+    latencies.sort()
+    return {
+        "rps": len(latencies) / elapsed,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p99_ms": latencies[int(0.99 * (len(latencies) - 1))] * 1000,
+        "max_stall_ms": max(stalls, default=0.0) * 1000,
+    }
+
+
+async def main(user_levels, requests, words, pool_size):
+    async_backend = BackendVocabulary(PostgresBackend(max_size=pool_size))
+    await async_backend.seed(words)
+
+    blocking = BlockingVocabulary(pool_size)
+    print(f"{'variant':<10}{'users':>7}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}{'max stall ms':>14}")
+    try:
+        for users in user_levels:
+            for name, backend in (("blocking", blocking), ("async", async_backend)):
+                result = await run_level(backend, users, requests)
+                print(f"{name:<10}{users:>7}{result['rps']:>10.1f}{result['p50_ms']:>10.2f}"
+                      f"{result['p99_ms']:>10.2f}{result['max_stall_ms']:>14.2f}")
+    finally:
+        blocking.close()
+        await async_backend.cleanup(words)
+        await async_backend.backend.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, nargs="+", default=[1, 50, 200, 500], help="concurrency levels")
+    parser.add_argument("--requests", type=int, default=20, help="requests per simulated user")
+    parser.add_argument("--words", type=int, default=200, help="vocabulary size of the benchmark user")
+    parser.add_argument("--pool-size", type=int, default=db.POOL_MAX_SIZE, help="connections per variant")
+    args = parser.parse_args()
+    asyncio.run(main(args.users, args.requests, args.words, args.pool_size))
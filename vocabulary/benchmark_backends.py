@@ -0,0 +1,49 @@
+"""
+Side-by-side benchmark of the vocabulary storage backends.
+
+Runs the workload of `vocabulary.benchmark_async` (N concurrent users, nine
+reads per upsert, one event loop) against each backend straight through the
+backend interface, without the vocabulary cache, and reports requests/s,
+p50/p99 latency and the longest event-loop stall.
+
+Usage (the postgres backend needs the server from VOCAB_PG_*):
+    python -m vocabulary.benchmark_backends --backends sqlite postgres --users 1 50 200
+"""
+
+import argparse
+import asyncio
+import os
+import tempfile
+
+from vocabulary.backends.postgres import PostgresBackend
+from vocabulary.backends.sqlite import SQLiteBackend
+from vocabulary.benchmark_async import BackendVocabulary, run_level
+
+
+async def main(backends, user_levels, requests, words, sqlite_path):
+    print(f"{'backend':<10}{'users':>7}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}{'max stall ms':>14}")
+    for name in backends:
+        # Generous checkout timeout: at high concurrency requests queue for the pool
+        backend = SQLiteBackend(sqlite_path) if name == "sqlite" else PostgresBackend(timeout=60)
+        bench = BackendVocabulary(backend)
+        await bench.seed(words)
+        try:
+            for users in user_levels:
+                result = await run_level(bench, users, requests)
+                print(f"{name:<10}{users:>7}{result['rps']:>10.1f}{result['p50_ms']:>10.2f}"
+                      f"{result['p99_ms']:>10.2f}{result['max_stall_ms']:>14.2f}")
+        finally:
+            await bench.cleanup(words)
+            await backend.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backends", nargs="+", default=["sqlite", "postgres"], choices=["sqlite", "postgres"])
+    parser.add_argument("--users", type=int, nargs="+", default=[1, 50, 200], help="concurrency levels")
+    parser.add_argument("--requests", type=int, default=20, help="requests per simulated user")
+    parser.add_argument("--words", type=int, default=200, help="vocabulary size of the benchmark user")
+    parser.add_argument("--sqlite-path", default=os.path.join(tempfile.gettempdir(), "vocabulary_benchmark.sqlite3"),
+                        help="database file of the sqlite backend")
+    args = parser.parse_args()
+    asyncio.run(main(args.backends, args.users, args.requests, args.words, args.sqlite_path))
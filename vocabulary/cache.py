@@ -0,0 +1,112 @@
+"""
+In-process read-through cache of user vocabularies.
+
+Every write to a user's vocabulary bumps that user's row in the
+`user_vocabulary_versions` table inside the same transaction. A cached
+vocabulary is only served while its version matches the current one, so a
+read costs one primary-key lookup instead of a full scan, and caches of
+several worker processes can never serve each other's stale data. The
+version is also what the GET endpoint uses as its ETag.
+"""
+
+import os
+import threading
+from collections import OrderedDict
+
+# Users whose vocabularies are kept in memory (least recently used are evicted)
+CACHE_MAX_USERS = int(os.environ.get("VOCAB_CACHE_MAX_USERS", 1024))
+# Larger vocabularies are always read from the database (only their known words are cached)
+CACHE_MAX_WORDS = int(os.environ.get("VOCAB_CACHE_MAX_WORDS", 50_000))
+
+
+class CachedVocabulary:
+    """One user's full vocabulary (ordered by word) at a given version.
+
+    `rows` is None when only the known words were read (e.g. for a
+    vocabulary too large to cache).
+    """
+
+    def __init__(self, version, rows=None, known_words=None):
+        self.version = version
+        self.rows = rows
+        self.positions = {row["word"]: i for i, row in enumerate(rows or ())}
+        self._known_words = known_words
+
+    @property
+    def known_words(self):
+        """Lower-cased words, as used by `filter_known_words` (None if not cached)."""
+        if self._known_words is None and self.rows is not None:
+            self._known_words = frozenset(row["word"].lower() for row in self.rows)
+        return self._known_words
+
+    def page(self, after_word=None, limit=None, fields=None):
+        """Slice the vocabulary like the keyset query does.
+
+        Returns None if the rows are not cached or `after_word` is not a word
+        of the vocabulary: its position then depends on the database collation.
+        """
+        if self.rows is None:
+            return None
+        start = 0
+        if after_word is not None:
+            if after_word not in self.positions:
+                return None
+            start = self.positions[after_word] + 1
+        rows = self.rows[start:start + limit if limit else None]
+        if fields is None:
+            return [dict(row) for row in rows]
+        return [{f: row[f] for f in fields} for row in rows]
+
+
+class VocabularyCache:
+    """Thread-safe LRU of `CachedVocabulary` keyed by user id."""
+
+    def __init__(self, max_users=CACHE_MAX_USERS, max_words=CACHE_MAX_WORDS):
+        self.max_users = max_users
+        self.max_words = max_words
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "invalidations": 0}
+
+    def get(self, user_id, version):
+        """Return the cached vocabulary if it is still at `version`, else None."""
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None or entry.version != version:
+                self._stats["misses"] += 1
+                return None
+            self._entries.move_to_end(user_id)
+            self._stats["hits"] += 1
+            return entry
+
+    def put(self, user_id, version, rows=None, known_words=None):
+        """Cache the full `rows` (or only the `known_words`) of `user_id` at `version`; returns the entry."""
+        if rows is not None and len(rows) > self.max_words:
+            rows = None
+        entry = CachedVocabulary(version, rows, known_words)
+        with self._lock:
+            current = self._entries.get(user_id)
+            # A slower reader must not replace a newer entry, nor known words the full rows
+            if current is None or current.version < version or (current.version == version and rows is not None):
+                self._entries[user_id] = entry
+                self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_users:
+                self._entries.popitem(last=False)
+        return entry
+
+    def invalidate(self, user_id):
+        with self._lock:
+            if self._entries.pop(user_id, None) is not None:
+                self._stats["invalidations"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def metrics(self):
+        """Return hit/miss/invalidation counters and the number of cached users."""
+        with self._lock:
+            return dict(self._stats, users=len(self._entries))
+
+
+vocab_cache = VocabularyCache()
@@ -0,0 +1,145 @@
+"""
+Pooled asynchronous PostgreSQL connections for the vocabulary service.
+
+The pool (asyncpg) is created once at startup (sized from the VOCAB_DB_POOL_*
+environment variables) and shared by all data-access coroutines, so a request
+only pays for its queries, and waiting on the database never blocks the event
+loop for other requests.
+"""
+
+import asyncio
+import os
+import time
+from contextlib import asynccontextmanager
+
+import asyncpg
+
+POOL_MIN_SIZE = int(os.environ.get("VOCAB_DB_POOL_MIN", 1))
+POOL_MAX_SIZE = int(os.environ.get("VOCAB_DB_POOL_MAX", 10))
+# Seconds to wait for a free connection before giving up
+POOL_TIMEOUT = float(os.environ.get("VOCAB_DB_POOL_TIMEOUT", 5))
+# Connections idle for longer than this are closed and reopened on demand
+HEALTH_CHECK_INTERVAL = float(os.environ.get("VOCAB_DB_HEALTH_CHECK_INTERVAL", 30))
+
+
+class PoolTimeout(Exception):
+    """Raised when no connection becomes free within the checkout timeout."""
+
+
+class ConnectionPool:
+    """asyncpg pool with bounded checkout waits, health checks and metrics."""
+
+    def __init__(self, pool, timeout=POOL_TIMEOUT):
+        self._pool = pool
+        self.timeout = timeout
+        self.loop = asyncio.get_running_loop()
+        self._stats = {
+            "checkouts": 0,
+            "timeouts": 0,
+            "discarded": 0,
+            "in_use": 0,
+            "wait_seconds_total": 0.0,
+            "wait_seconds_max": 0.0,
+        }
+
+    @classmethod
+    async def create(cls, conn_params, min_size=POOL_MIN_SIZE, max_size=POOL_MAX_SIZE,
+                     timeout=POOL_TIMEOUT, health_check_interval=HEALTH_CHECK_INTERVAL):
+        pool = await asyncpg.create_pool(
+            min_size=min_size,
+            max_size=max_size,
+            max_inactive_connection_lifetime=health_check_interval,
+            **conn_params,
+        )
+        return cls(pool, timeout=timeout)
+
+    async def _acquire(self):
+        try:
+            return await self._pool.acquire(timeout=self.timeout)
+        except asyncio.TimeoutError:
+            self._stats["timeouts"] += 1
+            raise PoolTimeout(f"No database connection available within {self.timeout}s") from None
+
+    @asynccontextmanager
+    async def connection(self):
+        """Check out a connection for one transaction.
+
+        Commits when the block succeeds and rolls back when it raises; broken
+        connections are dropped by the pool instead of being reused.
+
+        Raises:
+            PoolTimeout: If no connection is free within the pool timeout.
+        """
+        started = time.monotonic()
+        conn = await self._acquire()
+        # A connection may have died while idle (e.g. after a DB restart)
+        while conn.is_closed():
+            self._stats["discarded"] += 1
+            await self._pool.release(conn)
+            conn = await self._acquire()
+        waited = time.monotonic() - started
+        self._stats["checkouts"] += 1
+        self._stats["in_use"] += 1
+        self._stats["wait_seconds_total"] += waited
+        self._stats["wait_seconds_max"] = max(self._stats["wait_seconds_max"], waited)
+        try:
+            async with conn.transaction():
+                yield conn
+        finally:
+            self._stats["in_use"] -= 1
+            await self._pool.release(conn)
+
+    async def ping(self):
+        """Run a trivial query to check that the database is reachable."""
+        async with self.connection() as conn:
+            await conn.fetchval("SELECT 1;")
+
+    def metrics(self):
+        """Return pool size, usage and wait statistics."""
+        stats = dict(self._stats)
+        stats["max_size"] = self._pool.get_max_size()
+        stats["open"] = self._pool.get_size()
+        stats["idle"] = self._pool.get_idle_size()
+        return stats
+
+    async def close(self):
+        await self._pool.close()
+
+
+_pool = None
+_pool_lock = asyncio.Lock()
+
+
+async def init_pool(conn_params, **options):
+    """Create the shared pool (no-op if it already exists) and return it.
+
+    asyncpg pools are bound to the event loop they were created on; if the
+    loop has changed (e.g. between test clients), a new pool is created.
+    """
+    global _pool
+    async with _pool_lock:
+        if _pool is not None and _pool.loop is not asyncio.get_running_loop():
+            try:
+                _pool._pool.terminate()
+            except RuntimeError:  # the old loop is already closed
+                pass
+            _pool = None
+        if _pool is None:
+            _pool = await ConnectionPool.create(conn_params, **options)
+        return _pool
+
+
+def get_pool():
+    """Return the shared pool; `init_pool` must have been called."""
+    if _pool is None:
+        raise RuntimeError("Connection pool is not initialized")
+    return _pool
+
+
+async def close_pool():
+    """Close all connections of the shared pool."""
+    global _pool
+    async with _pool_lock:
+        if _pool is not None:
+            await _pool.close()
+            _pool = None
@@ -0,0 +1,12 @@
+import os
+import tempfile
+
+# Tests run on the embedded backend unless VOCAB_BACKEND says otherwise
+os.environ.setdefault("VOCAB_BACKEND", "sqlite")
+os.environ.setdefault("VOCAB_SQLITE_PATH", os.path.join(tempfile.mkdtemp(prefix="vocab-test-"), "vocabulary.sqlite3"))
+os.environ.setdefault("LEXICON_OVERLAY_DB", os.path.join(tempfile.mkdtemp(prefix="lexicon-test-"), "overlay.sqlite3"))
+
+# Other test packages may have imported the lexicon before the variable was set
+from words_context.lexicon import lexicon  # noqa: E402
+
+lexicon.overlay_path = os.environ["LEXICON_OVERLAY_DB"]
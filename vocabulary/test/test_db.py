@@ -0,0 +1,79 @@
+import asyncio
+
+import asyncpg
+import pytest
+
+from vocabulary import db
+from vocabulary.backends.postgres import PG_CONN_PARAMS
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+async def _reachable():
+    try:
+        conn = await asyncpg.connect(**PG_CONN_PARAMS, timeout=2)
+    except (OSError, asyncpg.PostgresError, asyncio.TimeoutError):
+        return False
+    await conn.close()
+    return True
+
+
+pytestmark = pytest.mark.skipif(not run(_reachable()), reason="needs the Postgres server from VOCAB_PG_*")
+
+
+def test_connection_commits_and_rolls_back():
+    async def scenario():
+        pool = await db.ConnectionPool.create(PG_CONN_PARAMS, min_size=1, max_size=2)
+        try:
+            async with pool.connection() as conn:
+                await conn.execute("DROP TABLE IF EXISTS pool_test_rows; CREATE TABLE pool_test_rows (n INT);")
+            with pytest.raises(RuntimeError):
+                async with pool.connection() as conn:
+                    await conn.execute("INSERT INTO pool_test_rows VALUES (1);")
+                    raise RuntimeError("rolled back")
+            async with pool.connection() as conn:
+                await conn.execute("INSERT INTO pool_test_rows VALUES (2);")
+            async with pool.connection() as conn:
+                rows = await conn.fetch("SELECT n FROM pool_test_rows;")
+                await conn.execute("DROP TABLE pool_test_rows;")
+            assert [r["n"] for r in rows] == [2]
+            assert pool.metrics()["checkouts"] == 4
+            assert pool.metrics()["in_use"] == 0
+        finally:
+            await pool.close()
+
+    run(scenario())
+
+
+def test_checkout_times_out_when_pool_is_exhausted():
+    async def scenario():
+        pool = await db.ConnectionPool.create(PG_CONN_PARAMS, min_size=1, max_size=1, timeout=0.2)
+        try:
+            async with pool.connection():
+                with pytest.raises(db.PoolTimeout):
+                    async with pool.connection():
+                        pass
+            assert pool.metrics()["timeouts"] == 1
+            await pool.ping()  # the held connection went back to the pool
+        finally:
+            await pool.close()
+
+    run(scenario())
+
+
+def test_shared_pool_is_recreated_on_a_new_event_loop():
+    async def first():
+        return await db.init_pool(PG_CONN_PARAMS, min_size=1, max_size=1)
+
+    async def second():
+        pool = await db.init_pool(PG_CONN_PARAMS, min_size=1, max_size=1)
+        await pool.ping()
+        await db.close_pool()
+        return pool
+
+    old = run(first())
+    assert run(second()) is not old
+    with pytest.raises(RuntimeError):
+        db.get_pool()
@@ -1,7 +1,12 @@
+import asyncio
+import json
+import sys
 import pytest
 import fastapi 
 from fastapi.testclient import TestClient
-from ..vocabulary import app 
+from .. import vocabulary as vocabulary_module
+from ..vocabulary import app, VOCAB_FIELDS
+from words_context.lexicon import lexicon
 
 client = TestClient(app)
 
@@ -56,6 +61,15 @@ def test_update_translation():
     data = response.json()
     assert "Translation updated" in data["message"]
 
+def test_update_translation_records_correction():
+    client.post("/vocabulary/", json={"user_id": "lex_user", "word": "haus", "translation": "home", "sentences": ["Das Haus."]})
+    response = client.put("/vocabulary/translation/", json={
+        "user_id": "lex_user", "word": "haus", "new_translation": "house", "src_lang": "de", "tgt_lang": "en"
+    })
+    assert response.status_code == 200
+    assert lexicon.lookup("Haus", "de", "en", user_id="lex_user") == "house"
+    assert lexicon.lookup("Haus", "de", "en", user_id="other_user") is None
+
 def test_batch_insert():
     response = client.post("/vocabulary/batch/", json=batch_items)
     assert response.status_code == 200
@@ -67,3 +81,172 @@ def test_batch_delete():
     assert response.status_code == 200
     data = response.json()
     assert "2 words deleted" in data["message"]
+
+def test_batch_insert_merges_repeated_words():
+    repeated = {"items": [
+        dict(batch_items["items"][1], sentences=["First example."]),
+        dict(batch_items["items"][1], translation="Нравственность", sentences=["Second example."]),
+    ]}
+    response = client.post("/vocabulary/batch/", json=repeated)
+    assert response.status_code == 200
+    vocab = client.get(f"/vocabulary/{vocab_item['user_id']}").json()["vocabulary"]
+    ethics = next(w for w in vocab if w["word"] == "Ethics")
+    assert ethics["translation"] == "Нравственность"
+    assert {"First example.", "Second example."} <= set(ethics["sentences"])
+
+page_items = {"items": [
+    {"user_id": "page_user", "word": word, "translation": word.upper(), "sentences": [f"{word} example."]}
+    for word in ["alpha", "beta", "gamma"]
+]}
+
+def test_get_vocab_keyset_pagination():
+    client.post("/vocabulary/batch/", json=page_items)
+    first = client.get("/vocabulary/page_user", params={"limit": 2, "fields": "word"}).json()
+    assert first["vocabulary"] == [{"word": "alpha"}, {"word": "beta"}]
+    assert first["next_after_word"] == "beta"
+
+    second = client.get("/vocabulary/page_user", params={"limit": 2, "after_word": "beta"}).json()
+    assert [w["word"] for w in second["vocabulary"]] == ["gamma"]
+    assert second["vocabulary"][0]["sentences"] == ["gamma example."]
+    assert second["next_after_word"] is None
+
+def test_paged_and_known_word_reads_are_bounded(monkeypatch):
+    client.post("/vocabulary/batch/", json=page_items)
+    vocabulary_module.vocab_cache.clear()
+    backend = asyncio.run(vocabulary_module.get_backend())
+    calls = []
+    fetch_vocab = backend.fetch_vocab
+
+    async def recording_fetch_vocab(user_id, after_word=None, limit=None, fields=VOCAB_FIELDS):
+        calls.append((limit, tuple(fields)))
+        return await fetch_vocab(user_id, after_word, limit, fields)
+
+    monkeypatch.setattr(backend, "fetch_vocab", recording_fetch_vocab)
+    client.get("/vocabulary/page_user", params={"limit": 2})
+    client.get("/vocabulary/page_user", params={"limit": 2, "after_word": "alpha"})
+    client.post("/vocabulary/page_user/filter-known/", json={"keywords": ["alpha"]})
+    client.post("/vocabulary/page_user/filter-known/", json={"keywords": ["alpha"]})  # cached
+    assert calls == [(2, VOCAB_FIELDS), (2, VOCAB_FIELDS), (None, ("word",))]
+
+    # A full read fills the cache unless the vocabulary is over the cap
+    monkeypatch.setattr(vocabulary_module.vocab_cache, "max_words", 2)
+    client.get("/vocabulary/page_user")
+    assert vocabulary_module.vocab_cache.get("page_user", asyncio.run(backend.get_version("page_user"))).rows is None
+    assert calls[-1] == (None, VOCAB_FIELDS) and len(calls) == 4
+
+def test_export_vocab():
+    client.post("/vocabulary/batch/", json=page_items)
+    response = client.get("/vocabulary/page_user/export", params={"fields": "word,translation"})
+    assert response.status_code == 200
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert rows == [{"word": w, "translation": w.upper()} for w in ["alpha", "beta", "gamma"]]
+
+    response = client.get("/vocabulary/page_user/export", params={"format": "csv"})
+    assert response.text.splitlines()[:2] == ["word,translation,sentences", "alpha,ALPHA,alpha example."]
+
+def test_export_reads_in_batches(monkeypatch):
+    client.post("/vocabulary/batch/", json=page_items)
+    backend = asyncio.run(vocabulary_module.get_backend())
+    monkeypatch.setattr(sys.modules[type(backend).__module__], "EXPORT_BATCH", 2)
+    response = client.get("/vocabulary/page_user/export", params={"fields": "word"})
+    assert [json.loads(line) for line in response.text.splitlines()] == [
+        {"word": "alpha"}, {"word": "beta"}, {"word": "gamma"}
+    ]
+
+def test_delete_sentences_removes_emptied_word():
+    item = {"user_id": "sentence_user", "word": "Haus", "translation": "house",
+            "sentences": ["Das Haus ist alt.", "Ein Haus am See.", "Das Haus ist alt."]}
+    client.post("/vocabulary/", json=item)
+    vocab = client.get("/vocabulary/sentence_user").json()["vocabulary"]
+    assert vocab[0]["sentences"] == ["Das Haus ist alt.", "Ein Haus am See."]
+
+    body = {"user_id": "sentence_user", "word": "Haus", "sentences": ["Das Haus ist alt."]}
+    assert client.request("DELETE", "/vocabulary/sentences/", json=body).status_code == 200
+    vocab = client.get("/vocabulary/sentence_user").json()["vocabulary"]
+    assert vocab[0]["sentences"] == ["Ein Haus am See."]
+
+    body["sentences"] = ["Ein Haus am See."]
+    assert client.request("DELETE", "/vocabulary/sentences/", json=body).status_code == 200
+    assert client.get("/vocabulary/sentence_user").json()["vocabulary"] == []
+    assert client.request("DELETE", "/vocabulary/sentences/", json=body).status_code == 404
+
+def test_get_vocab_etag():
+    client.post("/vocabulary/batch/", json=page_items)
+    first = client.get("/vocabulary/page_user")
+    etag = first.headers["ETag"]
+    assert client.get("/vocabulary/page_user", headers={"If-None-Match": etag}).status_code == 304
+    # Another page or field selection is another representation
+    assert client.get("/vocabulary/page_user", params={"limit": 1}, headers={"If-None-Match": etag}).status_code == 200
+
+    client.put("/vocabulary/translation/", json={"user_id": "page_user", "word": "beta", "new_translation": "Beta"})
+    second = client.get("/vocabulary/page_user", headers={"If-None-Match": etag})
+    assert second.status_code == 200
+    assert second.headers["ETag"] != etag
+    assert {"word": "beta", "translation": "Beta", "sentences": ["beta example."]} in second.json()["vocabulary"]
+
+def test_filter_known_words():
+    client.post("/vocabulary/batch/", json=page_items)
+    response = client.post("/vocabulary/page_user/filter-known/", json={"keywords": ["Alpha", "delta", "gamma"]})
+    assert response.json()["keywords"] == ["delta"]
+
+def test_sync_applies_staged_edits():
+    client.post("/vocabulary/batch/", json={"items": [
+        {"user_id": "sync_user", "word": word, "translation": word.upper(), "sentences": [f"{word} one.", f"{word} two."]}
+        for word in ["Baum", "Hund", "Katze"]
+    ]})
+    response = client.post("/vocabulary/sync_user/sync/", json={
+        "upsert": [
+            {"word": "Baum", "translation": "tree", "corrected": True},
+            {"word": "Maus", "translation": "mouse", "sentences": ["Die Maus."]},
+        ],
+        "delete_sentences": [{"word": "Hund", "sentences": ["Hund one."]}, {"word": "Vogel", "sentences": ["x"]}],
+        "delete_words": ["Katze"],
+        "src_lang": "de", "tgt_lang": "en",
+    })
+    assert response.status_code == 200
+    data = response.json()
+    assert (data["upserted"], data["deleted_words"], data["missing_words"]) == (2, 1, ["Vogel"])
+
+    vocab = client.get("/vocabulary/sync_user").json()["vocabulary"]
+    assert vocab == [
+        {"word": "Baum", "translation": "tree", "sentences": ["Baum one.", "Baum two."]},
+        {"word": "Hund", "translation": "HUND", "sentences": ["Hund two."]},
+        {"word": "Maus", "translation": "mouse", "sentences": ["Die Maus."]},
+    ]
+    assert lexicon.lookup("baum", "de", "en", user_id="sync_user") == "tree"
+    assert lexicon.lookup("maus", "de", "en", user_id="sync_user") is None
+
+def test_export_anki():
+    client.post("/vocabulary/", json={"user_id": "anki_user", "word": "Haus", "translation": "house <home>",
+                                      "sentences": ["Das Haus ist alt.", "Ein Haus\tam See."]})
+    response = client.get("/vocabulary/anki_user/export", params={"format": "anki"})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/tab-separated-values")
+    assert response.text.splitlines() == [
+        "#separator:tab", "#html:true", "#columns:Word\tTranslation\tSentences",
+        "Haus\thouse &lt;home&gt;\tDas Haus ist alt.<br>Ein Haus am See.",
+    ]
+
+def test_export_filename_is_sanitized():
+    response = client.get('/vocabulary/Jürgen "J"/export')
+    assert response.status_code == 200
+    assert response.headers["content-disposition"] == (
+        "attachment; filename=\"J_rgen__J__vocabulary.ndjson\"; "
+        "filename*=UTF-8''J%C3%BCrgen%20%22J%22_vocabulary.ndjson"
+    )
+
+def test_backend_interface_is_abstract():
+    from vocabulary.backends.base import VocabularyBackend
+
+    class Incomplete(VocabularyBackend):
+        async def create_schema(self):
+            pass
+
+    with pytest.raises(TypeError):
+        Incomplete()
+
+def test_postgres_backend_requires_a_password():
+    from vocabulary.backends.postgres import PG_CONN_PARAMS, PostgresBackend
+
+    with pytest.raises(RuntimeError, match="VOCAB_PG_PASSWORD"):
+        PostgresBackend(dict(PG_CONN_PARAMS, password=None))
@@ -1,9 +1,23 @@
-import psycopg2
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from typing import List
+from typing import List, Optional, Sequence
+import asyncio
+import csv
+import hashlib
+import html
+import io
+import json
+import re
+from urllib.parse import quote
+
+from vocabulary.backends.base import VocabularyBackend, create_backend
+from vocabulary.cache import vocab_cache
+from instrumentation.metrics import REGISTRY, instrument_app, stage_timer
+from words_context.lexicon import lexicon
 
 app = FastAPI(title="User Vocabulary API")
+instrument_app(app, "vocabulary")
 
 class VocabItem(BaseModel):
     user_id: str
@@ -24,6 +38,9 @@ class UpdateTranslationItem(BaseModel):
     user_id: str
     word: str
     new_translation: str
+    # When both are given, the correction also goes to the lexicon (as this user's)
+    src_lang: Optional[str] = None
+    tgt_lang: Optional[str] = None
 
 class BatchVocabItems(BaseModel):
     items: List[VocabItem]
@@ -32,141 +49,348 @@ class BatchDeleteWords(BaseModel):
     user_id: str
     words: List[str]    
 
-PG_CONN_PARAMS = {
-    "host": "localhost",
-    "port": 5432,
-    "user": "admin",
-    "password": "admin",
-    "database": "SmartVocabulary"
-}
+class KeywordsItem(BaseModel):
+    keywords: List[str]
+
+class SyncEntryItem(BaseModel):
+    word: str
+    translation: str
+    sentences: List[str] = []
+    # The user corrected the translation (recorded in the lexicon as theirs too)
+    corrected: bool = False
+
+class SyncSentencesItem(BaseModel):
+    word: str
+    sentences: List[str]
+
+class SyncItem(BaseModel):
+    """Edits staged by the vocabulary editor, applied in one transaction."""
+    upsert: List[SyncEntryItem] = []
+    delete_sentences: List[SyncSentencesItem] = []
+    delete_words: List[str] = []
+    src_lang: Optional[str] = None
+    tgt_lang: Optional[str] = None
+
+VOCAB_FIELDS = ("word", "translation", "sentences")
+MAX_PAGE_SIZE = 1000
+
+_backend = None
+_backend_lock = asyncio.Lock()
+
+async def get_backend() -> VocabularyBackend:
+    """Return the configured storage backend, creating its schema on first use."""
+    global _backend
+    if _backend is None:
+        async with _backend_lock:
+            if _backend is None:
+                backend = create_backend()
+                await backend.create_schema()
+                _backend = backend
+    return _backend
+
+REGISTRY.register_stats("vocab_storage", "Vocabulary storage (connection pool) statistics",
+                        lambda: _backend.metrics())
+REGISTRY.register_stats("vocab_cache", "Vocabulary cache statistics", vocab_cache.metrics)
+
+async def create_table_if_not_exists():
+    await (await get_backend()).create_schema()
+
+async def insert_or_update_vocab(item: VocabItem):
+    await insert_or_update_vocab_batch([item])
+
+def merge_entries(entries):
+    """Merge repeated (user_id, word) pairs of (user_id, word, translation, sentences) entries.
+
+    ON CONFLICT cannot touch the same row twice in one statement: the last
+    translation wins and the sentences are united.
+    """
+    merged = {}
+    for user_id, word, translation, new_sentences in entries:
+        key = (user_id, word)
+        if key in merged:
+            sentences = merged[key][1]
+            merged[key] = (translation, sentences + [s for s in new_sentences if s not in sentences])
+        else:
+            merged[key] = (translation, list(dict.fromkeys(new_sentences)))
+    return [(user_id, word, translation, sentences)
+            for (user_id, word), (translation, sentences) in merged.items()]
+
+async def insert_or_update_vocab_batch(items: List[VocabItem]):
+    """Upsert many words in one transaction and one multi-row statement."""
+    entries = merge_entries((item.user_id, item.word, item.translation, item.sentences) for item in items)
+    if not entries:
+        return
+    backend = await get_backend()
+    with stage_timer("db_upsert"):
+        await backend.upsert(entries)
+    for user_id in {entry[0] for entry in entries}:
+        vocab_cache.invalidate(user_id)
+
+def parse_fields(fields: Optional[str]) -> List[str]:
+    """Turn a comma-separated field list into selected columns ('word' is always included)."""
+    if not fields:
+        return list(VOCAB_FIELDS)
+    requested = {f.strip() for f in fields.split(",") if f.strip()}
+    unknown = requested - set(VOCAB_FIELDS)
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(sorted(unknown))}")
+    return [f for f in VOCAB_FIELDS if f == "word" or f in requested]
+
+async def get_vocab_version(user_id: str) -> int:
+    """Return the version of a user's vocabulary; it changes with every write."""
+    backend = await get_backend()
+    with stage_timer("db_version"):
+        return await backend.get_version(user_id)
+
+async def _cached_version(backend: VocabularyBackend, user_id: str):
+    """Return the user's current version and their cache entry at it (or None)."""
+    # Read the version before the rows: a write committed in between then
+    # leaves newer rows under an older version, refetched on the next read
+    with stage_timer("db_version"):
+        version = await backend.get_version(user_id)
+    return version, vocab_cache.get(user_id, version)
+
+async def get_user_vocab(
+    user_id: str,
+    after_word: Optional[str] = None,
+    limit: Optional[int] = None,
+    fields: Sequence[str] = VOCAB_FIELDS
+):
+    """Return a user's words in alphabetical order.
+
+    Keyset pagination: pass the last word of the previous page as `after_word`.
+    `limit=None` returns every remaining word; `fields` selects the columns.
+    Only full reads go through the cache: a page is read from the database
+    as is, so it never loads the whole vocabulary.
+    """
+    backend = await get_backend()
+    if after_word is not None or limit is not None:
+        with stage_timer("db_fetch"):
+            return await backend.fetch_vocab(user_id, after_word, limit, fields)
+    version, entry = await _cached_version(backend, user_id)
+    if entry is not None and entry.rows is not None:
+        return entry.page(fields=fields)
+    with stage_timer("db_fetch"):
+        if await backend.count_words(user_id) > vocab_cache.max_words:
+            return await backend.fetch_vocab(user_id, fields=fields)
+        rows = await backend.fetch_vocab(user_id)
+    vocab_cache.put(user_id, version, rows)
+    return [{f: row[f] for f in fields} for row in rows]
+
+async def get_known_words(user_id: str) -> frozenset:
+    """Return the lower-cased words a user already has (served from the cache when possible)."""
+    backend = await get_backend()
+    version, entry = await _cached_version(backend, user_id)
+    if entry is not None and entry.known_words is not None:
+        return entry.known_words
+    with stage_timer("db_fetch"):
+        rows = await backend.fetch_vocab(user_id, fields=("word",))
+    known_words = frozenset(row["word"].lower() for row in rows)
+    vocab_cache.put(user_id, version, known_words=known_words)
+    return known_words
+
+async def iter_user_vocab(user_id: str, fields: Sequence[str] = VOCAB_FIELDS):
+    """Yield all of a user's words in constant memory."""
+    backend = await get_backend()
+    async for row in backend.iter_vocab(user_id, fields):
+        yield row
+
+async def delete_word(user_id: str, word: str):
+    await delete_words(user_id, [word])
+
+async def delete_words(user_id: str, words: List[str]):
+    """Delete many words of a user with a single statement; returns the number deleted."""
+    backend = await get_backend()
+    with stage_timer("db_delete_words"):
+        deleted = await backend.delete_words(user_id, words)
+    vocab_cache.invalidate(user_id)
+    return deleted
 
-def create_table_if_not_exists():
-    conn = psycopg2.connect(**PG_CONN_PARAMS)
-    cur = conn.cursor()
-    cur.execute("""
-        CREATE TABLE IF NOT EXISTS user_vocabulary (
-            id SERIAL PRIMARY KEY,
-            user_id TEXT NOT NULL,
-            word TEXT NOT NULL,
-            translation TEXT NOT NULL,
-            sentences TEXT[] NOT NULL,
-            created_at TIMESTAMP DEFAULT NOW(),
-            UNIQUE(user_id, word)
-        );
-    """)
-    conn.commit()
-    cur.close()
-    conn.close()
-
-def insert_or_update_vocab(item: VocabItem):
-    conn = psycopg2.connect(**PG_CONN_PARAMS)
-    cur = conn.cursor()
-    cur.execute("""
-        INSERT INTO user_vocabulary (user_id, word, translation, sentences)
-        VALUES (%s, %s, %s, %s)
-        ON CONFLICT (user_id, word) DO UPDATE
-        SET translation = EXCLUDED.translation,
-            sentences = array(SELECT DISTINCT unnest(user_vocabulary.sentences || EXCLUDED.sentences));
-    """, (item.user_id, item.word, item.translation, item.sentences))
-    conn.commit()
-    cur.close()
-    conn.close()
-
-def get_user_vocab(user_id: str):
-    conn = psycopg2.connect(**PG_CONN_PARAMS)
-    cur = conn.cursor()
-    cur.execute("""
-        SELECT word, translation, sentences 
-        FROM user_vocabulary 
-        WHERE user_id = %s
-        ORDER BY word;
-    """, (user_id,))
-    rows = cur.fetchall()
-    cur.close()
-    conn.close()
-    return [{"word": r[0], "translation": r[1], "sentences": r[2]} for r in rows]
-
-def delete_word(user_id: str, word: str):
-    conn = psycopg2.connect(**PG_CONN_PARAMS)
-    cur = conn.cursor()
-    cur.execute("""
-        DELETE FROM user_vocabulary
-        WHERE user_id = %s AND word = %s;
-    """, (user_id, word))
-    conn.commit()
-    cur.close()
-    conn.close()
-
-def delete_sentences(user_id: str, word: str, sentences_to_delete: List[str]):
-    conn = psycopg2.connect(**PG_CONN_PARAMS)
-    cur = conn.cursor()
-    cur.execute("""
-        SELECT sentences FROM user_vocabulary
-        WHERE user_id = %s AND word = %s;
-    """, (user_id, word))
-    row = cur.fetchone()
-    if not row:
-        cur.close()
-        conn.close()
+async def delete_sentences(user_id: str, word: str, sentences_to_delete: List[str]):
+    """Delete sentences of a word atomically; the word goes too once it has none left."""
+    backend = await get_backend()
+    with stage_timer("db_delete_sentences"):
+        found = await backend.delete_sentences(user_id, word, sentences_to_delete)
+    if not found:
         raise ValueError("Word not found")
-    existing_sentences = row[0]
-    updated_sentences = [s for s in existing_sentences if s not in sentences_to_delete]
-    if updated_sentences:
-        cur.execute("""
-            UPDATE user_vocabulary
-            SET sentences = %s
-            WHERE user_id = %s AND word = %s;
-        """, (updated_sentences, user_id, word))
-    else:
-        # Delete word if no sentences remain
-        cur.execute("""
-            DELETE FROM user_vocabulary
-            WHERE user_id = %s AND word = %s;
-        """, (user_id, word))
-    conn.commit()
-    cur.close()
-    conn.close()
-
-def update_translation(user_id: str, word: str, new_translation: str):
-    conn = psycopg2.connect(**PG_CONN_PARAMS)
-    cur = conn.cursor()
-    cur.execute("""
-        UPDATE user_vocabulary
-        SET translation = %s
-        WHERE user_id = %s AND word = %s;
-    """, (new_translation, user_id, word))
-    if cur.rowcount == 0:
-        cur.close()
-        conn.close()
+    vocab_cache.invalidate(user_id)
+
+async def update_translation(user_id: str, word: str, new_translation: str,
+                             src_lang: Optional[str] = None, tgt_lang: Optional[str] = None):
+    """Correct the translation of a word; with both languages given, record it in the lexicon too."""
+    backend = await get_backend()
+    with stage_timer("db_update_translation"):
+        updated = await backend.update_translation(user_id, word, new_translation)
+    if not updated:
         raise ValueError("Word not found")
-    conn.commit()
-    cur.close()
-    conn.close()
+    vocab_cache.invalidate(user_id)
+    if src_lang and tgt_lang:
+        await asyncio.to_thread(lexicon.learn, word, src_lang, tgt_lang, new_translation, user_id)
+
+async def sync_vocab(user_id: str, item: SyncItem):
+    """Apply the editor's staged upserts and deletions in one transaction; returns the counts.
+
+    Corrected translations go to the lexicon as well when both languages are given.
+    """
+    entries = merge_entries((user_id, e.word, e.translation, e.sentences) for e in item.upsert)
+    backend = await get_backend()
+    with stage_timer("db_sync"):
+        result = await backend.sync(
+            user_id,
+            entries,
+            [(d.word, d.sentences) for d in item.delete_sentences],
+            list(dict.fromkeys(item.delete_words)),
+        )
+    vocab_cache.invalidate(user_id)
+    if item.src_lang and item.tgt_lang:
+        for e in item.upsert:
+            if e.corrected:
+                await asyncio.to_thread(lexicon.learn, e.word, item.src_lang, item.tgt_lang, e.translation,
+                                        user_id)
+    return result
 
 @app.on_event("startup")
-def startup_event():
-    create_table_if_not_exists()
+async def startup_event():
+    await get_backend()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    global _backend
+    if _backend is not None:
+        await _backend.close()
+        _backend = None
+
+@app.get("/health")
+async def health_endpoint():
+    try:
+        backend = await get_backend()
+        await backend.ping()
+        return {"status": "ok", "storage": backend.metrics(), "cache": vocab_cache.metrics()}
+    except Exception as e:
+        raise HTTPException(status_code=503, detail=str(e))
 
 @app.post("/vocabulary/")
 async def add_or_update_vocab_endpoint(item: VocabItem):
     try:
-        insert_or_update_vocab(item)
+        await insert_or_update_vocab(item)
         return {"status": "success", "message": f"Word '{item.word}' saved/updated for user {item.user_id}"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+def _vocab_etag(version: int, *query) -> str:
+    # Each page/field selection is its own representation of the same version
+    digest = hashlib.md5(json.dumps(query).encode("utf-8")).hexdigest()[:16]
+    return f'W/"{version}-{digest}"'
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in tags or etag in tags or etag[2:] in tags
+
 @app.get("/vocabulary/{user_id}")
-async def get_user_vocab_endpoint(user_id: str):
+async def get_user_vocab_endpoint(
+    request: Request,
+    response: Response,
+    user_id: str,
+    after_word: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    fields: Optional[str] = None
+):
+    try:
+        selected = parse_fields(fields)
+        etag = _vocab_etag(await get_vocab_version(user_id), user_id, after_word, limit, selected)
+        if _etag_matches(request.headers.get("if-none-match"), etag):
+            return Response(status_code=304, headers={"ETag": etag})
+        vocab_list = await get_user_vocab(user_id, after_word, limit, selected)
+        next_after_word = vocab_list[-1]["word"] if limit and len(vocab_list) == limit else None
+        response.headers["ETag"] = etag
+        return {"user_id": user_id, "vocabulary": vocab_list, "next_after_word": next_after_word}
+    except ValueError as ve:
+        raise HTTPException(status_code=400, detail=str(ve))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/vocabulary/{user_id}/filter-known/")
+async def filter_known_words_endpoint(user_id: str, item: KeywordsItem):
+    """Return the keywords the user does not have in their vocabulary yet."""
+    try:
+        known = await get_known_words(user_id)
+        return {"user_id": user_id, "keywords": [kw for kw in item.keywords if kw.lower() not in known]}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+async def _export_ndjson(user_id: str, fields: Sequence[str]):
+    async for row in iter_user_vocab(user_id, fields):
+        yield json.dumps(row, ensure_ascii=False) + "\n"
+
+async def _export_csv(user_id: str, fields: Sequence[str]):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(fields)
+    async for row in iter_user_vocab(user_id, fields):
+        if "sentences" in row:
+            row["sentences"] = "\n".join(row["sentences"])
+        writer.writerow(row.values())
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue()
+
+async def _export_anki(user_id: str, fields: Sequence[str]):
+    # Anki's text import: tab-separated fields, HTML allowed (sentences become
+    # lines of one field), and header lines that preset the import dialog
+    columns = "\t".join(f.capitalize() for f in fields)
+    yield f"#separator:tab\n#html:true\n#columns:{columns}\n"
+    async for row in iter_user_vocab(user_id, fields):
+        values = []
+        for f in fields:
+            value = row[f]
+            if f == "sentences":
+                value = "<br>".join(html.escape(s) for s in value)
+            else:
+                value = html.escape(value)
+            values.append(" ".join(value.split()))  # no tabs or newlines inside a field
+        yield "\t".join(values) + "\n"
+
+EXPORT_FORMATS = {
+    "ndjson": (_export_ndjson, "application/x-ndjson", "ndjson"),
+    "csv": (_export_csv, "text/csv", "csv"),
+    "anki": (_export_anki, "text/tab-separated-values", "txt"),
+}
+
+def _attachment(filename: str) -> str:
+    # ASCII fallback for old clients, the exact name (RFC 6266) for the others
+    fallback = re.sub(r"[^A-Za-z0-9._-]", "_", filename)
+    return f"attachment; filename=\"{fallback}\"; filename*=UTF-8''{quote(filename, safe='')}"
+
+@app.get("/vocabulary/{user_id}/export")
+async def export_user_vocab_endpoint(user_id: str, format: str = "ndjson", fields: Optional[str] = None):
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unsupported format: {format}")
+    try:
+        selected = parse_fields(fields)
+    except ValueError as ve:
+        raise HTTPException(status_code=400, detail=str(ve))
+    export, media_type, extension = EXPORT_FORMATS[format]
+    return StreamingResponse(
+        export(user_id, selected),
+        media_type=media_type,
+        headers={"Content-Disposition": _attachment(f"{user_id}_vocabulary.{extension}")}
+    )
+
+@app.post("/vocabulary/{user_id}/sync/")
+async def sync_vocab_endpoint(user_id: str, item: SyncItem):
     try:
-        vocab_list = get_user_vocab(user_id)
-        return {"user_id": user_id, "vocabulary": vocab_list}
+        result = await sync_vocab(user_id, item)
+        return {"status": "success", "user_id": user_id, **result}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.delete("/vocabulary/word/")
 async def delete_word_endpoint(item: DeleteWordItem):
     try:
-        delete_word(item.user_id, item.word)
+        await delete_word(item.user_id, item.word)
         return {"status": "success", "message": f"Word '{item.word}' deleted for user {item.user_id}"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -174,7 +398,7 @@ async def delete_word_endpoint(item: DeleteWordItem):
 @app.delete("/vocabulary/sentences/")
 async def delete_sentences_endpoint(item: DeleteSentencesItem):
     try:
-        delete_sentences(item.user_id, item.word, item.sentences)
+        await delete_sentences(item.user_id, item.word, item.sentences)
         return {"status": "success", "message": f"Specified sentences deleted for word '{item.word}' of user {item.user_id}"}
     except ValueError as ve:
         raise HTTPException(status_code=404, detail=str(ve))
@@ -184,7 +408,7 @@ async def delete_sentences_endpoint(item: DeleteSentencesItem):
 @app.put("/vocabulary/translation/")
 async def update_translation_endpoint(item: UpdateTranslationItem):
     try:
-        update_translation(item.user_id, item.word, item.new_translation)
+        await update_translation(item.user_id, item.word, item.new_translation, item.src_lang, item.tgt_lang)
         return {"status": "success", "message": f"Translation updated for word '{item.word}' of user {item.user_id}"}
     except ValueError as ve:
         raise HTTPException(status_code=404, detail=str(ve))
@@ -196,8 +420,7 @@ async def update_translation_endpoint(item: UpdateTranslationItem):
 @app.post("/vocabulary/batch/")
 async def add_or_update_vocab_batch(batch: BatchVocabItems):
     try:
-        for item in batch.items:
-            insert_or_update_vocab(item)
+        await insert_or_update_vocab_batch(batch.items)
         return {"status": "success", "message": f"{len(batch.items)} words saved/updated successfully."}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -206,8 +429,7 @@ async def add_or_update_vocab_batch(batch: BatchVocabItems):
 @app.delete("/vocabulary/words/batch/")
 async def delete_words_batch(batch: BatchDeleteWords):
     try:
-        for word in batch.words:
-            delete_word(batch.user_id, word)
+        await delete_words(batch.user_id, batch.words)
         return {"status": "success", "message": f"{len(batch.words)} words deleted successfully for user {batch.user_id}"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
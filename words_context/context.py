@@ -1,14 +1,17 @@
-import re
-from typing import List, Optional, Dict
+from typing import List, Optional, Dict, Iterator, Tuple
 import langid
 import torch
 from transformers import MBartForConditionalGeneration, MBart50TokenizerFast
+from instrumentation.metrics import record_generate, stage_timer
+from words_context.lexicon import lexicon
+from words_context.sentences import find_keyword_sentences, split_sentences
 
-# Load model and tokenizer once (efficiently)
+# Model and tokenizer are loaded once, on first use, so that importing this
+# module (e.g. in worker processes that only match sentences) stays cheap
 model_name = "facebook/mbart-large-50-many-to-many-mmt"
-tokenizer = MBart50TokenizerFast.from_pretrained(model_name)
 device = "cuda" if torch.cuda.is_available() else "cpu"
-model = MBartForConditionalGeneration.from_pretrained(model_name).to(device)
+tokenizer = None
+model = None
 
 LANGUAGE_CODES = {
     "en": "en_XX", "de": "de_DE", "es": "es_XX", "fr": "fr_XX",
@@ -16,64 +19,118 @@ LANGUAGE_CODES = {
     "pt": "pt_XX", "hi": "hi_IN", "ja": "ja_XX", "ko": "ko_KR"
 }
 
+def load_model():
+    """
+    Load the MBart tokenizer and model (once) and return them.
+    """
+    global tokenizer, model
+    if model is None:
+        with stage_timer("model_load"):
+            tokenizer = MBart50TokenizerFast.from_pretrained(model_name)
+            model = MBartForConditionalGeneration.from_pretrained(model_name).to(device)
+    return tokenizer, model
+
+def encode_for_mbart(tokenizer, texts: List[str], src_lang: str, max_length: int = 512):
+    """
+    Tokenize `texts` as `src_lang` (an mBART code) into padded generate() inputs.
+    The language goes into each call instead of `tokenizer.src_lang`, which
+    would be changed under the feet of concurrent requests.
+    """
+    encoded = tokenizer(texts, add_special_tokens=False, truncation=True, max_length=max_length - 2)
+    lang_id = tokenizer.lang_code_to_id[src_lang]
+    return tokenizer.pad(
+        [{"input_ids": [lang_id] + ids + [tokenizer.eos_token_id]} for ids in encoded["input_ids"]],
+        return_tensors="pt"
+    )
+
 def translate_with_mbart(text: str, src_lang: str, tgt_lang: str, max_length: int = 512) -> str:
     """
     Translate a single text string using MBart.
     """
-    tokenizer.src_lang = src_lang
-    inputs = tokenizer(text, return_tensors="pt", truncation=True, max_length=max_length).to(device)
-    translated_ids = model.generate(
-        **inputs,
-        forced_bos_token_id=tokenizer.lang_code_to_id[tgt_lang],
-        max_new_tokens=150,
-        num_beams=4
-    )
-    return tokenizer.decode(translated_ids[0], skip_special_tokens=True)
+    return translate_batch_with_mbart([text], src_lang, tgt_lang, max_length=max_length)[0]
 
-def extract_keyword_sentences(
+def translate_batch_with_mbart(
+        texts: List[str],
+        src_lang: str,
+        tgt_lang: str,
+        max_length: int = 512,
+        batch_size: int = 16
+    ) -> List[str]:
+    """
+    Translate several text strings using MBart, `batch_size` at a time.
+    Returns the translations in input order.
+    """
+    tokenizer, model = load_model()
+    translations = []
+    for i in range(0, len(texts), batch_size):
+        batch = texts[i:i + batch_size]
+        with stage_timer("translate"):
+            inputs = encode_for_mbart(tokenizer, batch, src_lang, max_length).to(device)
+            translated_ids = model.generate(
+                **inputs,
+                forced_bos_token_id=tokenizer.lang_code_to_id[tgt_lang],
+                max_new_tokens=150,
+                num_beams=4
+            )
+            translations.extend(tokenizer.batch_decode(translated_ids, skip_special_tokens=True))
+        record_generate(model_name, "translate", len(batch),
+                        int(inputs["attention_mask"].sum()),
+                        int((translated_ids != tokenizer.pad_token_id).sum()))
+    return translations
+
+def translate_keyword(keyword: str, src_lang: str, tgt_lang: str) -> str:
+    """
+    Translate a single keyword (ISO 639-1 codes): from the lexicon if it knows it,
+    otherwise with MBart, remembering the result in the lexicon.
+    """
+    with stage_timer("lexicon"):
+        translation = lexicon.lookup(keyword, src_lang, tgt_lang)
+    if translation is None:
+        translation = translate_with_mbart(
+            keyword, LANGUAGE_CODES.get(src_lang, "en_XX"), LANGUAGE_CODES.get(tgt_lang, "en_XX")
+        )
+        lexicon.learn(keyword, src_lang, tgt_lang, translation)
+    return translation
+
+def iter_keyword_sentences(
         text: str,
         keywords: List[str],
         translate_to: Optional[str] = None
-    ) -> Dict[str, Dict]:
+    ) -> Iterator[Tuple[str, Dict]]:
     """
-    Extract sentences containing keywords from text, optionally translating them.
-    Returns a dict keyed by keyword with original and translated sentences.
+    Yield (keyword, {"translation", "context"}) pairs one keyword at a time,
+    translating each keyword and its sentences just before it is yielded.
+    Keywords are looked up in the lexicon first; mBART only translates misses.
     """
-    results: Dict[str, Dict] = {}
-
     # Detect source language
-    detected_lang, _ = langid.classify(text)
+    with stage_timer("langid"):
+        detected_lang, _ = langid.classify(text)
     src_lang_code = LANGUAGE_CODES.get(detected_lang, "en_XX")
     tgt_lang_code = LANGUAGE_CODES.get(translate_to.lower(), "en_XX") if translate_to else None
 
-    # Split text into sentences (simple regex)
-    sentences = re.split(r'(?<=[.!?])\s+', text.strip())
+    for keyword, sentences in find_keyword_sentences(text, keywords).items():
+        matches = [{"sentence": sent} for sent in sentences]
+        keyword_translation = None
 
-    for keyword in keywords:
-        keyword_lower = keyword.lower()
-        matches = []
-
-        # Translate the keyword itself if needed
-        keyword_translation = (
-            translate_with_mbart(keyword, src_lang_code, tgt_lang_code)
-            if translate_to else None
-        )
+        # Translate the keyword and its sentences if needed
+        if translate_to:
+            keyword_translation = translate_keyword(keyword, detected_lang, translate_to.lower())
+            translations = translate_batch_with_mbart(sentences, src_lang_code, tgt_lang_code)
+            for match, translation in zip(matches, translations):
+                match["translation"] = translation
 
-        for sent in sentences:
-            if keyword_lower in sent.lower():
-                match = {"sentence": sent.strip()}
+        yield keyword, {
+            "translation": keyword_translation,
+            "context": matches
+        }
 
-                # Translate sentence if requested
-                if translate_to:
-                    translation = translate_with_mbart(sent, src_lang_code, tgt_lang_code)
-                    match["translation"] = translation
-
-                matches.append(match)
-
-        if matches:
-            results[keyword] = {
-                "translation": keyword_translation,
-                "context": matches
-            }
-
-    return results
+def extract_keyword_sentences(
+        text: str,
+        keywords: List[str],
+        translate_to: Optional[str] = None
+    ) -> Dict[str, Dict]:
+    """
+    Extract sentences containing keywords from text, optionally translating them.
+    Returns a dict keyed by keyword with original and translated sentences.
+    """
+    return dict(iter_keyword_sentences(text, keywords, translate_to))
@@ -0,0 +1,352 @@
+"""
+Bilingual lexicon for keyword translation.
+
+Single keywords (lemmas) are translated from a lexicon keyed by
+(src_lang, tgt_lang, lemma) before falling back to mBART, which is slow and
+often poor for isolated words. The lexicon has two tiers:
+
+- a compiled index (LEXICON_PATH), built from a dictionary TSV with
+  `python -m words_context.lexicon build dictionary.tsv data/lexicon.idx`:
+  an open-addressing hash table in a flat file that is memory-mapped, so a
+  lookup is a few reads from the page cache and every process shares it;
+- a learned overlay (LEXICON_OVERLAY_DB, SQLite) with the translations the
+  model produced on misses and, per user, the corrections users made through
+  `update_translation`.
+
+A lookup for a user prefers that user's own correction, then the compiled
+dictionary, then a correction at least LEXICON_QUORUM users agree on, then
+earlier model translations: one user's correction never overrides the
+dictionary for anybody else. Languages are ISO 639-1 codes ("de", "en").
+"""
+
+import hashlib
+import mmap
+import os
+import sqlite3
+import struct
+import sys
+import threading
+import time
+import unicodedata
+from typing import Iterable, Optional, Tuple
+
+LEXICON_PATH = os.environ.get("LEXICON_PATH", os.path.join("data", "lexicon.idx"))
+LEXICON_OVERLAY_DB = os.environ.get("LEXICON_OVERLAY_DB", os.path.join("data", "lexicon_overlay.sqlite3"))
+# Users who must agree on a correction before other users are given it
+LEXICON_QUORUM = int(os.environ.get("LEXICON_QUORUM", 2))
+
+# File layout: header, slot table (hash, record offset), records
+# (uint16 key length, key, uint16 value length, value); offset 0 marks an empty slot
+MAGIC = b"LEX1"
+HEADER = struct.Struct("<4sIQ")  # magic, number of slots (a power of two), number of entries
+SLOT = struct.Struct("<QQ")
+LENGTH = struct.Struct("<H")
+LOAD_FACTOR = 0.5
+
+
+def normalize_lemma(lemma: str) -> str:
+    return unicodedata.normalize("NFC", lemma).strip().lower()
+
+
+def _key(lemma: str, src_lang: str, tgt_lang: str) -> bytes:
+    return f"{src_lang.lower()}\t{tgt_lang.lower()}\t{normalize_lemma(lemma)}".encode("utf-8")
+
+
+def _hash(key: bytes) -> int:
+    return int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), "little")
+
+
+# ----------------------------
+# Compiled index
+# ----------------------------
+def build_index(entries: Iterable[Tuple[str, str, str, str]], path: str) -> int:
+    """Write (src_lang, tgt_lang, lemma, translation) entries to an index file at `path`.
+
+    The first translation of a repeated key wins. Returns the number of entries.
+    """
+    records = {}
+    for src_lang, tgt_lang, lemma, translation in entries:
+        key = _key(lemma, src_lang, tgt_lang)
+        if translation and key not in records:
+            records[key] = translation.encode("utf-8")
+
+    n_slots = 1
+    while n_slots * LOAD_FACTOR < max(len(records), 1):
+        n_slots *= 2
+    slots = [(0, 0)] * n_slots
+    data = bytearray()
+    data_start = HEADER.size + n_slots * SLOT.size
+    for key, value in records.items():
+        if len(key) > 0xFFFF or len(value) > 0xFFFF:
+            continue
+        h = _hash(key)
+        i = h & (n_slots - 1)
+        while slots[i][1]:
+            i = (i + 1) & (n_slots - 1)
+        slots[i] = (h, data_start + len(data))
+        data += LENGTH.pack(len(key)) + key + LENGTH.pack(len(value)) + value
+
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(HEADER.pack(MAGIC, n_slots, len(records)))
+        f.write(b"".join(SLOT.pack(h, offset) for h, offset in slots))
+        f.write(data)
+    os.replace(tmp, path)  # processes that mapped the old file keep reading it
+    return len(records)
+
+
+def read_tsv(path: str):
+    """Yield (src_lang, tgt_lang, lemma, translation) from a TSV dictionary ('#' starts a comment)."""
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip() or line.startswith("#"):
+                continue
+            fields = line.rstrip("\n").split("\t")
+            if len(fields) >= 4:
+                yield fields[0], fields[1], fields[2], fields[3]
+
+
+class CompiledLexicon:
+    """Read-only, memory-mapped view of an index written by `build_index`."""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.n_slots, self.n_entries = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a lexicon index")
+
+    def get(self, key: bytes) -> Optional[str]:
+        mm = self._mm
+        h = _hash(key)
+        mask = self.n_slots - 1
+        i = h & mask
+        while True:
+            slot_hash, offset = SLOT.unpack_from(mm, HEADER.size + i * SLOT.size)
+            if not offset:
+                return None
+            if slot_hash == h:
+                (key_len,) = LENGTH.unpack_from(mm, offset)
+                start = offset + LENGTH.size
+                if mm[start:start + key_len] == key:
+                    (value_len,) = LENGTH.unpack_from(mm, start + key_len)
+                    value_start = start + key_len + LENGTH.size
+                    return mm[value_start:value_start + value_len].decode("utf-8")
+            i = (i + 1) & mask
+
+    def close(self):
+        self._mm.close()
+
+
+# ----------------------------
+# Learned overlay
+# ----------------------------
+class LexiconOverlay:
+    """Model translations and per-user corrections in an SQLite file (one connection per thread)."""
+
+    def __init__(self, path: str = LEXICON_OVERLAY_DB):
+        self.path = path
+        self._local = threading.local()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self._connection() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS lexicon_overlay (
+                    key TEXT PRIMARY KEY,
+                    translation TEXT NOT NULL,
+                    source TEXT NOT NULL,
+                    updated_at REAL NOT NULL
+                );
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS lexicon_corrections (
+                    key TEXT NOT NULL,
+                    user_id TEXT NOT NULL,
+                    translation TEXT NOT NULL,
+                    updated_at REAL NOT NULL,
+                    PRIMARY KEY (key, user_id)
+                );
+            """)
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode = WAL;")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: bytes) -> Optional[str]:
+        """Return the model translation for `key`, or None."""
+        row = self._connection().execute(
+            "SELECT translation FROM lexicon_overlay WHERE key = ?;", (key.decode("utf-8"),)
+        ).fetchone()
+        return row[0] if row else None
+
+    def put(self, key: bytes, translation: str):
+        with self._connection() as conn:
+            conn.execute("""
+                INSERT INTO lexicon_overlay (key, translation, source, updated_at) VALUES (?, ?, 'model', ?)
+                ON CONFLICT (key) DO UPDATE SET translation = excluded.translation, updated_at = excluded.updated_at;
+            """, (key.decode("utf-8"), translation, time.time()))
+
+    def get_correction(self, key: bytes, user_id: str) -> Optional[str]:
+        """Return the user's own correction for `key`, or None."""
+        row = self._connection().execute(
+            "SELECT translation FROM lexicon_corrections WHERE key = ? AND user_id = ?;",
+            (key.decode("utf-8"), user_id)
+        ).fetchone()
+        return row[0] if row else None
+
+    def agreed_correction(self, key: bytes, quorum: int, exclude_user: Optional[str] = None) -> Optional[str]:
+        """Return the correction for `key` that most (and at least `quorum`) other users made, or None."""
+        row = self._connection().execute("""
+            SELECT translation FROM lexicon_corrections
+            WHERE key = ? AND user_id IS NOT ?
+            GROUP BY translation HAVING count(*) >= ?
+            ORDER BY count(*) DESC, max(updated_at) DESC LIMIT 1;
+        """, (key.decode("utf-8"), exclude_user, quorum)).fetchone()
+        return row[0] if row else None
+
+    def put_correction(self, key: bytes, user_id: str, translation: str):
+        with self._connection() as conn:
+            conn.execute("""
+                INSERT INTO lexicon_corrections (key, user_id, translation, updated_at) VALUES (?, ?, ?, ?)
+                ON CONFLICT (key, user_id) DO UPDATE SET
+                    translation = excluded.translation, updated_at = excluded.updated_at;
+            """, (key.decode("utf-8"), user_id, translation, time.time()))
+
+    def count(self) -> int:
+        return self._connection().execute("SELECT count(*) FROM lexicon_overlay;").fetchone()[0]
+
+    def corrections_state(self) -> Tuple[int, Optional[float]]:
+        """(number of corrections, time of the latest one): changes with every correction."""
+        return tuple(self._connection().execute(
+            "SELECT count(*), max(updated_at) FROM lexicon_corrections;"
+        ).fetchone())
+
+    def count_corrections(self) -> int:
+        return self._connection().execute("SELECT count(*) FROM lexicon_corrections;").fetchone()[0]
+
+
+# ----------------------------
+# Lexicon
+# ----------------------------
+class Lexicon:
+    """Compiled dictionary plus learned overlay; both files are opened on first use."""
+
+    def __init__(self, path: str = LEXICON_PATH, overlay_path: str = LEXICON_OVERLAY_DB,
+                 quorum: int = LEXICON_QUORUM):
+        self.path = path
+        self.overlay_path = overlay_path
+        self.quorum = quorum
+        self._compiled = None
+        self._compiled_mtime = None
+        self._overlay = None
+        self._lock = threading.Lock()
+        self._stats = {"user_hits": 0, "dictionary_hits": 0, "agreed_hits": 0, "model_hits": 0, "misses": 0}
+
+    def _refresh_compiled(self):
+        # Pick up a rebuilt index (build_index replaces the file atomically);
+        # call with the lock held
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except OSError:
+            mtime = None
+        if mtime == self._compiled_mtime:
+            return
+        superseded, self._compiled = self._compiled, None
+        self._compiled_mtime = mtime
+        if mtime is not None:
+            try:
+                self._compiled = CompiledLexicon(self.path)
+            except (OSError, ValueError, struct.error) as e:  # empty, truncated or not an index
+                print(f"[lexicon] Ignoring {self.path}: {e}")
+        if superseded is not None:
+            superseded.close()
+
+    def _dictionary_get(self, key: bytes) -> Optional[str]:
+        # Under the lock: a rebuilt index closes the map other threads read from
+        with self._lock:
+            self._refresh_compiled()
+            return self._compiled.get(key) if self._compiled is not None else None
+
+    def _learned(self) -> LexiconOverlay:
+        with self._lock:
+            if self._overlay is None:
+                self._overlay = LexiconOverlay(self.overlay_path)
+            return self._overlay
+
+    def _count(self, outcome: str):
+        # Lookups run on many threads; `+=` on a dict entry is not atomic
+        with self._lock:
+            self._stats[outcome] += 1
+
+    def lookup(self, lemma: str, src_lang: str, tgt_lang: str, user_id: Optional[str] = None) -> Optional[str]:
+        """Return the translation of `lemma` (as seen by `user_id`), or None if the lexicon does not know it."""
+        key = _key(lemma, src_lang, tgt_lang)
+        overlay = self._learned()
+        if user_id is not None:
+            translation = overlay.get_correction(key, user_id)
+            if translation is not None:
+                self._count("user_hits")
+                return translation
+        translation = self._dictionary_get(key)
+        if translation is not None:
+            self._count("dictionary_hits")
+            return translation
+        translation = overlay.agreed_correction(key, self.quorum, exclude_user=user_id)
+        if translation is not None:
+            self._count("agreed_hits")
+            return translation
+        translation = overlay.get(key)
+        if translation is not None:
+            self._count("model_hits")
+            return translation
+        self._count("misses")
+        return None
+
+    def learn(self, lemma: str, src_lang: str, tgt_lang: str, translation: str, user_id: Optional[str] = None):
+        """Record a translation: a model result (fallback for everyone), or `user_id`'s correction."""
+        if translation and translation.strip():
+            key = _key(lemma, src_lang, tgt_lang)
+            if user_id is None:
+                self._learned().put(key, translation.strip())
+            else:
+                self._learned().put_correction(key, user_id, translation.strip())
+
+    def version(self) -> str:
+        """Changes when lookups without a user may answer differently: a rebuilt
+        index or a new correction (new model translations do not count)."""
+        with self._lock:
+            self._refresh_compiled()
+            mtime = self._compiled_mtime
+        count, updated_at = self._learned().corrections_state()
+        return f"{mtime}:{count}:{updated_at}"
+
+    def metrics(self):
+        with self._lock:
+            self._refresh_compiled()
+            dictionary_entries = self._compiled.n_entries if self._compiled is not None else 0
+            stats = dict(self._stats)
+        overlay = self._learned()
+        return dict(
+            stats,
+            dictionary_entries=dictionary_entries,
+            learned_entries=overlay.count(),
+            user_corrections=overlay.count_corrections(),
+        )
+
+
+lexicon = Lexicon()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 4 or sys.argv[1] != "build":
+        sys.exit("Usage: python -m words_context.lexicon build <dictionary.tsv> <index path>")
+    started = time.perf_counter()
+    n = build_index(read_tsv(sys.argv[2]), sys.argv[3])
+    print(f"[lexicon] {n} entries written to {sys.argv[3]} in {time.perf_counter() - started:.1f} s")
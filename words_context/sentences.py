@@ -0,0 +1,51 @@
+"""
+Keyword sentence matching without any model: importing this module stays
+cheap, so worker processes that only match sentences do not load torch.
+"""
+
+import re
+from typing import Dict, Iterable, List, Optional, Union
+
+from instrumentation.metrics import stage_timer
+
+
+def split_sentences(text: str) -> List[str]:
+    """
+    Split text into sentences (simple regex).
+    """
+    return [sent.strip() for sent in re.split(r'(?<=[.!?])\s+', text.strip())]
+
+def find_keyword_sentences(
+        text: Union[str, Iterable[str]],
+        keywords: List[str],
+        max_sentences: Optional[int] = None
+    ) -> Dict[str, List[str]]:
+    """
+    Find the sentences containing each keyword (case-insensitive), without translating.
+    `text` may be a string or an iterable of chunks (e.g. `reader.extract_text(path, stream=True)`);
+    a sentence cut at a chunk boundary is joined back together.
+    Returns a dict keyed by keyword; keywords that never occur are left out.
+    """
+    with stage_timer("context_scan"):
+        chunks = [text] if isinstance(text, str) else text
+        lowered_keywords = [(keyword, keyword.lower()) for keyword in keywords]
+        results: Dict[str, List[str]] = {keyword: [] for keyword in keywords}
+
+        def match(sentences):
+            lowered = [sent.lower() for sent in sentences]
+            for keyword, keyword_lower in lowered_keywords:
+                found = results[keyword]
+                if max_sentences is not None and len(found) >= max_sentences:
+                    continue
+                found.extend(sent for sent, low in zip(sentences, lowered) if keyword_lower in low)
+                if max_sentences is not None:
+                    del found[max_sentences:]
+
+        # The last sentence of a chunk may continue in the next one: hold it back
+        carry = ""
+        for chunk in chunks:
+            sentences = split_sentences(f"{carry}\n{chunk}" if carry else chunk)
+            carry = sentences.pop()
+            match(sentences)
+        match([carry])
+    return {keyword: found for keyword, found in results.items() if found}
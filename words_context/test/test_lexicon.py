@@ -0,0 +1,108 @@
+import os
+import threading
+
+from words_context.lexicon import CompiledLexicon, Lexicon, build_index, read_tsv
+
+
+def test_compiled_index_lookup(tmp_path):
+    tsv = tmp_path / "dictionary.tsv"
+    tsv.write_text("# src\ttgt\tlemma\ttranslation\n"
+                   "de\ten\tHaus\thouse\n"
+                   "de\ten\thaus\tbuilding\n"  # repeated key: the first one wins
+                   "de\tfr\thaus\tmaison\n"
+                   "de\ten\tstraße\tstreet\n", encoding="utf-8")
+    path = str(tmp_path / "lexicon.idx")
+    assert build_index(read_tsv(str(tsv)), path) == 3
+
+    index = CompiledLexicon(path)
+    lexicon = Lexicon(path, str(tmp_path / "overlay.sqlite3"))
+    assert index.n_entries == 3
+    assert lexicon.lookup("haus", "de", "en") == "house"
+    assert lexicon.lookup(" Haus ", "DE", "fr") == "maison"
+    assert lexicon.lookup("Straße", "de", "en") == "street"
+    assert lexicon.lookup("baum", "de", "en") is None
+    index.close()
+
+
+def test_overlay_priority(tmp_path):
+    path = str(tmp_path / "lexicon.idx")
+    build_index([("de", "en", "bank", "bank")], path)
+    lexicon = Lexicon(path, str(tmp_path / "overlay.sqlite3"))
+
+    lexicon.learn("baum", "de", "en", "tree")          # model translation of a miss
+    assert lexicon.lookup("baum", "de", "en") == "tree"
+
+    lexicon.learn("bank", "de", "en", "bench")         # the dictionary beats the model
+    assert lexicon.lookup("bank", "de", "en") == "bank"
+
+    lexicon.learn("bank", "de", "en", "bench", user_id="anna")  # a correction beats both for its user
+    lexicon.learn("bank", "de", "en", "shore")         # and is not overwritten by the model
+    assert lexicon.lookup("bank", "de", "en", user_id="anna") == "bench"
+
+    metrics = lexicon.metrics()
+    assert metrics["dictionary_entries"] == 1 and metrics["learned_entries"] == 2
+    assert metrics["user_corrections"] == 1
+    assert metrics["user_hits"] == 1 and metrics["dictionary_hits"] == 1 and metrics["model_hits"] == 1
+
+
+def test_corrections_are_per_user(tmp_path):
+    path = str(tmp_path / "lexicon.idx")
+    build_index([("de", "en", "bank", "bank")], path)
+    lexicon = Lexicon(path, str(tmp_path / "overlay.sqlite3"), quorum=2)
+    lexicon.learn("baum", "de", "en", "tree")
+
+    lexicon.learn("bank", "de", "en", "bench", user_id="anna")
+    lexicon.learn("baum", "de", "en", "wood", user_id="anna")
+    assert lexicon.lookup("bank", "de", "en", user_id="bob") == "bank"
+    assert lexicon.lookup("baum", "de", "en", user_id="bob") == "tree"  # one user is no quorum
+    assert lexicon.lookup("baum", "de", "en") == "tree"
+
+    lexicon.learn("baum", "de", "en", "wood", user_id="carl")
+    lexicon.learn("bank", "de", "en", "bench", user_id="carl")
+    assert lexicon.lookup("baum", "de", "en", user_id="bob") == "wood"  # agreed: beats the model
+    assert lexicon.lookup("bank", "de", "en", user_id="bob") == "bank"  # but not the dictionary
+    assert lexicon.metrics()["agreed_hits"] == 1
+
+
+def test_invalid_index_is_ignored(tmp_path):
+    path = tmp_path / "lexicon.idx"
+    path.write_bytes(b"")
+    lexicon = Lexicon(str(path), str(tmp_path / "overlay.sqlite3"))
+    lexicon.learn("baum", "de", "en", "tree")
+    assert lexicon.lookup("baum", "de", "en") == "tree"
+    assert lexicon.lookup("haus", "de", "en") is None
+
+    path.write_bytes(b"not a lexicon index at all")
+    os.utime(path, ns=(1, 1))
+    assert lexicon.lookup("haus", "de", "en") is None
+    assert lexicon.metrics()["dictionary_entries"] == 0
+
+
+def test_rebuilt_index_replaces_the_old_map(tmp_path):
+    path = str(tmp_path / "lexicon.idx")
+    build_index([("de", "en", "haus", "house")], path)
+    lexicon = Lexicon(path, str(tmp_path / "overlay.sqlite3"))
+    assert lexicon.lookup("haus", "de", "en") == "house"
+    old = lexicon._compiled
+
+    build_index([("de", "en", "haus", "home")], path)
+    os.utime(path, ns=(2, 2))
+    assert lexicon.lookup("haus", "de", "en") == "home"
+    assert old._mm.closed
+
+
+def test_lookup_counts_are_exact_across_threads(tmp_path):
+    path = str(tmp_path / "lexicon.idx")
+    build_index([("de", "en", "haus", "house")], path)
+    lexicon = Lexicon(path, str(tmp_path / "overlay.sqlite3"))
+
+    def look_up():
+        for _ in range(200):
+            lexicon.lookup("haus", "de", "en")
+
+    threads = [threading.Thread(target=look_up) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert lexicon.metrics()["dictionary_hits"] == 8 * 200